@@ -0,0 +1,65 @@
+"""Drives ssh_manager_backend.py as a subprocess over its NDJSON stdin/stdout protocol.
+
+Shared by the end-to-end benchmarks (bench_backend.py, bench_ipc_throughput.py).
+"""
+
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ssh_manager_backend.py")
+
+
+class Backend:
+    """A backend process driven over NDJSON stdin/stdout; responses are timestamped as they arrive."""
+
+    def __init__(self, directory, env=None, use_asyncio=False):
+        env = dict(os.environ if env is None else env)
+        if use_asyncio:
+            env["SSH_MANAGER_ASYNCIO"] = "1"
+        self.started = time.perf_counter()
+        self.process = subprocess.Popen([sys.executable, BACKEND], cwd=directory, env=env, text=True,
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.responses = queue.Queue()
+        self.next_id = 0
+        threading.Thread(target=self.read, daemon=True).start()
+
+    def read(self):
+        for line in self.process.stdout:
+            self.responses.put((time.perf_counter(), json.loads(line)))
+
+    def send(self, *requests):
+        """Writes requests as one NDJSON chunk."""
+        self.process.stdin.write("".join(json.dumps(request) + "\n" for request in requests))
+        self.process.stdin.flush()
+
+    def receive(self, timeout=60):
+        """Returns the next response."""
+        return self.responses.get(timeout=timeout)[1]
+
+    def wait_for(self, predicate, timeout=60):
+        """Returns (arrival time, response) of the first response matching predicate; others are dropped."""
+        deadline = time.monotonic() + timeout
+        while True:
+            arrived, response = self.responses.get(timeout=max(0.0, deadline - time.monotonic()))
+            if predicate(response):
+                return arrived, response
+
+    def call(self, request, timeout=60):
+        """Sends one request and returns its first response."""
+        self.next_id += 1
+        request_id = f"bench-{self.next_id}"
+        self.send(dict(request, request_id=request_id))
+        return self.wait_for(lambda response: response.get("request_id") == request_id, timeout)[1]
+
+    def metrics(self, reset=False):
+        return self.call({"type": "get_metrics", "reset": reset})
+
+    def close(self):
+        """Closes stdin and waits for the backend to stop its sessions and exit."""
+        self.process.stdin.close()
+        self.process.wait(timeout=30)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""End-to-end benchmarks of the backend process, with benchmarks/fake_ssh.py as `ssh` on PATH.
+
+Drives ssh_manager_backend.py over its stdin/stdout protocol, so nothing needs a server or
+network. Scenarios:
+
+- cold_start: backend start to first status and to the first answered request, with --profiles stored
+- connect: --sessions profiles connected at once; request-to-Connected latency, threads and RSS per session
+- store: save_profile latency at each --store-sizes profile count (client side and the backend's store timings)
+- ipc: pipelined get_profile_details requests per second
+
+The fake ssh is shaped with --handshake-ms, --verbose-lines, --output-rate and --failure-rate
+(see fake_ssh.py). --json writes the results, and --compare fails (exit 1) when a timing is
+more than --tolerance slower than in an earlier --json file, for offline regression checks.
+
+    python3 benchmarks/bench_backend.py [--scenarios cold_start,connect,store,ipc] [--asyncio]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from backend_driver import Backend
+from bench_ipc_throughput import bench_pipelined
+
+FAKE_SSH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_ssh.py")
+SCENARIOS = ("cold_start", "connect", "store", "ipc")
+FIRST_LOCAL_PORT = 47000 # Forward ports of the connect scenario; the fake ssh does not bind them
+
+
+def make_profile(i, local_port=None):
+    """Returns a generated profile with one forward."""
+    return {
+        "hostname": f"host-{i}.bench.invalid",
+        "username": "deploy",
+        "port": 22,
+        "forwards": [{"local_port": local_port or 10000 + i % 50000, "remote_host": "localhost", "remote_port": 5432}],
+    }
+
+
+def install_fake_ssh(directory, settings):
+    """Puts an `ssh` wrapper running fake_ssh.py in directory; returns the environment using it."""
+    wrapper = os.path.join(directory, "ssh")
+    with open(wrapper, "w") as f:
+        f.write(f"#!/bin/sh\nexec {sys.executable} {FAKE_SSH} \"$@\"\n")
+    os.chmod(wrapper, 0o755)
+    env = dict(os.environ, PATH=directory + os.pathsep + os.environ.get("PATH", ""))
+    env.update({f"FAKE_SSH_{name.upper()}": str(value) for name, value in settings.items()})
+    return env
+
+
+def seed_profiles(backend, count, first=0):
+    """Adds generated profiles first..count-1 in batches."""
+    for start in range(first, count, 1000):
+        requests = [{"type": "add_profile", "profile_name": f"profile-{i}", "data": make_profile(i)}
+                    for i in range(start, min(count, start + 1000))]
+        backend.call({"type": "batch", "requests": requests}, timeout=300)
+
+
+def percentiles(samples):
+    """Returns (median, p95) of a list of numbers."""
+    samples = sorted(samples)
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def bench_cold_start(args, env, results):
+    """Backend start to first status line and to the first answered request, with profiles stored."""
+    with tempfile.TemporaryDirectory() as directory:
+        backend = Backend(directory, env, args.asyncio)
+        seed_profiles(backend, args.profiles)
+        backend.close()
+        first_status, first_reply, rss = [], [], []
+        for _ in range(args.repeat):
+            backend = Backend(directory, env, args.asyncio)
+            arrived, _ = backend.wait_for(lambda response: response["type"] == "connection_status")
+            first_status.append((arrived - backend.started) * 1000)
+            metrics = backend.metrics()
+            first_reply.append((time.perf_counter() - backend.started) * 1000)
+            rss.append(metrics["memory"]["rss_bytes"] or metrics["memory"]["peak_rss_bytes"])
+            backend.close()
+    results["cold_start.first_status_ms"] = statistics.median(first_status)
+    results["cold_start.first_reply_ms"] = statistics.median(first_reply)
+    results["cold_start.rss_mb"] = statistics.median(rss) / 1e6
+
+
+def bench_connect(args, env, results):
+    """Connects --sessions profiles at once and measures latency and per-session cost."""
+    with tempfile.TemporaryDirectory() as directory:
+        backend = Backend(directory, env, args.asyncio)
+        names = [f"profile-{i}" for i in range(args.sessions)]
+        backend.call({"type": "batch", "requests": [
+            {"type": "add_profile", "profile_name": name, "data": make_profile(i, FIRST_LOCAL_PORT + i)}
+            for i, name in enumerate(names)]})
+        before = backend.metrics(reset=True)
+
+        sent = time.perf_counter()
+        backend.send(*({"type": "connect", "profile_name": name} for name in names))
+        latencies, failures = [], 0
+        pending = set(names)
+        while pending:
+            arrived, response = backend.wait_for(lambda response: response["type"] == "connection_status"
+                                                 and response.get("session_id") in pending
+                                                 and response["status"] in ("Connected", "Error", "Disconnected"))
+            pending.discard(response["session_id"])
+            if response["status"] == "Connected":
+                latencies.append((arrived - sent) * 1000)
+            else:
+                failures += 1
+        time.sleep(args.settle) # Let verbose output flow before sampling threads and memory
+        during = backend.metrics()
+        backend.close() # Disconnects every session
+
+    connected = max(len(latencies), 1)
+    if latencies:
+        results["connect.latency_p50_ms"], results["connect.latency_p95_ms"] = percentiles(latencies)
+    spawn = during["connects"].get("spawn")
+    if spawn:
+        results["connect.spawn_to_connected_p50_ms"] = spawn["p50_ms"]
+    results["connect.failures"] = failures
+    results["connect.threads_per_session"] = (during["threads"]["total"] - before["threads"]["total"]) / connected
+    rss_before = before["memory"]["rss_bytes"] or before["memory"]["peak_rss_bytes"]
+    rss_during = during["memory"]["rss_bytes"] or during["memory"]["peak_rss_bytes"]
+    results["connect.rss_kb_per_session"] = (rss_during - rss_before) / 1024 / connected
+    results["connect.request_ms"] = during["requests"]["connect"]["mean_ms"]
+
+
+def bench_store(args, env, results):
+    """save_profile latency as the store grows."""
+    with tempfile.TemporaryDirectory() as directory:
+        backend = Backend(directory, env, args.asyncio)
+        stored = 0
+        for size in args.store_sizes:
+            seed_profiles(backend, size, first=stored)
+            stored = size
+            backend.metrics(reset=True)
+            samples = []
+            for edit in range(args.edits):
+                i = edit * 7919 % size
+                data = make_profile(i)
+                data["port"] = 1024 + edit
+                start = time.perf_counter()
+                backend.call({"type": "save_profile", "profile_name": f"profile-{i}", "data": data})
+                samples.append((time.perf_counter() - start) * 1000)
+            metrics = backend.metrics()
+            results[f"store.save_{size}_p50_ms"], results[f"store.save_{size}_p95_ms"] = percentiles(samples)
+            results[f"store.put_{size}_mean_ms"] = metrics["store"]["put"]["mean_ms"]
+        backend.close()
+
+
+def bench_ipc(args, env, results):
+    """Pipelined cheap requests per second (as in bench_ipc_throughput.py), and the backend's own time per request."""
+    with tempfile.TemporaryDirectory() as directory:
+        backend = Backend(directory, env, args.asyncio)
+        backend.call({"type": "add_profile", "profile_name": "bench", "data": make_profile(0)})
+        backend.metrics(reset=True)
+        elapsed = bench_pipelined(backend, args.requests)
+        metrics = backend.metrics()
+        backend.close()
+    results["ipc.requests_per_s"] = args.requests / elapsed
+    results["ipc.handler_mean_us"] = metrics["requests"]["get_profile_details"]["mean_ms"] * 1000
+
+
+def compare(results, baseline, tolerance):
+    """Returns the timings more than `tolerance` (a fraction) slower than the baseline run."""
+    regressions = []
+    for key, value in results.items():
+        previous = baseline.get(key)
+        if previous is None or key.endswith("failures"):
+            continue
+        higher_is_better = key.endswith("_per_s")
+        worse = value < previous * (1 - tolerance) if higher_is_better else value > previous * (1 + tolerance)
+        if worse:
+            regressions.append((key, previous, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--asyncio", action="store_true", help="run the asyncio backend")
+    parser.add_argument("--profiles", type=int, default=1000, help="profiles stored for cold_start")
+    parser.add_argument("--repeat", type=int, default=5, help="backend starts timed by cold_start")
+    parser.add_argument("--sessions", type=int, default=50, help="profiles connected at once by connect")
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds connected before sampling threads and RSS")
+    parser.add_argument("--store-sizes", type=lambda text: [int(size) for size in text.split(",")], default=[10, 1000, 10000],
+                        help="comma-separated profile counts for store")
+    parser.add_argument("--edits", type=int, default=200, help="save_profile requests timed per store size")
+    parser.add_argument("--requests", type=int, default=20000, help="requests sent by ipc")
+    parser.add_argument("--handshake-ms", type=float, default=50, help="fake ssh handshake delay")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="random extra fake ssh handshake delay")
+    parser.add_argument("--verbose-lines", type=int, default=40, help="debug lines the fake ssh prints while connecting")
+    parser.add_argument("--output-rate", type=float, default=0, help="debug lines per second the fake ssh prints once connected")
+    parser.add_argument("--failure-rate", type=float, default=0, help="fraction of fake ssh connects that fail")
+    parser.add_argument("--failure", default="refused", choices=("refused", "auth", "forward", "drop"), help="how they fail")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against --compare, as a fraction")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario: {unknown[0]}")
+
+    settings = {"handshake_ms": args.handshake_ms, "jitter_ms": args.jitter_ms, "verbose_lines": args.verbose_lines,
+                "output_rate": args.output_rate, "failure_rate": args.failure_rate, "failure": args.failure}
+    results = {}
+    fake_bin = tempfile.mkdtemp()
+    try:
+        env = install_fake_ssh(fake_bin, settings)
+        for name in scenarios:
+            globals()[f"bench_{name}"](args, env, results)
+    finally:
+        shutil.rmtree(fake_bin)
+
+    width = max(len(key) for key in results)
+    for key, value in results.items():
+        print(f"{key:<{width}}  {value:>12.3f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"settings": settings, "backend": "asyncio" if args.asyncio else "threaded", "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f)["results"], args.tolerance)
+        for key, previous, value in regressions:
+            print(f"REGRESSION {key}: {previous:.3f} -> {value:.3f}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
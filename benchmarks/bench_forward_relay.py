@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Overhead of the metered-forward relay compared with connecting to the forwarded port directly.
+
+A local echo server stands in for ssh's -L port (pass --upstream-port to use a real forward
+instead; it must echo). Each mode is measured on the same upstream:
+
+- direct: clients connect straight to the upstream port, as with a plain ssh -L forward
+- relay splice / relay copy: the threaded backend's relay, with and without os.splice
+- relay asyncio: the asyncio backend's relay (protocols on the event loop)
+
+    python3 benchmarks/bench_forward_relay.py [--megabytes N] [--round-trips N] [--connects N]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ssh_manager_backend as backend
+
+CHUNK = 64 * 1024
+
+
+def start_echo_server():
+    """Starts a threaded echo server on a free loopback port and returns the port."""
+    server = socket.create_server(("127.0.0.1", 0), backlog=128)
+
+    def serve(conn):
+        with conn:
+            while True:
+                data = conn.recv(CHUNK)
+                if not data:
+                    return
+                conn.sendall(data)
+
+    def accept():
+        while True:
+            conn, _ = server.accept()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def make_relay(upstream_port):
+    """Returns a relay in front of upstream_port whose session is already connected."""
+    session = backend.SSHSession("bench")
+    session.status = "Connected"
+    session.settled.set()
+    relay = backend.ForwardRelay(session, backend.ForwardStats(0, upstream_port, "bench", 0))
+    relay.listener = backend.open_relay_listener(0)
+    relay.stats.local_port = relay.listener.getsockname()[1]
+    return relay
+
+
+def start_threaded_relay(upstream_port, splice):
+    """Starts the threaded backend's relay; returns its port."""
+    backend.RELAY_USE_SPLICE = splice
+    relay = make_relay(upstream_port)
+    threading.Thread(target=backend.relay_accept_loop, args=(relay,), daemon=True).start()
+    return relay.stats.local_port
+
+
+def start_asyncio_relay(upstream_port):
+    """Starts the asyncio backend's relay on an event loop thread; returns its port."""
+    loop = asyncio.new_event_loop()
+    backend.BACKEND_LOOP = loop # Relay callbacks schedule their tasks on this loop
+    relay = make_relay(upstream_port)
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(backend.serve_relay_async(relay), loop).result()
+    return relay.stats.local_port
+
+
+def connect(port):
+    """Opens a client connection with Nagle disabled."""
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def bench_throughput(port, megabytes):
+    """Streams data through the echo path and returns MB/s of echoed payload."""
+    total = megabytes * 1024 * 1024
+    payload = b"x" * CHUNK
+    with connect(port) as sock:
+        start = time.perf_counter()
+
+        def write():
+            sent = 0
+            while sent < total:
+                sent += sock.send(payload[:min(CHUNK, total - sent)])
+            sock.shutdown(socket.SHUT_WR)
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        received = 0
+        while received < total:
+            data = sock.recv(CHUNK)
+            if not data:
+                break
+            received += len(data)
+        writer.join()
+        elapsed = time.perf_counter() - start
+    return received / elapsed / 1e6
+
+
+def bench_round_trips(port, count):
+    """Returns the median microseconds of a one-byte request/response on one connection."""
+    samples = []
+    with connect(port) as sock:
+        for _ in range(count):
+            start = time.perf_counter()
+            sock.sendall(b"p")
+            sock.recv(1)
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def bench_connects(port, count):
+    """Returns the median microseconds to connect and complete a first round trip."""
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        with connect(port) as sock:
+            sock.sendall(b"p")
+            sock.recv(1)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=512, help="payload streamed per mode")
+    parser.add_argument("--round-trips", type=int, default=5000, help="request/response pairs timed per mode")
+    parser.add_argument("--connects", type=int, default=1000, help="new connections timed per mode")
+    parser.add_argument("--upstream-port", type=int, help="existing echo port (e.g. an ssh -L forward) instead of a local echo server")
+    args = parser.parse_args()
+
+    upstream = args.upstream_port or start_echo_server()
+    modes = [("direct", upstream)]
+    if hasattr(os, "splice"):
+        modes.append(("relay splice", start_threaded_relay(upstream, True)))
+    modes.append(("relay copy", start_threaded_relay(upstream, False)))
+    modes.append(("relay asyncio", start_asyncio_relay(upstream)))
+
+    print(f"{'mode':>14}  {'MB/s':>8}  {'rtt us':>8}  {'connect us':>10}")
+    for name, port in modes:
+        throughput = bench_throughput(port, args.megabytes)
+        rtt = bench_round_trips(port, args.round_trips)
+        connect_us = bench_connects(port, args.connects)
+        print(f"{name:>14}  {throughput:>8.0f}  {rtt:>8.1f}  {connect_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
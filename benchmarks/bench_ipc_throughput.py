@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Request throughput over the backend's stdin/stdout pipe, with and without batching.
+
+Starts the backend in a temporary directory and measures requests/sec for:
+
+- sequential: one request in flight, waiting for each reply (the old renderer pattern)
+- pipelined: every request written up front, replies matched back by request_id
+- batched: requests grouped into `batch` requests of --batch-size
+
+    python3 benchmarks/bench_ipc_throughput.py [--requests N] [--batch-size N] [--asyncio]
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+
+from backend_driver import Backend
+
+PROFILE = {"hostname": "bench.example.internal", "username": "deploy", "port": 22, "forwards": []}
+
+
+def details_request(request_id):
+    """Returns a cheap request, so the timings measure the protocol rather than the work."""
+    return {"type": "get_profile_details", "profile_name": "bench", "request_id": request_id}
+
+
+def bench_sequential(backend, count):
+    """One request at a time, waiting for each reply."""
+    start = time.perf_counter()
+    for request_id in range(count):
+        backend.send(details_request(request_id))
+        assert backend.receive()["request_id"] == request_id
+    return time.perf_counter() - start
+
+
+def bench_pipelined(backend, count):
+    """All requests in flight at once; replies are matched by request_id."""
+    start = time.perf_counter()
+    writer = threading.Thread(target=backend.send, args=[details_request(i) for i in range(count)])
+    writer.start()
+    pending = set(range(count))
+    while pending:
+        pending.discard(backend.receive()["request_id"])
+    writer.join()
+    return time.perf_counter() - start
+
+
+def bench_batched(backend, count, batch_size):
+    """Requests grouped into batch requests, with one batch in flight at a time."""
+    start = time.perf_counter()
+    for first in range(0, count, batch_size):
+        requests = [details_request(i) for i in range(first, min(count, first + batch_size))]
+        backend.send({"type": "batch", "request_id": f"batch-{first}", "requests": requests})
+        response = backend.receive()
+        assert response["type"] == "batch_result" and len(response["results"]) == len(requests)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000, help="requests timed per mode")
+    parser.add_argument("--batch-size", type=int, default=100, help="requests per batch")
+    parser.add_argument("--asyncio", action="store_true", help="run the asyncio backend")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        backend = Backend(directory, use_asyncio=args.asyncio)
+        backend.call({"type": "add_profile", "profile_name": "bench", "data": PROFILE})
+        results = [
+            ("sequential", bench_sequential(backend, args.requests)),
+            ("pipelined", bench_pipelined(backend, args.requests)),
+            (f"batched x{args.batch_size}", bench_batched(backend, args.requests, args.batch_size)),
+        ]
+        backend.close()
+
+    print(f"{'mode':>12}  {'requests/s':>11}  {'us/request':>10}")
+    for name, seconds in results:
+        print(f"{name:>12}  {args.requests / seconds:>11.0f}  {seconds / args.requests * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
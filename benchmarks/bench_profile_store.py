@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Edit latency of the profile store at 10, 1k and 50k profiles.
+
+Compares the SQLite-backed ProfileStore against the legacy approach of
+rewriting the whole JSON file on every change.
+
+    python3 benchmarks/bench_profile_store.py [--edits N]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ssh_manager_backend as backend
+
+SIZES = (10, 1000, 50000)
+LEGACY_MAX_EDITS = 20 # A full rewrite at 50k profiles is slow; a handful of samples is enough
+
+
+def make_profile(i):
+    """Returns a realistic generated profile."""
+    return {
+        "hostname": f"host-{i}.example.internal",
+        "username": "deploy",
+        "port": 22,
+        "forwards": [{"local_port": 10000 + (i % 50000), "remote_host": "localhost", "remote_port": 5432}],
+    }
+
+
+def summarize(samples):
+    """Returns median and p95 of a list of seconds, in microseconds."""
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return statistics.median(samples) * 1e6, p95 * 1e6
+
+
+def bench_store(directory, size, edits):
+    """Times single-profile edits against a ProfileStore holding `size` profiles."""
+    store = backend.ProfileStore(os.path.join(directory, f"store-{size}.db"))
+    store.put_many((f"profile-{i}", make_profile(i)) for i in range(size))
+    samples = []
+    for _ in range(edits):
+        i = random.randrange(size)
+        data = make_profile(i)
+        data["port"] = random.randint(1, 65535)
+        start = time.perf_counter()
+        store.put(f"profile-{i}", data)
+        samples.append(time.perf_counter() - start)
+    store.conn.close()
+    return summarize(samples)
+
+
+def bench_legacy_json(directory, size, edits):
+    """Times the legacy save_profiles behaviour: rewrite the whole file with indent=4."""
+    path = os.path.join(directory, f"legacy-{size}.json")
+    profiles = {f"profile-{i}": make_profile(i) for i in range(size)}
+    samples = []
+    for _ in range(min(edits, LEGACY_MAX_EDITS)):
+        i = random.randrange(size)
+        profiles[f"profile-{i}"]["port"] = random.randint(1, 65535)
+        start = time.perf_counter()
+        with open(path, 'w') as f:
+            json.dump(profiles, f, indent=4)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--edits", type=int, default=500, help="edits timed per size")
+    args = parser.parse_args()
+
+    print(f"{'profiles':>9}  {'store p50':>11}  {'store p95':>11}  {'json p50':>11}  {'json p95':>11}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SIZES:
+            store_p50, store_p95 = bench_store(directory, size, args.edits)
+            json_p50, json_p95 = bench_legacy_json(directory, size, args.edits)
+            print(f"{size:>9}  {store_p50:>9.1f}us  {store_p95:>9.1f}us  {json_p50:>9.1f}us  {json_p95:>9.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Stand-in for the ssh client, so the backend can be benchmarked without a server.
+
+It prints the same ssh -v milestones the backend waits for (authentication, one
+"Local connections to" line per -L forward, "Entering interactive session") and
+then stays up like `ssh -N`. Behaviour is set through the environment:
+
+    FAKE_SSH_HANDSHAKE_MS   delay before authentication succeeds (default 50)
+    FAKE_SSH_JITTER_MS      random extra handshake delay, 0 to this value (default 0)
+    FAKE_SSH_VERBOSE_LINES  debug lines printed during the handshake (default 40)
+    FAKE_SSH_OUTPUT_RATE    debug lines per second once connected (default 0)
+    FAKE_SSH_FAILURE_RATE   fraction of connects that fail, 0 to 1 (default 0)
+    FAKE_SSH_FAILURE        how they fail: refused, auth, forward or drop (default refused)
+    FAKE_SSH_DROP_AFTER     seconds after which a connected session dies (default 0, never)
+    FAKE_SSH_LISTEN         1 to really listen on -L ports and forward to 127.0.0.1:remote_port
+
+`ssh -O` control commands (ControlMaster requests) succeed immediately.
+"""
+
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+
+def env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+def emit(line):
+    sys.stderr.write(line + "\n")
+    sys.stderr.flush()
+
+
+def pipe(source, destination):
+    """Copies one direction of a forwarded connection."""
+    try:
+        while True:
+            data = source.recv(65536)
+            if not data:
+                break
+            destination.sendall(data)
+    except OSError:
+        pass
+    try:
+        destination.shutdown(socket.SHUT_WR)
+    except OSError:
+        pass
+
+
+def serve_forward(listener, remote_port):
+    """Accepts on a -L port and connects every client to 127.0.0.1:remote_port."""
+    def forward(client):
+        try:
+            upstream = socket.create_connection(("127.0.0.1", remote_port))
+        except OSError:
+            client.close()
+            return
+        threading.Thread(target=pipe, args=(upstream, client), daemon=True).start()
+        pipe(client, upstream)
+
+    while True:
+        client, _ = listener.accept()
+        threading.Thread(target=forward, args=(client,), daemon=True).start()
+
+
+def forward_specs(args):
+    """Returns (local_port, remote_port) for each -L argument."""
+    specs = []
+    for i, arg in enumerate(args[:-1]):
+        if arg == "-L":
+            parts = args[i + 1].split(":")
+            specs.append((int(parts[-3]), int(parts[-1])))
+    return specs
+
+
+def main():
+    args = sys.argv[1:]
+    if "-O" in args:
+        return 0
+
+    failure = None
+    if random.random() < env_float("FAKE_SSH_FAILURE_RATE", 0):
+        failure = os.environ.get("FAKE_SSH_FAILURE", "refused")
+
+    emit("OpenSSH_9.6p1, OpenSSL 3.0.13 30 Jan 2024")
+    emit("debug1: Reading configuration data /etc/ssh/ssh_config")
+    if failure == "refused":
+        emit("ssh: connect to host bench.invalid port 22: Connection refused")
+        return 255
+
+    verbose_lines = int(env_float("FAKE_SSH_VERBOSE_LINES", 40))
+    handshake = (env_float("FAKE_SSH_HANDSHAKE_MS", 50) + random.uniform(0, env_float("FAKE_SSH_JITTER_MS", 0))) / 1000
+    for i in range(verbose_lines):
+        emit(f"debug1: kex and auth step {i + 1} of {verbose_lines}")
+        time.sleep(handshake / max(verbose_lines, 1))
+    if not verbose_lines:
+        time.sleep(handshake)
+
+    if failure == "auth":
+        emit("user@bench.invalid: Permission denied (publickey).")
+        return 255
+    emit('debug1: Authenticated to bench.invalid ([127.0.0.1]:22) using "publickey".')
+
+    listen = os.environ.get("FAKE_SSH_LISTEN") == "1"
+    for local_port, remote_port in forward_specs(args):
+        if failure == "forward":
+            emit(f"bind [127.0.0.1]:{local_port}: Address already in use")
+            emit(f"channel_setup_fwd_listener_tcpip: cannot listen to port: {local_port}")
+            emit("Could not request local forwarding.")
+            continue
+        if listen:
+            listener = socket.socket()
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind(("127.0.0.1", local_port))
+            listener.listen(128)
+            threading.Thread(target=serve_forward, args=(listener, remote_port), daemon=True).start()
+        emit(f"debug1: Local connections to LOCALHOST:{local_port} forwarded to remote address localhost:{remote_port}")
+    emit("debug1: Entering interactive session.")
+
+    drop_after = env_float("FAKE_SSH_DROP_AFTER", 0) or (0.05 if failure == "drop" else 0)
+    output_rate = env_float("FAKE_SSH_OUTPUT_RATE", 0)
+    deadline = time.monotonic() + drop_after if drop_after else None
+    line = 0
+    while deadline is None or time.monotonic() < deadline:
+        if output_rate:
+            line += 1
+            emit(f"debug3: channel 0: rcvd adjust {line}")
+            time.sleep(1 / output_rate)
+        else:
+            time.sleep(3600 if deadline is None else max(0, deadline - time.monotonic()))
+    emit("Timeout, server bench.invalid not responding.")
+    return 255
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -40,15 +40,24 @@ function startPythonBackend() {
     // Spawn the Python process
     pythonProcess = spawn('python3', [pythonScriptPath]);
 
-    // Handle data from Python script's stdout
-    pythonProcess.stdout.on('data', (data) => {
-        // Assuming the Python script sends JSON data
-        try {
-            const message = JSON.parse(data.toString());
-            // Send the message to the renderer process
-            mainWindow.webContents.send('backend-response', message);
-        } catch (error) {
-            console.error('Failed to parse JSON from Python:', data.toString(), error);
+    // Handle data from Python script's stdout: newline-delimited JSON, one message per line.
+    // A chunk may hold several messages or end part-way through one, so keep the unfinished tail.
+    let stdoutBuffer = '';
+    pythonProcess.stdout.setEncoding('utf8'); // Decodes multi-byte characters split across chunks
+    pythonProcess.stdout.on('data', (chunk) => {
+        const lines = (stdoutBuffer + chunk).split('\n');
+        stdoutBuffer = lines.pop(); // Incomplete last line (empty when the chunk ended on a newline)
+        for (const line of lines) {
+            if (!line.trim()) {
+                continue;
+            }
+            try {
+                const message = JSON.parse(line);
+                // Send the message to the renderer process
+                mainWindow.webContents.send('backend-response', message);
+            } catch (error) {
+                console.error('Failed to parse JSON from Python:', line, error);
+            }
         }
     });
 
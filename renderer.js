@@ -5,19 +5,30 @@ const electronAPI = window.electronAPI;
 
 // Get references to UI elements
 const profileSelect = document.getElementById('profile-select');
+const profileSearchInput = document.getElementById('profile-search');
 const connectButton = document.getElementById('connect-button');
 const disconnectButton = document.getElementById('disconnect-button');
 const editButton = document.getElementById('edit-button');
 const deleteButton = document.getElementById('delete-button');
+const importConfigButton = document.getElementById('import-config-button');
+const probeButton = document.getElementById('probe-button');
 const profileDetailsText = document.getElementById('profile-details-text');
 
 const statusText = document.getElementById('status-text'); // Get status text element
+const forwardStatsText = document.getElementById('forward-stats');
+const sessionLogText = document.getElementById('session-log');
+const logLevelSelect = document.getElementById('log-level');
+const logFollowCheckbox = document.getElementById('log-follow');
 
 const addEditTitle = document.getElementById('add-edit-title');
 const profileNameInput = document.getElementById('profile-name');
 const hostnameInput = document.getElementById('hostname');
 const usernameInput = document.getElementById('username');
 const portInput = document.getElementById('port');
+const tagsInput = document.getElementById('tags');
+const autoReconnectInput = document.getElementById('auto-reconnect');
+const lazyInput = document.getElementById('lazy');
+const idleTimeoutInput = document.getElementById('idle-timeout');
 const portForwardsContainer = document.getElementById('port-forwards-container');
 const addForwardButton = document.getElementById('add-forward-button');
 const saveProfileButton = document.getElementById('save-profile-button');
@@ -30,6 +41,24 @@ const portError = document.getElementById('port-error');
 
 
 let editingProfileName = null; // To keep track of the profile being edited
+let editingProfileData = null; // Stored record of that profile; saving overlays the form fields on it
+const sessionStatuses = {}; // Latest connection_status per session id (profile name)
+const forwardStats = {}; // Latest metered forward stats per session id
+
+const PROFILE_PAGE_SIZE = 500; // Profiles fetched per list_profiles page
+let profilesRevision = null; // Store revision the profile list reflects (null until fully loaded)
+let pendingListRevision = null; // Revision of the first page while a paged load is in progress
+
+const SESSION_LOG_MAX_LINES = 500; // Lines kept in the log view
+const SESSION_LOG_TAIL_RATE = 20; // Lines per second the backend may push while following
+let tailedSessionId = null; // Session whose log the backend is currently pushing to us
+
+const SEARCH_DEBOUNCE_MS = 150; // Delay after the last keystroke before searching
+const SEARCH_RESULT_LIMIT = 100; // Ranked results shown while a search is active
+let searchTimer = null;
+
+const probeResults = {}; // Latest probe_result per profile name, shown as a badge in the dropdown
+const pendingProbeLabels = new Set(); // Profiles whose badge changed since the last relabel
 
 // --- Helper function to update button states ---
 function updateButtonStates(isConnected) {
@@ -47,6 +76,10 @@ function updateButtonStates(isConnected) {
     hostnameInput.disabled = isConnected;
     usernameInput.disabled = isConnected;
     portInput.disabled = isConnected;
+    tagsInput.disabled = isConnected;
+    autoReconnectInput.disabled = isConnected;
+    lazyInput.disabled = isConnected;
+    idleTimeoutInput.disabled = isConnected;
 
     // Disable individual forward inputs and remove buttons while connected
     portForwardsContainer.querySelectorAll('input').forEach(input => {
@@ -76,20 +109,41 @@ function clearValidationErrors() {
 
 
 // --- IPC Communication Handlers ---
-// Listen for responses from the backend process
-electronAPI.onBackendResponse((message) => {
+// Handle one message from the backend (batch results are unpacked into their responses)
+function handleBackendMessage(message) {
     console.log('Received from backend:', message); // Log all incoming messages
 
     // Handle different types of messages from the backend using a switch statement
     switch (message.type) {
+        case 'batch_result':
+            message.results.forEach((responses) => responses.forEach(handleBackendMessage));
+            break;
         case 'profiles_list':
-            // Update the profile dropdown list
-            updateProfileList(message.data);
+            if (message.next_cursor === undefined) {
+                // Unpaged list: rebuild the profile dropdown list
+                updateProfileList(message.data);
+                profilesRevision = message.revision ?? null;
+            } else {
+                applyProfilesPage(message);
+            }
+            break;
+        case 'profiles_delta':
+            applyProfilesDelta(message);
+            break;
+        case 'search_results':
+            if (message.query === profileSearchInput.value.trim()) {
+                showSearchResults(message); // Ignore results for queries the user has already changed
+            }
+            break;
+        case 'ssh_config_imported':
+            requestProfileChanges();
+            alert(message.message + (message.skipped.length ? `\nSkipped ${message.skipped.length}: ` +
+                message.skipped.map((entry) => `${entry.name} (${entry.reason})`).join(', ') : ''));
             break;
         case 'profile_saved':
         case 'profile_deleted':
-            // After saving or deleting, request the updated list of profiles
-            requestProfilesList();
+            // After saving or deleting, fetch only what changed since our last revision
+            requestProfileChanges();
             // Clear the add/edit form after saving a new profile or after deleting
             if (message.type === 'profile_saved' && editingProfileName === null) {
                  clearProfileForm();
@@ -100,28 +154,45 @@ electronAPI.onBackendResponse((message) => {
             alert(message.message);
             break;
         case 'connection_status':
-            // Update the connection status display and button states
-            statusText.textContent = message.status;
-            // Update status text class for styling
-            statusText.className = ''; // Clear existing classes
-            if (message.status === 'Connected') {
-                statusText.classList.add('Connected');
-                updateButtonStates(true);
-            } else if (message.status === 'Connecting...') {
-                 statusText.classList.add('Connecting');
-                 updateButtonStates(true); // Still disable connect, enable disconnect optimistically
-            } else if (message.status === 'Disconnected') {
-                 statusText.classList.add('Disconnected');
-                 updateButtonStates(false);
-                 alert(message.message); // Alert on disconnection
-             } else if (message.status.startsWith('Error:')) {
-                 statusText.classList.add('Error');
-                 updateButtonStates(false); // Revert buttons on error
-                 alert(message.message); // Alert on connection error
-             } else {
-                 statusText.classList.add('Disconnected'); // Default to disconnected for unknown status
-                 updateButtonStates(false);
-             }
+            // Remember the status of every session, but only render the selected one
+            if (message.session_id) {
+                sessionStatuses[message.session_id] = { status: message.status, message: message.message };
+                if (message.status !== 'Connected' && message.status !== 'Standby') {
+                    // Counters restart with the next connection; a lazy tunnel keeps its own across activations
+                    delete forwardStats[message.session_id];
+                    renderForwardStats();
+                }
+                if (message.session_id !== profileSelect.value) {
+                    break;
+                }
+            }
+            renderConnectionStatus(message.status);
+            if (message.status === 'Disconnected' || message.status.startsWith('Error:')) {
+                alert(message.message); // Alert on disconnection or connection error
+            }
+            break;
+        case 'session_log':
+            sessionLogText.textContent = '';
+            appendSessionLogLines(message.lines, 0);
+            break;
+        case 'session_log_tail':
+            if (message.session_id === tailedSessionId) {
+                appendSessionLogLines(message.lines, message.suppressed);
+            }
+            break;
+        case 'session_log_tailing':
+            tailedSessionId = message.enabled ? message.session_id : null;
+            break;
+        case 'forward_stats':
+            Object.assign(forwardStats, message.sessions);
+            renderForwardStats();
+            break;
+        case 'probe_result':
+            probeResults[message.profile_name] = message;
+            updateProfileOptionLabel(message.profile_name);
+            break;
+        case 'probe_complete':
+            probeButton.disabled = false;
             break;
         case 'profile_details':
             // Display detailed information about the selected profile
@@ -147,7 +218,10 @@ electronAPI.onBackendResponse((message) => {
             // Optionally alert or log unknown messages
             // alert('Received unknown message from backend.');
     }
-});
+}
+
+// Listen for responses from the backend process
+electronAPI.onBackendResponse(handleBackendMessage);
 
 // Listen for errors specifically from the backend's stderr
 electronAPI.onBackendError((message) => {
@@ -172,6 +246,10 @@ electronAPI.onBackendClosed((code) => {
     hostnameInput.disabled = true;
     usernameInput.disabled = true;
     portInput.disabled = true;
+    tagsInput.disabled = true;
+    autoReconnectInput.disabled = true;
+    lazyInput.disabled = true;
+    idleTimeoutInput.disabled = true;
      portForwardsContainer.querySelectorAll('input').forEach(input => {
         input.disabled = true;
     });
@@ -181,6 +259,100 @@ electronAPI.onBackendClosed((code) => {
 });
 
 // --- UI Update Functions ---
+function renderConnectionStatus(status) {
+    // Update the connection status display and button states
+    statusText.textContent = status;
+    // Update status text class for styling
+    statusText.className = ''; // Clear existing classes
+    if (status === 'Connected') {
+        statusText.classList.add('Connected');
+        updateButtonStates(true);
+    } else if (status === 'Connecting...') {
+        statusText.classList.add('Connecting');
+        updateButtonStates(true); // Still disable connect, enable disconnect optimistically
+    } else if (status === 'Reconnecting...') {
+        statusText.classList.add('Connecting');
+        updateButtonStates(true); // Disconnect stays available to cancel the pending attempt
+    } else if (status === 'Standby') {
+        statusText.classList.add('Connecting');
+        updateButtonStates(true); // Lazy tunnel listening; Disconnect stops it
+    } else if (status === 'Disconnecting...') {
+        statusText.classList.add('Connecting'); // Use connecting color for disconnecting
+    } else if (status === 'Disconnected') {
+        statusText.classList.add('Disconnected');
+        updateButtonStates(false);
+    } else if (status.startsWith('Error:')) {
+        statusText.classList.add('Error');
+        updateButtonStates(false); // Revert buttons on error
+    } else {
+        statusText.classList.add('Disconnected'); // Default to disconnected for unknown status
+        updateButtonStates(false);
+    }
+}
+
+function formatBytes(count) {
+    const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+    let unit = 0;
+    while (count >= 1024 && unit < units.length - 1) {
+        count /= 1024;
+        unit += 1;
+    }
+    return `${unit ? count.toFixed(1) : count} ${units[unit]}`;
+}
+
+function renderForwardStats() {
+    // Traffic of the selected session's metered forwards, one line per forward
+    const stats = forwardStats[profileSelect.value] || [];
+    forwardStatsText.textContent = stats.map(fwd => {
+        const latency = fwd.first_byte_ms ? `, first byte p50 ${fwd.first_byte_ms.p50} ms` : '';
+        return `${fwd.local_port} -> ${fwd.remote}: ${fwd.active} active, ${fwd.connections_per_min} conn/min, ` +
+            `in ${formatBytes(fwd.bytes_in)} / out ${formatBytes(fwd.bytes_out)}${latency}`;
+    }).join('\n');
+}
+
+function renderSelectedSessionStatus() {
+    // Show the status of the session belonging to the selected profile
+    const session = sessionStatuses[profileSelect.value];
+    renderConnectionStatus(session ? session.status : 'Disconnected');
+    renderForwardStats();
+}
+
+function appendSessionLogLines(lines, suppressed) {
+    // Append log lines to the log view, noting lines the backend skipped to honour the rate limit
+    const text = lines.map((line) => line.text);
+    if (suppressed > 0) {
+        text.unshift(`... ${suppressed} lines skipped ...`);
+    }
+    if (text.length === 0) {
+        return;
+    }
+    const atBottom = sessionLogText.scrollTop + sessionLogText.clientHeight >= sessionLogText.scrollHeight - 5;
+    const kept = (sessionLogText.textContent ? sessionLogText.textContent.split('\n') : []).concat(text);
+    sessionLogText.textContent = kept.slice(-SESSION_LOG_MAX_LINES).join('\n');
+    if (atBottom) {
+        sessionLogText.scrollTop = sessionLogText.scrollHeight;
+    }
+}
+
+function showSessionLog() {
+    // Load the recent log of the selected profile and follow it if requested
+    const sessionId = profileSelect.value;
+    sessionLogText.textContent = '';
+    if (tailedSessionId !== null) {
+        electronAPI.sendBackendRequest({ type: 'tail_session_log', session_id: tailedSessionId, enabled: false });
+        tailedSessionId = null;
+    }
+    if (!sessionId) {
+        return;
+    }
+    const level = logLevelSelect.value;
+    electronAPI.sendBackendRequest({ type: 'get_session_log', session_id: sessionId, level: level });
+    if (logFollowCheckbox.checked) {
+        electronAPI.sendBackendRequest({ type: 'tail_session_log', session_id: sessionId, level: level,
+                                         lines_per_sec: SESSION_LOG_TAIL_RATE });
+    }
+}
+
 function updateProfileList(profiles) {
     // Clear existing options in the select dropdown
     profileSelect.innerHTML = '';
@@ -205,16 +377,191 @@ function updateProfileList(profiles) {
         sortedProfileNames.forEach(profileName => {
             const option = document.createElement('option');
             option.value = profileName;
-            option.textContent = profileName;
+            option.textContent = profileOptionLabel(profileName);
             profileSelect.appendChild(option);
         });
         // Select the first profile by default and display its details
         profileSelect.value = sortedProfileNames[0];
+        renderSelectedSessionStatus();
         updateProfileDetails();
+        showSessionLog();
     }
     // Ensure button states are correct after updating the list
-    updateButtonStates(statusText.textContent === 'Connected' || statusText.textContent === 'Connecting...');
+    updateButtonStates(['Connected', 'Connecting...', 'Standby'].includes(statusText.textContent));
+
+}
+
+function insertProfileOption(profileName) {
+    // Insert an option keeping the dropdown sorted, without touching the other options
+    const options = profileSelect.options;
+    let low = 0;
+    let high = options.length;
+    while (low < high) {
+        const mid = (low + high) >> 1;
+        if (options[mid].value < profileName) {
+            low = mid + 1;
+        } else {
+            high = mid;
+        }
+    }
+    if (low < options.length && options[low].value === profileName) {
+        return; // Already listed
+    }
+    const option = document.createElement('option');
+    option.value = profileName;
+    option.textContent = profileOptionLabel(profileName);
+    profileSelect.insertBefore(option, options[low] || null);
+}
+
+function profileOptionLabel(profileName) {
+    // Profile name followed by the latency badge of its last probe, if any
+    const result = probeResults[profileName];
+    if (!result) {
+        return profileName;
+    }
+    return result.reachable ? `${profileName}  (${Math.round(result.latency_ms)} ms)` : `${profileName}  (unreachable)`;
+}
 
+function updateProfileOptionLabel(profileName) {
+    // Results stream in quickly; relabel the changed options in one pass per frame
+    if (pendingProbeLabels.size === 0) {
+        requestAnimationFrame(() => {
+            Array.from(profileSelect.options).forEach(option => {
+                if (pendingProbeLabels.has(option.value)) {
+                    const result = probeResults[option.value];
+                    option.textContent = profileOptionLabel(option.value);
+                    option.title = result.error || result.banner || '';
+                }
+            });
+            pendingProbeLabels.clear();
+        });
+    }
+    pendingProbeLabels.add(profileName);
+}
+
+function removeProfileOption(profileName) {
+    const option = Array.from(profileSelect.options).find(opt => opt.value === profileName);
+    if (option) {
+        option.remove();
+    }
+}
+
+function refreshProfileSelectState(previousSelection) {
+    // Keep the placeholder, buttons and details in sync after incremental list changes
+    const placeholder = profileSelect.querySelector('option[value=""]');
+    const profileCount = profileSelect.options.length - (placeholder ? 1 : 0);
+    if (profileCount === 0) {
+        if (!placeholder) {
+            const option = document.createElement('option');
+            option.value = '';
+            option.textContent = 'No profiles available';
+            profileSelect.appendChild(option);
+        }
+        profileSelect.disabled = true;
+        editButton.disabled = true;
+        deleteButton.disabled = true;
+        profileDetailsText.textContent = 'No profiles available.';
+    } else {
+        if (placeholder) {
+            placeholder.remove();
+        }
+        profileSelect.disabled = false;
+        editButton.disabled = false;
+        deleteButton.disabled = false;
+        if (!profileSelect.value) {
+            profileSelect.selectedIndex = 0;
+        }
+        if (profileSelect.value !== previousSelection) {
+            renderSelectedSessionStatus();
+            updateProfileDetails();
+            showSessionLog();
+        }
+    }
+    updateButtonStates(['Connected', 'Connecting...', 'Standby'].includes(statusText.textContent));
+}
+
+function applyProfilesPage(message) {
+    // Pages arrive in name order; the first page (no cursor) starts a fresh list
+    const previousSelection = profileSelect.value;
+    if (!message.cursor) {
+        profileSelect.innerHTML = '';
+        pendingListRevision = message.revision;
+    }
+    Object.keys(message.data).forEach(profileName => {
+        const option = document.createElement('option');
+        option.value = profileName;
+        option.textContent = profileOptionLabel(profileName);
+        profileSelect.appendChild(option);
+    });
+    if (message.next_cursor) {
+        electronAPI.sendBackendRequest({ type: 'list_profiles', cursor: message.next_cursor, limit: PROFILE_PAGE_SIZE });
+        return;
+    }
+    if (previousSelection && Array.from(profileSelect.options).some(opt => opt.value === previousSelection)) {
+        profileSelect.value = previousSelection; // Keep the user's selection across a reload
+    }
+    refreshProfileSelectState(previousSelection);
+    // Catch up on edits made while the pages were being fetched
+    profilesRevision = pendingListRevision;
+    pendingListRevision = null;
+    requestProfileChanges();
+}
+
+function applyProfilesDelta(delta) {
+    if (delta.reset) {
+        requestProfilesList();
+        return;
+    }
+    if (profilesRevision !== null && delta.revision <= profilesRevision) {
+        return; // Stale or duplicate delta
+    }
+    if (profileSearchInput.value.trim()) {
+        // The dropdown shows ranked search results; re-run the search instead of merging names
+        profilesRevision = delta.revision;
+        requestSearch();
+        return;
+    }
+    const previousSelection = profileSelect.value;
+    delta.removed.forEach(removeProfileOption);
+    Object.keys(delta.added).forEach(insertProfileOption);
+    profilesRevision = delta.revision;
+    refreshProfileSelectState(previousSelection);
+    if (previousSelection && profileSelect.value === previousSelection && previousSelection in delta.changed) {
+        updateProfileDetails(); // The selected profile was edited
+    }
+}
+
+function requestSearch() {
+    const query = profileSearchInput.value.trim();
+    if (!query) {
+        requestProfilesList(); // Back to the full, name-ordered list
+        return;
+    }
+    electronAPI.sendBackendRequest({ type: 'search_profiles', query: query, limit: SEARCH_RESULT_LIMIT });
+}
+
+function showSearchResults(message) {
+    // Replace the dropdown with the ranked matches (the backend already capped them)
+    const previousSelection = profileSelect.value;
+    profileSelect.innerHTML = '';
+    // Group the results under a label that says how many matched in total
+    const group = document.createElement('optgroup');
+    group.label = message.truncated
+        ? `Top ${message.results.length} of ${message.total} matches, refine the search`
+        : `${message.total} matches`;
+    message.results.forEach(result => {
+        const option = document.createElement('option');
+        option.value = result.name;
+        option.textContent = profileOptionLabel(result.name);
+        group.appendChild(option);
+    });
+    if (message.results.length > 0) {
+        profileSelect.appendChild(group);
+    }
+    if (message.results.some(result => result.name === previousSelection)) {
+        profileSelect.value = previousSelection;
+    }
+    refreshProfileSelectState(previousSelection);
 }
 
 function updateProfileDetails() {
@@ -234,11 +581,20 @@ function displayProfileDetails(profileName, profile) {
     details += `Hostname: ${profile.hostname || 'N/A'}\n`;
     details += `Username: ${profile.username || 'N/A'}\n`;
     details += `SSH Port: ${profile.port || 22}\n`;
+    if (profile.tags && profile.tags.length > 0) {
+        details += `Tags: ${profile.tags.join(', ')}\n`;
+    }
+    if (profile.auto_reconnect) {
+        details += "Auto-reconnect: on\n";
+    }
+    if (profile.lazy) {
+        details += `Lazy: starts on first connection, stops after ${profile.idle_timeout || 300} s idle\n`;
+    }
     details += "Port Forwards (-L local:remote_host:remote_port):\n";
     const forwards = profile.forwards || [];
     if (forwards.length > 0) {
         forwards.forEach(fwd => {
-            details += `  - ${fwd.local_port || '?'}:${fwd.remote_host || '?'}:${fwd.remote_port || '?'}\n`;
+            details += `  - ${fwd.local_port || '?'}:${fwd.remote_host || '?'}:${fwd.remote_port || '?'}${fwd.metered ? ' (metered)' : ''}\n`;
         });
     } else {
         details += "  No port forwards configured.\n";
@@ -247,18 +603,17 @@ function displayProfileDetails(profileName, profile) {
 }
 
 
-function addPortForwardEntry(localPort = '', remoteHost = '', remotePort = '') {
+function addPortForwardEntry(localPort = '', remoteHost = '', remotePort = '', metered = false) {
     // Create a new div to hold the port forward input fields and remove button
     const entryDiv = document.createElement('div');
     entryDiv.classList.add('port-forward-entry'); // Add class for styling and selection
 
     // Create input fields for local port, remote host, and remote port
     const localPortInput = document.createElement('input');
-    localPortInput.type = 'number';
+    localPortInput.type = 'text'; // A port number or "auto"
     localPortInput.placeholder = 'Local Port';
+    localPortInput.title = 'Port number, or "auto" to pick a free port when connecting';
     localPortInput.value = localPort;
-    localPortInput.min = 1; // Add basic validation
-    localPortInput.max = 65535;
 
     const colon1 = document.createElement('span');
     colon1.textContent = ':';
@@ -278,6 +633,16 @@ function addPortForwardEntry(localPort = '', remoteHost = '', remotePort = '') {
     remotePortInput.min = 1; // Add basic validation
     remotePortInput.max = 65535;
 
+    // Metered forwards are relayed by the backend so their traffic can be counted
+    const meteredLabel = document.createElement('label');
+    meteredLabel.title = 'Count bytes, connections and latency of this forward';
+    const meteredInput = document.createElement('input');
+    meteredInput.type = 'checkbox';
+    meteredInput.classList.add('metered-input');
+    meteredInput.checked = metered;
+    meteredLabel.appendChild(meteredInput);
+    meteredLabel.appendChild(document.createTextNode(' Metered'));
+
     // Create a button to remove this port forward entry
     const removeButton = document.createElement('button');
     removeButton.textContent = 'Remove';
@@ -293,6 +658,7 @@ function addPortForwardEntry(localPort = '', remoteHost = '', remotePort = '') {
     entryDiv.appendChild(remoteHostInput);
     entryDiv.appendChild(colon2);
     entryDiv.appendChild(remotePortInput);
+    entryDiv.appendChild(meteredLabel);
     entryDiv.appendChild(removeButton);
 
     // Append the entry div to the container in the HTML
@@ -316,15 +682,20 @@ function populateProfileForm(profile = null) {
         profileNameInput.value = profile.name;
         profileNameInput.disabled = true; // Prevent changing the profile name when editing
         editingProfileName = profile.name; // Store the name of the profile being edited
+        editingProfileData = profile;
 
         hostnameInput.value = profile.hostname || '';
         usernameInput.value = profile.username || '';
         portInput.value = profile.port || 22;
+        tagsInput.value = (profile.tags || []).join(', ');
+        autoReconnectInput.checked = Boolean(profile.auto_reconnect);
+        lazyInput.checked = Boolean(profile.lazy);
+        idleTimeoutInput.value = profile.idle_timeout || '';
 
         // Add port forward entries from the profile data
         if (profile.forwards) {
             profile.forwards.forEach(fwd => {
-                addPortForwardEntry(fwd.local_port, fwd.remote_host, fwd.remote_port);
+                addPortForwardEntry(fwd.local_port, fwd.remote_host, fwd.remote_port, Boolean(fwd.metered));
             });
         }
         saveProfileButton.textContent = 'Save Changes';
@@ -334,15 +705,20 @@ function populateProfileForm(profile = null) {
         profileNameInput.value = '';
         profileNameInput.disabled = false; // Allow entering a new profile name
         editingProfileName = null; // Not editing any profile
+        editingProfileData = null;
 
         hostnameInput.value = '';
         usernameInput.value = '';
         portInput.value = 22; // Set default port
+        tagsInput.value = '';
+        autoReconnectInput.checked = false;
+        lazyInput.checked = false;
+        idleTimeoutInput.value = '';
 
         saveProfileButton.textContent = 'Save Profile';
     }
     // Ensure button states are correct after populating the form
-    updateButtonStates(statusText.textContent === 'Connected' || statusText.textContent === 'Connecting...');
+    updateButtonStates(['Connected', 'Connecting...', 'Standby'].includes(statusText.textContent));
 }
 
 function clearProfileForm() {
@@ -395,7 +771,7 @@ function validateProfileForm() {
         if (localPort || remoteHost || remotePort) {
             // If any part is filled, all parts must be valid
             let forwardIsValid = true;
-            if (!localPort || isNaN(parseInt(localPort, 10)) || parseInt(localPort, 10) < 1 || parseInt(localPort, 10) > 65535) {
+            if (localPort !== 'auto' && (!/^\d+$/.test(localPort) || parseInt(localPort, 10) < 1 || parseInt(localPort, 10) > 65535)) {
                  localPortInput.classList.add('error');
                  forwardIsValid = false;
             }
@@ -419,8 +795,22 @@ function validateProfileForm() {
 
 
 // --- Event Listeners ---
+// Search as the user types, debounced so each keystroke does not hit the backend
+profileSearchInput.addEventListener('input', () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(requestSearch, SEARCH_DEBOUNCE_MS);
+});
+
 // Listen for changes in the profile select dropdown
-profileSelect.addEventListener('change', updateProfileDetails);
+profileSelect.addEventListener('change', () => {
+    renderSelectedSessionStatus();
+    updateProfileDetails();
+    showSessionLog();
+});
+
+// Reload the session log when the level filter or follow mode changes
+logLevelSelect.addEventListener('change', showSessionLog);
+logFollowCheckbox.addEventListener('change', showSessionLog);
 
 // Listen for click on the Connect button
 connectButton.addEventListener('click', () => {
@@ -428,6 +818,7 @@ connectButton.addEventListener('click', () => {
     if (selectedProfileName) {
         // Send a request to the backend to connect to the selected profile
         electronAPI.sendBackendRequest({ type: 'connect', profile_name: selectedProfileName });
+        sessionStatuses[selectedProfileName] = { status: 'Connecting...', message: '' };
         statusText.textContent = 'Connecting...'; // Optimistically update status
         statusText.className = '';
         statusText.classList.add('Connecting');
@@ -440,8 +831,8 @@ connectButton.addEventListener('click', () => {
 
 // Listen for click on the Disconnect button
 disconnectButton.addEventListener('click', () => {
-    // Send a request to the backend to disconnect the active SSH connection
-    electronAPI.sendBackendRequest({ type: 'disconnect' });
+    // Send a request to the backend to disconnect the selected profile's session
+    electronAPI.sendBackendRequest({ type: 'disconnect', session_id: profileSelect.value });
     statusText.textContent = 'Disconnecting...'; // Optimistically update status
     statusText.className = '';
     statusText.classList.add('Connecting'); // Use connecting color for disconnecting
@@ -477,6 +868,19 @@ deleteButton.addEventListener('click', () => {
     }
 });
 
+// Listen for click on the Import SSH Config button
+importConfigButton.addEventListener('click', () => {
+    // Import ~/.ssh/config and keep it in sync on every start
+    electronAPI.sendBackendRequest({ type: 'import_ssh_config', refresh_on_startup: true });
+});
+
+// Listen for click on the Check Hosts button
+probeButton.addEventListener('click', () => {
+    // Measure reachability of every profile; results within the backend's cache TTL are reused
+    probeButton.disabled = true;
+    electronAPI.sendBackendRequest({ type: 'probe_profiles', read_banner: true });
+});
+
 // Listen for click on the Add Port Forward button
 addForwardButton.addEventListener('click', () => {
     // Add a new empty set of port forward input fields to the form
@@ -496,6 +900,7 @@ saveProfileButton.addEventListener('click', () => {
     const hostname = hostnameInput.value.trim();
     const username = usernameInput.value.trim();
     const port = portInput.value.trim();
+    const tags = tagsInput.value.split(',').map(tag => tag.trim()).filter(tag => tag);
 
 
     // Collect data from all port forward entries
@@ -504,6 +909,7 @@ saveProfileButton.addEventListener('click', () => {
         const localPortInput = entryDiv.querySelector('input[placeholder="Local Port"]');
         const remoteHostInput = entryDiv.querySelector('input[placeholder="Remote Host"]');
         const remotePortInput = entryDiv.querySelector('input[placeholder="Remote Port"]');
+        const metered = entryDiv.querySelector('.metered-input').checked;
 
         const localPort = localPortInput.value.trim();
         const remoteHost = remoteHostInput.value.trim();
@@ -512,21 +918,35 @@ saveProfileButton.addEventListener('click', () => {
         // Only include complete and valid forward rules (validation already done)
         if (localPort && remoteHost && remotePort) {
              forwards.push({
-                local_port: parseInt(localPort, 10),
+                local_port: localPort === 'auto' ? 'auto' : parseInt(localPort, 10),
                 remote_host: remoteHost,
-                remote_port: parseInt(remotePort, 10)
+                remote_port: parseInt(remotePort, 10),
+                ...(metered ? { metered: true } : {})
             });
         }
     });
 
-    // Create the profile data object
+    // Create the profile data object. save_profile replaces the whole record, so an edit starts from
+    // the stored one to keep fields the form has no controls for (multiplex, connect_timeout, ...)
     const profileData = {
+        ...(editingProfileName ? editingProfileData : {}),
         name: profileName,
         hostname: hostname,
         username: username,
         port: parseInt(port, 10) || 22, // Default to 22 if not a valid number (should be caught by validation)
+        tags: tags,
+        auto_reconnect: autoReconnectInput.checked,
         forwards: forwards
     };
+    delete profileData.lazy;
+    delete profileData.idle_timeout;
+    if (lazyInput.checked) {
+        profileData.lazy = true;
+        const idleTimeout = parseInt(idleTimeoutInput.value, 10);
+        if (idleTimeout > 0) {
+            profileData.idle_timeout = idleTimeout;
+        }
+    }
 
     // Determine the request type based on whether we are editing or adding
     const requestType = editingProfileName ? 'save_profile' : 'add_profile';
@@ -542,8 +962,20 @@ saveProfileButton.addEventListener('click', () => {
 
 // --- Initial Load ---
 function requestProfilesList() {
-    // Request the initial list of profiles from the backend when the app starts
-    electronAPI.sendBackendRequest({ type: 'list_profiles' });
+    // Request the full list of profiles page by page (on start, or when a delta cannot be applied)
+    profilesRevision = null;
+    electronAPI.sendBackendRequest({ type: 'list_profiles', limit: PROFILE_PAGE_SIZE });
+}
+
+function requestProfileChanges() {
+    // Request only the profiles added, changed or removed since the revision we last applied
+    if (profilesRevision === null) {
+        if (pendingListRevision === null) {
+            requestProfilesList();
+        }
+        return;
+    }
+    electronAPI.sendBackendRequest({ type: 'list_profiles_since', since: profilesRevision });
 }
 
 // Request the initial list of profiles when the renderer process starts
@@ -7,57 +7,1406 @@ import json
 import threading
 import time
 import signal # Import signal to handle process termination
+import re
+import socket
+import asyncio
+import warnings
+import hashlib
+import tempfile
+import sqlite3
+import bisect
+import heapq
+import shlex
+import glob
+import fnmatch
+import struct
+import contextvars
+import random
+import functools
+import resource
+from collections import deque
+from dataclasses import dataclass, replace
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # --- Configuration ---
-PROFILES_FILE = "ssh_profiles.json"
+PROFILES_DB = "ssh_profiles.db"
+PROFILES_FILE = "ssh_profiles.json" # Legacy storage, migrated into PROFILES_DB on first start
+PROFILE_PAGE_DEFAULT_LIMIT = 200 # list_profiles page size when only a cursor is given
+PROFILE_PAGE_MAX_LIMIT = 5000 # Upper bound on a single list_profiles page
+PROFILE_TOMBSTONE_RETENTION = 10000 # Revisions a deletion stays in the store's changes; older clients are sent a reset
+SSH_CONFIG_DIR = os.path.expanduser("~/.ssh")
+SSH_CONFIG_DEFAULT_PATH = os.path.join(SSH_CONFIG_DIR, "config")
+SSH_CONFIG_MAX_INCLUDE_DEPTH = 16 # Same nesting limit as OpenSSH
+SSH_CONFIG_KEYWORDS = ("hostname", "user", "port", "localforward") # Keywords mapped onto profiles
+SSH_CONFIG_LINE_RE = re.compile(r"(\w+)(?:\s*=\s*|\s+)(.*)")
+SSH_CONFIG_TAG = "ssh-config" # Tag given to imported profiles
+SEARCH_DEFAULT_LIMIT = 50 # search_profiles results returned when no limit is given
+SEARCH_MAX_LIMIT = 500 # Upper bound on search_profiles results
+SEARCH_FILTER_FIELDS = ("tag", "host", "user", "port", "lport", "rport") # field:value query filters
+
+# search_profiles ranking: exact name > name prefix > hostname prefix > name substring > fuzzy subsequence
+SEARCH_SCORE_EXACT = 1000
+SEARCH_SCORE_PREFIX = 900
+SEARCH_SCORE_HOST_PREFIX = 700
+SEARCH_SCORE_SUBSTRING = 600
+SEARCH_SCORE_FUZZY = 400
+SEARCH_SCORE_FILTER_ONLY = 100
+
+GROUP_CONNECT_DEFAULT_PARALLEL = 4 # Default concurrency limit for connect_group
+GROUP_CONNECT_SETTLE_TIMEOUT = 30 # Seconds a group member may stay in "Connecting..."
+DEFAULT_CONNECT_TIMEOUT = 15 # Seconds to wait for a session to become ready (per-profile "connect_timeout")
+FORWARD_PROBE_TIMEOUT = 0.5 # Seconds per TCP probe of a forwarded local port
+FORWARD_PROBE_INTERVAL = 0.1 # Seconds between TCP probe rounds
+PROBE_DEFAULT_PARALLEL = 32 # Hosts probe_profiles connects to at once unless max_parallel is given
+PROBE_MAX_PARALLEL = 256
+PROBE_DEFAULT_TIMEOUT = 2.0 # Seconds per host (resolve, connect and banner) unless timeout is given
+PROBE_CACHE_TTL = 120.0 # Seconds a probe result is reused before the host is probed again
+PROBE_BANNER_LIMIT = 1024 # Bytes read while looking for the SSH identification line
+RELAY_CHUNK = 64 * 1024 # Bytes moved per read by a metered forward's relay
+RELAY_BACKLOG = 128
+RELAY_CONNECT_TIMEOUT = 5 # Seconds allowed to connect a relayed client to ssh's internal forward port
+RELAY_USE_SPLICE = hasattr(os, "splice") # Zero-copy relaying in the threaded backend (Linux)
+FORWARD_STATS_INTERVAL = 5.0 # Seconds between forward_stats events while counters change
+FORWARD_STATS_RATE_WINDOW = 60.0 # Seconds of accepts behind connections_per_min
+FORWARD_STATS_LATENCY_SAMPLES = 256 # Recent connections kept for latency percentiles
+LAZY_IDLE_TIMEOUT = 300 # Seconds without traffic before a lazy tunnel stops ssh (per-profile "idle_timeout")
+LAZY_IDLE_CHECK_INTERVAL = 5.0 # Longest wait between idle checks of an active lazy tunnel
+SSH_ERROR_TAIL_LINES = 20 # Non-debug ssh lines kept for error messages
+KEEPALIVE_INTERVAL = 10 # ServerAliveInterval unless the profile sets "keepalive_interval" (0 disables)
+KEEPALIVE_COUNT_MAX = 3 # ServerAliveCountMax (missed keepalives before ssh gives up) unless the profile sets "keepalive_count_max"
+RECONNECT_INITIAL_BACKOFF = 1.0 # Seconds before the first reconnect attempt (before jitter)
+RECONNECT_MAX_BACKOFF = 60.0 # Upper bound for the doubling backoff
+RECONNECT_STABLE_AFTER = 60 # Seconds a reconnected session must stay up before the backoff resets
+AUTO_PORT_RANGE_ENV_VAR = "SSH_MANAGER_AUTO_PORT_RANGE" # "low-high" range for local_port "auto"
+DEFAULT_AUTO_PORT_RANGE = (20000, 29999) # Used unless the env var or the profile's auto_port_range says otherwise
+SESSION_LOG_BYTES = 256 * 1024 # Size of each per-profile ssh output ring buffer
+SESSION_LOG_MAX_LINE_BYTES = 4096 # Longer lines are truncated
+SESSION_LOG_DEFAULT_LIMIT = 200 # Lines returned by get_session_log unless a limit is given
+SESSION_LOG_MAX_LIMIT = 5000
+SESSION_LOG_TAIL_DEFAULT_RATE = 20 # Lines per second sent to a live tail unless configured
+SESSION_LOG_TAIL_MAX_RATE = 1000
+SESSION_LOG_HEADER = struct.Struct("<BH") # Level index, line length
+LOG_LEVELS = ("debug", "info", "error")
+SSH_NOT_FOUND_MESSAGE = "'ssh' command not found. Is OpenSSH installed and in your PATH?"
+BATCH_MAX_REQUESTS = 1000 # Sub-requests allowed in one batch request
+REQUEST_LINE_LIMIT = 16 * 1024 * 1024 # Longest request line the asyncio reader accepts
+ASYNCIO_ENV_VAR = "SSH_MANAGER_ASYNCIO" # Set to 1 (or pass --asyncio) to run the asyncio backend
+CONTROL_COMMAND_TIMEOUT = 10 # Seconds allowed for an `ssh -O` request against a ControlMaster
+METRICS_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000) # Histogram bounds
+METRICS_MAX_REQUEST_TYPES = 64 # Request types with their own histogram; further unknown types share "other"
+
+# Milestones in the ssh -v stream used to detect when a session is usable
+SSH_AUTHENTICATED_RE = re.compile(r"Authenticated to |Authentication succeeded")
+SSH_FORWARD_LISTENING_RE = re.compile(r"Local connections to \S+:(\d+) forwarded|Local forwarding listening on \S+ port (\d+)")
+SSH_FORWARD_FAILED_RE = re.compile(r"cannot listen to port: (\d+)")
+SSH_SESSION_ENTERED_RE = re.compile(r"Entering interactive session")
+SSH_LOG_ERROR_RE = re.compile(r"error|fail|denied|refused|timed out|could not|cannot|not resolve|no route|broken pipe|closed by", re.I)
 
 # --- Global variables ---
 SSH_PROFILES = {}
-active_ssh_process = None # To store the currently active SSH subprocess
-
-# --- Functions for loading and saving profiles ---
-def load_profiles():
-    """Loads SSH profiles from a JSON file."""
-    global SSH_PROFILES
-    if os.path.exists(PROFILES_FILE):
+PROFILE_REVISIONS = {} # Profile name -> store revision that last wrote it
+COMPILED_PROFILES = {} # Profile name -> CompiledProfile; stale once PROFILE_REVISIONS moves past it
+PROFILE_STORE = None # ProfileStore opened by load_profiles
+SSH_CONFIG_CACHE = {} # Config file path -> ((mtime_ns, size), parsed items)
+SSH_SESSIONS = {} # Live sessions keyed by session id (the profile name)
+SESSION_LOGS = {} # SessionLog per session id; kept after the session ends so failures can be inspected
+RECONNECTS = {} # ReconnectState per profile under auto-reconnect supervision
+LIVE_PORTS = {} # Local port -> session whose ssh forwards it (or LazyTunnel listening on it)
+LAZY_TUNNELS = {} # Profile name -> LazyTunnel armed on its local ports
+CONTROL_MASTERS = {} # Shared ControlMaster connections keyed by (username, hostname, port)
+PROBE_CACHE = {} # (hostname, port) -> (monotonic time probed, probe result, banner was read)
+sessions_lock = threading.RLock() # Guards SSH_SESSIONS against the monitor/group threads
+output_lock = threading.Lock() # Keeps concurrent responses from interleaving on stdout
+probe_lock = threading.Lock() # Guards PROBE_CACHE against concurrent scans
+REQUEST_TIMINGS = {} # Request type -> LatencyHistogram of time spent in handle_request
+CONNECT_TIMINGS = {} # "spawn", "attach" or "cold_start" -> LatencyHistogram of time until Connected
+STORE_TIMINGS = {} # ProfileStore operation -> LatencyHistogram
+metrics_lock = threading.Lock() # Guards the timing tables
+BACKEND_STARTED_AT = time.monotonic()
+BACKEND_LOOP = None # Event loop of the asyncio backend; None in the threaded backend
+BACKGROUND_TASKS = set() # Strong references to tasks scheduled by run_in_background
+# Set while a request is being handled: its request_id is echoed in every response it produces, and
+# inside a batch the responses are collected instead of written. Threads and background tasks started
+# by a request run outside this context, so their later events are sent as plain notifications.
+CURRENT_REQUEST_ID = contextvars.ContextVar("CURRENT_REQUEST_ID", default=None)
+RESPONSE_CAPTURE = contextvars.ContextVar("RESPONSE_CAPTURE", default=None)
+# Inside a batch on the asyncio backend: tasks whose replies the batch waits for before its next request
+BATCH_PENDING = contextvars.ContextVar("BATCH_PENDING", default=None)
+
+def new_event():
+    """Returns an event matching the active backend (asyncio or threaded)."""
+    return asyncio.Event() if BACKEND_LOOP is not None else threading.Event()
+
+@dataclass(frozen=True, slots=True)
+class CompiledProfile:
+    """A validated profile normalized into what connect needs, with its ssh argv prebuilt.
+
+    Built once per profile revision by compiled_profile, so connecting is a cache lookup.
+    """
+    name: str
+    revision: int
+    username: str # "" when the profile has none
+    hostname: str
+    port: int
+    forwards: tuple # (local_port or "auto", remote_host, remote_port) per forward rule
+    argv: tuple # Complete ssh argv; "auto" and metered local ports are filled in by command()
+    port_slots: tuple # (forward index, argv index) of each -L spec whose port is only known at connect time
+    metered: tuple # Indexes of forwards relayed by the backend to count their traffic
+    lazy: bool # Listen on the local ports and start ssh on the first connection
+    idle_timeout: float # Seconds without traffic before a lazy profile's ssh is stopped
+    connect_timeout: float
+    probe_forwards: bool
+    multiplex: bool
+    auto_port_range: tuple
+
+    @property
+    def master_key(self):
+        """Key under which profiles share a ControlMaster."""
+        return (self.username, self.hostname, self.port)
+
+    def command(self, ssh_ports):
+        """Returns the argv as a new list with the -L ports only known at connect time filled in.
+
+        ssh_ports maps forward index -> port ssh listens on: the claimed port, or a metered forward's internal port.
+        """
+        argv = list(self.argv)
+        for i, arg_index in self.port_slots:
+            _, remote_host, remote_port = self.forwards[i]
+            argv[arg_index] = forward_spec(ssh_ports[i], remote_host, remote_port)
+        return argv
+
+class ControlMaster:
+    """A shared ssh ControlMaster connection for one user@host:port."""
+
+    def __init__(self, key, control_path, destination):
+        self.key = key
+        self.control_path = control_path
+        self.destination = destination # Trailing argv naming the host, e.g. ["-p", "2222", "user@host"]
+        self.owner = None # SSHSession whose ssh process is the master
+        self.ready = False # Set once the master has authenticated and entered its session
+        self.profiles = set() # Session ids currently using this master
+
+    def is_alive(self):
+        """Returns True while the master ssh process is running."""
+        return self.owner is not None and self.owner.is_alive()
+
+    def is_usable(self):
+        """Returns True unless the master's owner has exited or failed to start."""
+        if self.owner is None or self.owner.is_alive():
+            return True
+        return self.owner.is_spawning()
+
+class SessionLog:
+    """Bounded ring of ssh output lines for one profile, packed into a single bytearray.
+
+    Each line is stored as a (level, length) header followed by its UTF-8 bytes. When the buffer
+    is full the oldest lines are dropped. Lines are numbered with a sequence number that keeps
+    counting across reconnects, so clients can ask for everything after the last line they saw.
+    """
+
+    def __init__(self, session_id, capacity=SESSION_LOG_BYTES):
+        self.session_id = session_id
+        self.capacity = capacity
+        self.buffer = bytearray()
+        self.first_seq = 0 # Sequence number of the oldest line still in the buffer
+        self.next_seq = 0
+        self.lock = threading.Lock() # Appended to by the output readers, read by the request handler
+        # Live tail subscription: None when nobody is following this log
+        self.tail_level = None
+        self.tail_rate = SESSION_LOG_TAIL_DEFAULT_RATE
+        self.tail_tokens = 0.0
+        self.tail_refilled_at = 0.0
+        self.tail_suppressed = 0 # Lines skipped by the rate limit since the last tail message
+        self.tail_flush_scheduled = False # A report of tail_suppressed is due once the bucket refills
+
+    def append(self, text, level=None):
+        """Adds one line, classifying it unless a level is given, and forwards it to a live tail."""
+        text = text.rstrip("\r\n")
+        if level is None:
+            level = log_level_of(text)
+        data = text.encode(errors="replace")[:SESSION_LOG_MAX_LINE_BYTES]
+        tail_message = None
+        flush_delay = None
+        with self.lock:
+            overflow = len(self.buffer) + SESSION_LOG_HEADER.size + len(data) - self.capacity
+            if overflow > 0:
+                self._drop_oldest(overflow)
+            self.buffer += SESSION_LOG_HEADER.pack(level, len(data))
+            self.buffer += data
+            seq = self.next_seq
+            self.next_seq += 1
+            if self.tail_level is not None and level >= self.tail_level and self._take_tail_token():
+                tail_message = {"type": "session_log_tail", "session_id": self.session_id,
+                                "lines": [log_line(seq, level, data)], "suppressed": self.tail_suppressed}
+                self.tail_suppressed = 0
+            elif self.tail_level is not None and level >= self.tail_level:
+                self.tail_suppressed += 1
+                if not self.tail_flush_scheduled:
+                    # Reported with the next line let through, or on its own if the burst ends first
+                    self.tail_flush_scheduled = True
+                    flush_delay = (1 - self.tail_tokens) / self.tail_rate
+        if tail_message:
+            send_response(tail_message)
+        if flush_delay is not None:
+            schedule_tail_flush(self, flush_delay)
+
+    def _drop_oldest(self, needed):
+        """Drops whole lines from the head; at least a quarter of the buffer so the memmove is amortized."""
+        needed = max(needed, self.capacity // 4)
+        offset = 0
+        while offset < needed and offset < len(self.buffer):
+            _, length = SESSION_LOG_HEADER.unpack_from(self.buffer, offset)
+            offset += SESSION_LOG_HEADER.size + length
+            self.first_seq += 1
+        del self.buffer[:offset]
+
+    def _take_tail_token(self):
+        """Token bucket limiting the live tail to tail_rate lines per second."""
+        now = time.monotonic()
+        self.tail_tokens = min(float(self.tail_rate), self.tail_tokens + (now - self.tail_refilled_at) * self.tail_rate)
+        self.tail_refilled_at = now
+        if self.tail_tokens < 1:
+            return False
+        self.tail_tokens -= 1
+        return True
+
+    def read(self, since=None, limit=SESSION_LOG_DEFAULT_LIMIT, min_level=0):
+        """Returns (lines, next_seq, lines_lost) at or above min_level.
+
+        With since=None the newest `limit` lines are returned; otherwise the first `limit` lines
+        numbered `since` or later. next_seq is where the following read should continue.
+        """
+        with self.lock:
+            lines = deque(maxlen=limit) if since is None else []
+            next_seq = self.next_seq
+            seq = self.first_seq
+            offset = 0
+            while offset < len(self.buffer):
+                level, length = SESSION_LOG_HEADER.unpack_from(self.buffer, offset)
+                start = offset + SESSION_LOG_HEADER.size
+                offset = start + length
+                if (since is None or seq >= since) and level >= min_level:
+                    if since is not None and len(lines) == limit:
+                        next_seq = seq
+                        break
+                    lines.append(log_line(seq, level, self.buffer[start:offset]))
+                seq += 1
+            lines_lost = since is not None and since < self.first_seq
+        return list(lines), next_seq, lines_lost
+
+    def flush_tail(self):
+        """Sends the count of suppressed tail lines that no later line has reported yet."""
+        with self.lock:
+            self.tail_flush_scheduled = False
+            message = self._take_suppressed_message()
+        if message:
+            send_response(message)
+
+    def _take_suppressed_message(self):
+        """Returns a lines-free tail message carrying tail_suppressed and resets it, or None if there is nothing to report."""
+        if self.tail_level is None or not self.tail_suppressed:
+            return None
+        message = {"type": "session_log_tail", "session_id": self.session_id, "lines": [], "suppressed": self.tail_suppressed}
+        self.tail_suppressed = 0
+        return message
+
+    def set_tail(self, min_level, rate):
+        """Starts (or with min_level=None stops) the live tail at up to `rate` lines per second."""
+        with self.lock:
+            message = self._take_suppressed_message() # Lines suppressed under the old settings
+            self.tail_level = min_level
+            self.tail_rate = rate
+            self.tail_tokens = float(rate)
+            self.tail_refilled_at = time.monotonic()
+        if message:
+            send_response(message)
+
+def schedule_tail_flush(log, delay):
+    """Calls log.flush_tail after delay seconds in the active backend mode."""
+    if BACKEND_LOOP is not None:
+        async def flush():
+            await asyncio.sleep(delay)
+            log.flush_tail()
+        run_in_background(flush())
+    else:
+        timer = threading.Timer(delay, log.flush_tail)
+        timer.daemon = True
+        timer.start()
+
+def log_level_of(text):
+    """Classifies an ssh output line as debug, info or error."""
+    if text.startswith("debug"):
+        return LOG_LEVELS.index("debug")
+    if SSH_LOG_ERROR_RE.search(text):
+        return LOG_LEVELS.index("error")
+    return LOG_LEVELS.index("info")
+
+def log_line(seq, level, data):
+    """Returns the JSON form of one stored log line."""
+    return {"seq": seq, "level": LOG_LEVELS[level], "text": bytes(data).decode(errors="replace")}
+
+def session_log_for(session_id):
+    """Returns the log kept for a session id, creating it on first use."""
+    with sessions_lock:
+        log = SESSION_LOGS.get(session_id)
+        if log is None:
+            log = SESSION_LOGS[session_id] = SessionLog(session_id)
+        return log
+
+class ReconnectState:
+    """Auto-reconnect progress of one profile, carried across the sessions started for it."""
+
+    def __init__(self, profile_name):
+        self.profile_name = profile_name
+        self.attempt = 0 # Attempts since the connection was last stable
+        self.reconnects = 0 # Successful reconnects so far
+        self.backoff = 0.0 # Current backoff ceiling in seconds
+        self.down_since = None # time.monotonic() when the current outage began
+        self.last_recovery_ms = None # Time-to-recover of the last successful reconnect
+        self.timer = None # threading.Timer or asyncio.Task of the pending attempt
+        self.assigned_ports = {} # Forward index -> port picked for "auto", reused on the next attempt
+
+    def recovered(self):
+        """Records a successful reconnect."""
+        if self.down_since is not None:
+            self.last_recovery_ms = round((time.monotonic() - self.down_since) * 1000, 1)
+            self.down_since = None
+            self.reconnects += 1
+
+    def to_dict(self):
+        """Returns the supervisor state reported in status events."""
+        return {
+            "attempt": self.attempt,
+            "reconnects": self.reconnects,
+            "backoff_s": self.backoff,
+            "down_ms": round((time.monotonic() - self.down_since) * 1000, 1) if self.down_since is not None else None,
+            "last_recovery_ms": self.last_recovery_ms,
+        }
+
+class ForwardStats:
+    """Traffic counters of one metered forward, updated by its relay."""
+
+    def __init__(self, local_port, upstream_port, remote_host, remote_port):
+        self.local_port = local_port # User-facing port the relay listens on
+        self.upstream_port = upstream_port # Internal port ssh forwards
+        self.remote = f"{remote_host}:{remote_port}"
+        self.lock = threading.Lock() # Relay threads of several connections update the same counters
+        self.bytes_in = 0 # Client -> remote
+        self.bytes_out = 0 # Remote -> client
+        self.connections = 0
+        self.active = 0
+        self.failed = 0 # Connections dropped because the tunnel was not available
+        self.accepts = deque() # time.monotonic() of accepts within FORWARD_STATS_RATE_WINDOW
+        self.connect_ms = deque(maxlen=FORWARD_STATS_LATENCY_SAMPLES) # Accept -> connected through ssh
+        self.first_byte_ms = deque(maxlen=FORWARD_STATS_LATENCY_SAMPLES) # First request byte -> first response byte
+        self.last_activity = None
+
+    def opened(self):
+        """Counts a newly accepted connection."""
+        now = time.monotonic()
+        with self.lock:
+            self.connections += 1
+            self.active += 1
+            self.accepts.append(now)
+            self.last_activity = now
+
+    def closed(self, failed=False):
+        """Counts a finished connection."""
+        with self.lock:
+            self.active -= 1
+            self.failed += failed
+
+    def add(self, direction, count):
+        """Counts bytes relayed in direction 0 (client -> remote) or 1 (remote -> client)."""
+        with self.lock:
+            if direction:
+                self.bytes_out += count
+            else:
+                self.bytes_in += count
+            self.last_activity = time.monotonic()
+
+    def first_bytes(self, marks, direction):
+        """Records the first data of a connection; marks holds the first-data time per direction."""
+        if marks[direction] is not None:
+            return
+        marks[direction] = time.monotonic()
+        if direction and marks[0] is not None: # Only client-first protocols have a request/response latency
+            with self.lock:
+                self.first_byte_ms.append(round((marks[1] - marks[0]) * 1000, 2))
+
+    def to_dict(self):
+        """Returns the counters reported by get_forward_stats and forward_stats events."""
+        now = time.monotonic()
+        with self.lock:
+            while self.accepts and now - self.accepts[0] > FORWARD_STATS_RATE_WINDOW:
+                self.accepts.popleft()
+            return {
+                "local_port": self.local_port,
+                "upstream_port": self.upstream_port,
+                "remote": self.remote,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "connections": self.connections,
+                "active": self.active,
+                "failed": self.failed,
+                "connections_per_min": round(len(self.accepts) * 60 / FORWARD_STATS_RATE_WINDOW, 1),
+                "connect_ms": latency_summary(self.connect_ms),
+                "first_byte_ms": latency_summary(self.first_byte_ms),
+                "idle_s": round(now - self.last_activity, 1) if self.last_activity is not None else None,
+            }
+
+def latency_summary(samples):
+    """Returns p50/p95/max of recent latency samples, or None without samples."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {"p50": ordered[len(ordered) // 2], "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], "max": ordered[-1]}
+
+class ForwardRelay:
+    """Listens on a metered forward's local port and relays every connection to ssh's internal forward port."""
+
+    def __init__(self, session, stats):
+        self.session = session # SSHSession, or the LazyTunnel that starts one on demand
+        self.stats = stats
+        self.listener = None # Bound listening socket
+        self.server = None # asyncio.Server serving the listener in the asyncio backend
+        self.connections = set() # Open sockets (threaded) or transports (asyncio), closed with the relay
+        self.closed = False
+
+class RelayProtocol(asyncio.Protocol):
+    """One side of a connection relayed by the asyncio backend; what it receives is written to its peer."""
+
+    def __init__(self, relay, direction, marks):
+        self.relay = relay
+        self.direction = direction # 0 for the client side, 1 for the ssh side
+        self.marks = marks # First-data times shared by both sides
+        self.transport = None
+        self.peer = None
+        self.pending = [] # Data received before the peer was connected
+        self.eof = False
+        self.failed = False # Set when the tunnel could not be reached for this connection
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.relay.connections.add(transport)
+        if self.direction == 0:
+            self.relay.stats.opened()
+            run_in_background(connect_upstream_async(self.relay, self))
+
+    def data_received(self, data):
+        self.relay.stats.add(self.direction, len(data))
+        self.relay.stats.first_bytes(self.marks, self.direction)
+        if self.peer is None:
+            self.pending.append(data)
+        else:
+            self.peer.transport.write(data)
+
+    def eof_received(self):
+        self.eof = True
+        if self.peer is not None:
+            self.peer.transport.write_eof()
+            self.close_if_done()
+        return True # Keep the other direction open until the peer finishes too
+
+    def close_if_done(self):
+        """Closes both sides once each direction has reached EOF (buffered data is still flushed)."""
+        if self.eof and self.peer.eof:
+            self.transport.close()
+            self.peer.transport.close()
+
+    def connection_lost(self, exc):
+        self.relay.connections.discard(self.transport)
+        if self.direction == 0:
+            self.relay.stats.closed(self.failed)
+        if self.peer is not None:
+            self.peer.transport.close()
+
+    def pause_writing(self):
+        if self.peer is not None:
+            self.peer.transport.pause_reading() # Backpressure: stop reading what we cannot write
+
+    def resume_writing(self):
+        if self.peer is not None:
+            self.peer.transport.resume_reading()
+
+    def link(self, peer):
+        """Pairs two sides and flushes what arrived before the pairing."""
+        self.peer, peer.peer = peer, self
+        for side, other in ((self, peer), (peer, self)):
+            for data in side.pending:
+                other.transport.write(data)
+            side.pending = []
+            if side.eof:
+                other.transport.write_eof()
+        self.close_if_done()
+
+class LazyTunnel:
+    """A lazy profile armed on its local ports: ssh starts on the first connection and stops again when idle.
+
+    It takes a session's place in LIVE_PORTS and behind its relays, so it carries the same identifying fields.
+    In the threaded backend an armed tunnel costs an accept thread per forward and a stats thread, and
+    each open connection two relay threads; the asyncio backend serves all of them on its event loop.
+    """
+
+    def __init__(self, profile_name, idle_timeout):
+        self.session_id = profile_name
+        self.profile_name = profile_name
+        self.idle_timeout = idle_timeout
+        self.status = "Standby"
+        self.settled = new_event() # Set once armed (connect_group waits on it like on a session)
+        self.reconnect = None
+        self.local_ports = set() # Local ports claimed in LIVE_PORTS
+        self.assigned_ports = {} # Forward index -> port picked for a local_port of "auto"
+        self.ssh_ports = {} # Forward index -> internal port each activation's ssh forwards
+        self.relays = [] # ForwardRelay per forward, listening while the tunnel is armed
+        self.relays_closed = new_event()
+        self.log = session_log_for(profile_name)
+        self.session = None # SSHSession of the current or last activation
+        self.activation_lock = threading.Lock() # One ssh start for connections arriving together
+        self.activated_at = None # time.monotonic() when the current activation was triggered
+        self.activations = 0
+        self.cold_start_ms = deque(maxlen=FORWARD_STATS_LATENCY_SAMPLES) # Trigger -> forward ready, per activation
+        self.closed = False
+
+    def record_cold_start(self):
+        """Records how long the current activation took to become ready; returns it in milliseconds."""
+        cold_start_ms = round((time.monotonic() - self.activated_at) * 1000, 1)
+        self.cold_start_ms.append(cold_start_ms)
+        self.log.append(f"Lazy tunnel ready {cold_start_ms:.0f} ms after activation {self.activations}", LOG_LEVELS.index("info"))
+        return cold_start_ms
+
+    def to_dict(self):
+        """Returns the tunnel state reported by session_status."""
+        return {
+            "profile_name": self.profile_name,
+            "active": self.session is not None and get_session(self.session_id) is self.session,
+            "local_ports": sorted(relay.stats.local_port for relay in self.relays),
+            "idle_timeout_s": self.idle_timeout,
+            "activations": self.activations,
+            "last_cold_start_ms": self.cold_start_ms[-1] if self.cold_start_ms else None,
+            "cold_start_ms": latency_summary(self.cold_start_ms),
+        }
+
+class SSHSession:
+    """Tracks one ssh process started for a profile and its connection state."""
+
+    def __init__(self, profile_name):
+        self.session_id = profile_name
+        self.profile_name = profile_name
+        self.process = None
+        self.status = "Connecting..."
+        self.message = ""
+        self.started_at = time.time()
+        self.master = None # ControlMaster used by a multiplexed session
+        self.attached = False # True when the session rides on another session's master process
+        self.forward_specs = [] # "local_port:remote_host:remote_port" specs currently forwarded
+        self.settled = new_event() # Set once the session leaves "Connecting..."
+        # Readiness tracking, fed by the ssh -v output readers
+        self.spawned_at = None # time.monotonic() when ssh was started
+        self.connect_timeout = DEFAULT_CONNECT_TIMEOUT
+        self.probe_forwards = False
+        self.expected_ports = set()
+        self.listening_ports = set()
+        self.failed_ports = set()
+        self.milestones = {} # Milestone name -> milliseconds since spawn
+        self.error_lines = deque(maxlen=SSH_ERROR_TAIL_LINES)
+        self.log = session_log_for(self.session_id)
+        self.connected_at = None # time.monotonic() when the session last reported Connected
+        self.stop_requested = False # Set by disconnect so the supervisor leaves the session down
+        self.reconnect = None # ReconnectState when this session was started by the supervisor
+        self.local_ports = set() # Local ports claimed in LIVE_PORTS
+        self.assigned_ports = {} # Forward index -> port picked for a local_port of "auto"
+        self.relays = [] # ForwardRelay per metered forward
+        self.relays_closed = new_event() # Set once the relays are closed
+        self.tunnel = None # LazyTunnel this session was started for
+        self.idle_stopped = False # Set when a lazy tunnel stopped ssh for lack of traffic
+        self.progress = new_event() # Set whenever new output arrives or a pipe closes
+        self.output_done = new_event() # Set once ssh's stderr has closed
+
+    def is_alive(self):
+        """Returns True while the ssh process is still running."""
+        if self.attached:
+            return self.master.is_alive() and self.session_id in self.master.profiles
+        if self.process is None:
+            return False
+        if isinstance(self.process, subprocess.Popen):
+            return self.process.poll() is None
+        return self.process.returncode is None # asyncio.subprocess.Process
+
+    def is_spawning(self):
+        """Returns True while ssh is being started (or, for an attached session, its master is) and has no process yet."""
+        return self.process is None and not self.settled.is_set()
+
+    def elapsed_ms(self):
+        """Returns milliseconds since ssh was spawned."""
+        return round((time.monotonic() - self.spawned_at) * 1000, 1)
+
+    def note_output(self, line):
+        """Records readiness milestones found in a line of ssh -v output."""
+        if SSH_AUTHENTICATED_RE.search(line):
+            self.milestones.setdefault("authenticated", self.elapsed_ms())
+        elif SSH_SESSION_ENTERED_RE.search(line):
+            self.milestones.setdefault("session_entered", self.elapsed_ms())
+        else:
+            match = SSH_FORWARD_LISTENING_RE.search(line)
+            if match:
+                self.listening_ports.add(int(match.group(1) or match.group(2)))
+                if self.expected_ports <= self.listening_ports:
+                    self.milestones.setdefault("forwards_listening", self.elapsed_ms())
+            else:
+                match = SSH_FORWARD_FAILED_RE.search(line)
+                if match:
+                    self.failed_ports.add(int(match.group(1)))
+                if not line.startswith("debug"):
+                    self.error_lines.append(line.strip())
+        self.progress.set()
+
+    def is_ready(self):
+        """Returns True once ssh has entered its session with every forward listening."""
+        return "session_entered" in self.milestones and self.expected_ports <= self.listening_ports
+
+    def to_dict(self):
+        """Returns a JSON-serializable summary of the session."""
+        return {
+            "session_id": self.session_id,
+            "profile_name": self.profile_name,
+            "status": self.status,
+            "message": self.message,
+            "pid": self.process.pid if self.process else None,
+            "alive": self.is_alive(),
+            "multiplexed": self.master is not None,
+            "forwards": list(self.forward_specs),
+            "started_at": self.started_at,
+            "reconnect": self.reconnect.to_dict() if self.reconnect else None,
+            "assigned_ports": {str(i): port for i, port in self.assigned_ports.items()},
+            "metered_ports": [relay.stats.local_port for relay in self.relays],
+            "lazy": self.tunnel is not None,
+        }
+
+class LatencyHistogram:
+    """Counts of durations in the METRICS_BUCKETS_MS buckets, with their sum and maximum."""
+
+    def __init__(self):
+        self.counts = [0] * (len(METRICS_BUCKETS_MS) + 1) # The last bucket holds durations above the largest bound
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        """Adds one duration in milliseconds."""
+        self.counts[bisect.bisect_left(METRICS_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, fraction):
+        """Returns the upper bound of the bucket holding the given fraction of durations (the maximum for the last)."""
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(METRICS_BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= rank:
+                return round(min(bound, self.max_ms), 3)
+        return round(self.max_ms, 3)
+
+    def to_dict(self):
+        """Returns the histogram as reported by get_metrics."""
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(0.5) if self.count else None,
+            "p95_ms": self.percentile(0.95) if self.count else None,
+            "p99_ms": self.percentile(0.99) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "buckets": [{"le_ms": bound, "count": count}
+                        for bound, count in zip(METRICS_BUCKETS_MS + (None,), self.counts) if count],
+        }
+
+def observe_latency(table, key, ms):
+    """Adds a duration to the histogram of `key` in one of the metrics tables."""
+    with metrics_lock:
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = LatencyHistogram()
+        histogram.observe(ms)
+
+def timed_store_operation(operation):
+    """Decorates a ProfileStore method so its duration is recorded under `operation` in STORE_TIMINGS."""
+    def decorate(method):
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                observe_latency(STORE_TIMINGS, operation, (time.perf_counter() - started) * 1000)
+        return timed
+    return decorate
+
+class ProfileStore:
+    """SQLite-backed profile storage: one row per profile, so every edit is a single-row write.
+
+    Every write bumps a store-wide revision. Rows remember the revision that last touched them and
+    deletions leave a tombstone, so clients can ask for just the changes since a revision they saw.
+    Tombstones older than PROFILE_TOMBSTONE_RETENTION revisions are pruned; tombstone_floor is the
+    newest pruned revision, so changes since an older revision are no longer complete.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock() # One connection shared by the request, monitor and group threads
+        # Autocommit mode; multi-row writes open their own transaction
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL keeps each commit atomic; NORMAL sync only risks the last commits on power loss, never corruption
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS profiles (name TEXT PRIMARY KEY, data TEXT NOT NULL, "
+                          "rev INTEGER NOT NULL DEFAULT 0, created_rev INTEGER NOT NULL DEFAULT 0)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS tombstones (name TEXT PRIMARY KEY, rev INTEGER NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS ssh_config_cache (path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, "
+                          "size INTEGER NOT NULL, items TEXT NOT NULL)")
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(profiles)")}
+        if "rev" not in columns: # Stores created before revisions were tracked start at revision 1
+            with self.transaction():
+                self.conn.execute("ALTER TABLE profiles ADD COLUMN rev INTEGER NOT NULL DEFAULT 1")
+                self.conn.execute("ALTER TABLE profiles ADD COLUMN created_rev INTEGER NOT NULL DEFAULT 1")
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('revision', '1')")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS profiles_rev ON profiles (rev)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS tombstones_rev ON tombstones (rev)")
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        self.revision = int(row[0]) if row else 0
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'tombstone_floor'").fetchone()
+        self.tombstone_floor = int(row[0]) if row else 0
+
+    @timed_store_operation("load_all")
+    def load_all(self):
+        """Returns every stored profile as a {name: data} dictionary."""
+        with self.lock:
+            rows = self.conn.execute("SELECT name, data FROM profiles").fetchall()
+        return {name: json.loads(data) for name, data in rows}
+
+    @timed_store_operation("revisions")
+    def revisions(self):
+        """Returns the revision that last wrote each profile as a {name: revision} dictionary."""
+        with self.lock:
+            return dict(self.conn.execute("SELECT name, rev FROM profiles").fetchall())
+
+    @timed_store_operation("put")
+    def put(self, name, data):
+        """Inserts or replaces one profile; returns the new revision."""
+        return self._put_rows([(name, data)])
+
+    @timed_store_operation("put_many")
+    def put_many(self, items):
+        """Inserts or replaces several (name, data) profiles in one transaction; returns the new revision."""
+        return self._put_rows(items)
+
+    def _put_rows(self, items):
+        """Writes (name, data) profiles in one transaction under a new revision."""
+        with self.lock:
+            with self.transaction():
+                revision = self._next_revision()
+                rows = [(name, json.dumps(data), revision, revision) for name, data in items]
+                self.conn.executemany(
+                    "INSERT INTO profiles (name, data, rev, created_rev) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET data = excluded.data, rev = excluded.rev", rows)
+                self.conn.executemany("DELETE FROM tombstones WHERE name = ?", ((row[0],) for row in rows))
+            return revision
+
+    @timed_store_operation("delete")
+    def delete(self, name):
+        """Deletes one profile, leaving a tombstone; returns the new revision."""
+        with self.lock:
+            with self.transaction():
+                revision = self._next_revision()
+                self.conn.execute("DELETE FROM profiles WHERE name = ?", (name,))
+                self.conn.execute("INSERT OR REPLACE INTO tombstones (name, rev) VALUES (?, ?)", (name, revision))
+                self._prune_tombstones(revision - PROFILE_TOMBSTONE_RETENTION)
+            return revision
+
+    def _prune_tombstones(self, floor):
+        """Drops tombstones at or below revision `floor` inside the caller's transaction."""
+        if floor <= self.tombstone_floor:
+            return
+        self.conn.execute("DELETE FROM tombstones WHERE rev <= ?", (floor,))
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('tombstone_floor', ?)", (str(floor),))
+        self.tombstone_floor = floor
+
+    def _next_revision(self):
+        """Advances the revision counter inside the caller's transaction."""
+        revision = self.revision + 1
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('revision', ?)", (str(revision),))
+        self.revision = revision
+        return revision
+
+    @timed_store_operation("changes_since")
+    def changes_since(self, since):
+        """Returns (revision, added names, changed names, removed names) after revision `since`."""
+        with self.lock:
+            rows = self.conn.execute("SELECT name, created_rev FROM profiles WHERE rev > ?", (since,)).fetchall()
+            removed = [row[0] for row in self.conn.execute("SELECT name FROM tombstones WHERE rev > ?", (since,))]
+            revision = self.revision
+        added = [name for name, created_rev in rows if created_rev > since]
+        changed = [name for name, created_rev in rows if created_rev <= since]
+        return revision, added, changed, removed
+
+    @timed_store_operation("page")
+    def page(self, cursor, limit):
+        """Returns (revision, names after `cursor` in name order, next cursor or None)."""
+        with self.lock:
+            names = [row[0] for row in self.conn.execute(
+                "SELECT name FROM profiles WHERE name > ? ORDER BY name LIMIT ?", (cursor or "", limit + 1))]
+            revision = self.revision
+        if len(names) > limit:
+            return revision, names[:limit], names[limit - 1]
+        return revision, names, None
+
+    def get_meta(self, key):
+        """Returns a stored metadata value, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        """Stores a metadata value."""
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def get_config_cache(self, path):
+        """Returns ((mtime_ns, size), parsed items) cached for an SSH config file, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT mtime_ns, size, items FROM ssh_config_cache WHERE path = ?", (path,)).fetchone()
+        return ((row[0], row[1]), json.loads(row[2])) if row else None
+
+    def put_config_cache(self, path, signature, items):
+        """Caches the parsed items of an SSH config file under its (mtime_ns, size)."""
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO ssh_config_cache (path, mtime_ns, size, items) VALUES (?, ?, ?, ?)",
+                              (path, signature[0], signature[1], json.dumps(items)))
+
+    def transaction(self):
+        """Returns a context manager wrapping the enclosed statements in BEGIN/COMMIT."""
+        store = self
+
+        class Transaction:
+            def __enter__(self):
+                store.conn.execute("BEGIN IMMEDIATE")
+
+            def __exit__(self, exc_type, exc, tb):
+                store.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+                return False
+
+        return Transaction()
+
+    @timed_store_operation("migrate_from_json")
+    def migrate_from_json(self, json_path):
+        """Imports a legacy JSON profile file once; returns (number imported, error)."""
+        if self.get_meta("json_migrated") or not os.path.exists(json_path):
+            return 0, None
         try:
-            with open(PROFILES_FILE, 'r') as f:
-                # Handle empty file case
+            with open(json_path, 'r') as f:
                 content = f.read()
-                if not content:
-                    SSH_PROFILES = {}
-                    return
-                SSH_PROFILES = json.loads(content)
-                # Ensure loaded data is a dictionary
-                if not isinstance(SSH_PROFILES, dict):
-                     send_response({"type": "error", "message": f"Profile file {PROFILES_FILE} contains invalid data format (not a dictionary). Resetting profiles."})
-                     SSH_PROFILES = {}
-
+            profiles = json.loads(content) if content else {}
         except json.JSONDecodeError:
-            send_response({"type": "error", "message": f"Could not decode JSON from {PROFILES_FILE}. File might be corrupted. Resetting profiles."})
-            SSH_PROFILES = {} # Start with empty profiles if file is corrupted
+            return 0, f"Could not decode JSON from {json_path}. File might be corrupted. It was not migrated."
         except Exception as e:
-            send_response({"type": "error", "message": f"An error occurred while loading profiles from {PROFILES_FILE}: {e}. Resetting profiles."})
-            SSH_PROFILES = {}
-    else:
-        SSH_PROFILES = {} # Start with empty profiles if file doesn't exist
+            return 0, f"An error occurred while reading profiles from {json_path}: {e}. It was not migrated."
+        if not isinstance(profiles, dict):
+            return 0, f"Profile file {json_path} contains invalid data format (not a dictionary). It was not migrated."
+
+        with self.lock:
+            with self.transaction():
+                revision = self._next_revision()
+                self.conn.executemany("INSERT OR REPLACE INTO profiles (name, data, rev, created_rev) VALUES (?, ?, ?, ?)",
+                                      ((name, json.dumps(data), revision, revision) for name, data in profiles.items()))
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)", (json_path,))
+        # Keep the old file as a backup, out of the way of future startups
+        os.replace(json_path, json_path + ".migrated")
+        return len(profiles), None
+
+# --- Profile search indexes ---
+class PrefixIndex:
+    """Maps lower-cased keys to profile names, with the keys kept sorted for prefix lookups."""
+
+    def __init__(self):
+        self.keys = [] # Sorted distinct keys
+        self.names = {} # Key -> set of profile names
+
+    def add(self, key, name):
+        """Indexes a profile name under a key."""
+        names = self.names.get(key)
+        if names is None:
+            names = self.names[key] = set()
+            bisect.insort(self.keys, key)
+        names.add(name)
+
+    def remove(self, key, name):
+        """Removes a profile name from a key, dropping the key once it is empty."""
+        names = self.names.get(key)
+        if names is None:
+            return
+        names.discard(name)
+        if not names:
+            del self.names[key]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def exact(self, key):
+        """Returns the names indexed under exactly this key."""
+        return self.names.get(key, set())
+
+    def prefix(self, prefix):
+        """Yields (key, names) for every key starting with prefix, in key order."""
+        for i in range(bisect.bisect_left(self.keys, prefix), len(self.keys)):
+            key = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            yield key, self.names[key]
+
+def char_mask(text):
+    """Returns a 64-bit set of the characters in text, used to skip hopeless fuzzy candidates quickly."""
+    mask = 0
+    for char in text:
+        mask |= 1 << (ord(char) & 63)
+    return mask
+
+def fuzzy_score(query, text):
+    """Scores query as an ordered subsequence of text (higher is tighter); None if it is not one."""
+    position = -1
+    gaps = 0
+    for char in query:
+        found = text.find(char, position + 1)
+        if found < 0:
+            return None
+        if position >= 0:
+            gaps += found - position - 1
+        position = found
+    return max(1, SEARCH_SCORE_FUZZY - gaps * 5 - (len(text) - len(query))) # Always below the substring tier
+
+class ProfileIndex:
+    """In-memory search indexes over the profiles, updated incrementally on every store write."""
+
+    def __init__(self):
+        self.by_name = PrefixIndex()
+        self.by_hostname = PrefixIndex()
+        self.by_username = PrefixIndex()
+        self.by_tag = PrefixIndex()
+        self.by_local_port = {} # Port -> set of profile names
+        self.by_remote_port = {}
+        self.masks = {} # Profile name -> char_mask of its lower-cased name
+        self.entries = {} # Profile name -> the keys it is indexed under, so it can be removed
+
+    def rebuild(self, profiles):
+        """Indexes every profile from scratch."""
+        self.__init__()
+        for name, profile in profiles.items():
+            self.add(name, profile)
+
+    def add(self, name, profile):
+        """Indexes one profile (replacing any earlier entry for the same name)."""
+        self.remove(name)
+        forwards = profile.get("forwards") if isinstance(profile.get("forwards"), list) else []
+        forwards = [fwd for fwd in forwards if isinstance(fwd, dict)]
+        entry = {
+            "name": name.lower(),
+            "hostname": str(profile.get("hostname") or "").lower(),
+            "username": str(profile.get("username") or "").lower(),
+            "tags": {str(tag).lower() for tag in profile.get("tags") or [] if isinstance(tag, str)},
+            "local_ports": {fwd.get("local_port") for fwd in forwards if isinstance(fwd.get("local_port"), int)},
+            "remote_ports": {fwd.get("remote_port") for fwd in forwards if isinstance(fwd.get("remote_port"), int)},
+        }
+        self.entries[name] = entry
+        self.masks[name] = char_mask(entry["name"])
+        self.by_name.add(entry["name"], name)
+        if entry["hostname"]:
+            self.by_hostname.add(entry["hostname"], name)
+        if entry["username"]:
+            self.by_username.add(entry["username"], name)
+        for tag in entry["tags"]:
+            self.by_tag.add(tag, name)
+        for port in entry["local_ports"]:
+            self.by_local_port.setdefault(port, set()).add(name)
+        for port in entry["remote_ports"]:
+            self.by_remote_port.setdefault(port, set()).add(name)
+
+    def remove(self, name):
+        """Drops one profile from every index."""
+        entry = self.entries.pop(name, None)
+        if entry is None:
+            return
+        del self.masks[name]
+        self.by_name.remove(entry["name"], name)
+        self.by_hostname.remove(entry["hostname"], name)
+        self.by_username.remove(entry["username"], name)
+        for tag in entry["tags"]:
+            self.by_tag.remove(tag, name)
+        for ports, index in ((entry["local_ports"], self.by_local_port), (entry["remote_ports"], self.by_remote_port)):
+            for port in ports:
+                names = index.get(port)
+                if names is not None:
+                    names.discard(name)
+                    if not names:
+                        del index[port]
+
+    def filter_names(self, field, value):
+        """Returns the names matching one field:value filter from the query."""
+        if field in ("port", "lport", "rport"):
+            if not value.isdigit():
+                return set()
+            port = int(value)
+            names = set()
+            if field in ("port", "lport"):
+                names |= self.by_local_port.get(port, set())
+            if field in ("port", "rport"):
+                names |= self.by_remote_port.get(port, set())
+            return names
+        index = {"host": self.by_hostname, "user": self.by_username, "tag": self.by_tag}[field]
+        names = set()
+        for _, matched in index.prefix(value):
+            names |= matched
+        return names
+
+    def search(self, query, limit):
+        """Returns (ranked [(score, name)] capped at limit, total number of matches)."""
+        text_terms = []
+        candidates = None # None means "every profile"
+        for token in query.lower().split():
+            field, sep, value = token.partition(":")
+            if sep and value and field in SEARCH_FILTER_FIELDS:
+                matched = self.filter_names(field, value)
+                candidates = matched if candidates is None else candidates & matched
+            else:
+                text_terms.append(token)
+
+        if not text_terms:
+            names = self.entries.keys() if candidates is None else candidates
+            return [(SEARCH_SCORE_FILTER_ONLY, name) for name in heapq.nsmallest(limit, names)], len(names)
+
+        text = " ".join(text_terms)
+        scores = {}
+        # Name and hostname prefixes come straight from the sorted indexes
+        for key, names in self.by_name.prefix(text):
+            score = SEARCH_SCORE_EXACT if key == text else max(SEARCH_SCORE_HOST_PREFIX + 1, SEARCH_SCORE_PREFIX - (len(key) - len(text)))
+            for name in names:
+                scores[name] = max(scores.get(name, 0), score)
+        for key, names in self.by_hostname.prefix(text):
+            for name in names:
+                scores[name] = max(scores.get(name, 0), SEARCH_SCORE_HOST_PREFIX)
+        # Substring and fuzzy-subsequence matches on names, prefiltered by character masks
+        mask = char_mask(text)
+        pool = self.masks.items() if candidates is None else ((name, self.masks[name]) for name in candidates)
+        for name, name_mask in pool:
+            if name in scores or name_mask & mask != mask:
+                continue
+            key = self.entries[name]["name"]
+            found = key.find(text)
+            if found >= 0:
+                scores[name] = max(SEARCH_SCORE_FUZZY + 1, SEARCH_SCORE_SUBSTRING - found)
+                continue
+            score = fuzzy_score(text, key)
+            if score is not None:
+                scores[name] = score
 
-def save_profiles():
-    """Saves current SSH profiles to a JSON file."""
+        if candidates is not None:
+            scores = {name: score for name, score in scores.items() if name in candidates}
+        ranked = heapq.nsmallest(limit, ((-score, name) for name, score in scores.items()))
+        return [(-score, name) for score, name in ranked], len(scores)
+
+# --- Functions for loading and saving profiles ---
+def load_profiles():
+    """Opens the profile store, migrating the legacy JSON file on first run, and loads all profiles."""
+    global SSH_PROFILES, PROFILE_STORE, PROFILE_REVISIONS
+    SSH_PROFILES = {}
+    PROFILE_REVISIONS = {}
+    COMPILED_PROFILES.clear()
     try:
-        with open(PROFILES_FILE, 'w') as f:
-            json.dump(SSH_PROFILES, f, indent=4)
-        return True, None
+        PROFILE_STORE = ProfileStore(PROFILES_DB)
     except Exception as e:
-        return False, f"An error occurred while saving profiles to {PROFILES_FILE}: {e}"
+        PROFILE_STORE = None
+        send_response({"type": "error", "message": f"Could not open profile store {PROFILES_DB}: {e}. Profiles cannot be saved."})
+        return
+
+    migrated, error = PROFILE_STORE.migrate_from_json(PROFILES_FILE)
+    if error:
+        send_response({"type": "error", "message": error})
+    elif migrated:
+        sys.stderr.write(f"Migrated {migrated} profiles from {PROFILES_FILE} to {PROFILES_DB}.\n")
+
+    try:
+        SSH_PROFILES = PROFILE_STORE.load_all()
+        PROFILE_REVISIONS = PROFILE_STORE.revisions()
+    except Exception as e:
+        send_response({"type": "error", "message": f"An error occurred while loading profiles from {PROFILES_DB}: {e}."})
+    PROFILE_INDEX.rebuild(SSH_PROFILES)
+
+def store_profile(profile_name, profile_data, compiled=None):
+    """Validates and persists one profile and updates the in-memory copy; returns (saved, error).
+
+    compiled is the profile's CompiledProfile when the caller has already compiled it.
+    """
+    if compiled is None:
+        compiled, error = compile_profile(profile_name, profile_data)
+        if error:
+            return False, error
+    if PROFILE_STORE is None:
+        return False, f"The profile store {PROFILES_DB} is not available."
+    try:
+        revision = PROFILE_STORE.put(profile_name, profile_data)
+    except Exception as e:
+        return False, f"An error occurred while saving profiles to {PROFILES_DB}: {e}"
+    previous = COMPILED_PROFILES.get(profile_name)
+    SSH_PROFILES[profile_name] = profile_data
+    PROFILE_REVISIONS[profile_name] = revision
+    COMPILED_PROFILES[profile_name] = replace(compiled, revision=revision)
+    PROFILE_INDEX.add(profile_name, profile_data)
+    sync_lazy_tunnel(profile_name, previous)
+    return True, None
+
+def remove_profile(profile_name):
+    """Deletes one profile from the store and from memory; returns (deleted, error)."""
+    if PROFILE_STORE is None:
+        return False, f"The profile store {PROFILES_DB} is not available."
+    try:
+        PROFILE_STORE.delete(profile_name)
+    except Exception as e:
+        return False, f"An error occurred while saving profiles to {PROFILES_DB}: {e}"
+    SSH_PROFILES.pop(profile_name, None)
+    PROFILE_REVISIONS.pop(profile_name, None)
+    COMPILED_PROFILES.pop(profile_name, None)
+    PROFILE_INDEX.remove(profile_name)
+    sync_lazy_tunnel(profile_name) # Frees the ports a deleted lazy profile listens on
+    return True, None
+
+PROFILE_INDEX = ProfileIndex()
+
+# --- OpenSSH config import ---
+def split_config_line(line):
+    """Splits a config line into (lower-cased keyword, list of arguments); None for blanks and comments."""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    match = SSH_CONFIG_LINE_RE.match(line)
+    if not match:
+        return None
+    try:
+        args = shlex.split(match.group(2), comments=True)
+    except ValueError:
+        args = match.group(2).split() # Unbalanced quotes: fall back to plain whitespace splitting
+    return match.group(1).lower(), args
+
+def parse_ssh_config_file(path):
+    """Stream-parses one config file into a list of items.
+
+    Items are ["host", patterns], ["match"], ["include", patterns] and
+    ["option", keyword, value] for the keywords the importer maps onto profiles.
+    """
+    items = []
+    with open(path, 'r', errors="replace") as f:
+        for line in f:
+            parsed = split_config_line(line)
+            if parsed is None:
+                continue
+            keyword, args = parsed
+            if keyword == "host":
+                items.append(["host", args])
+            elif keyword == "match":
+                items.append(["match"])
+            elif keyword == "include":
+                items.append(["include", args])
+            elif keyword in SSH_CONFIG_KEYWORDS and args:
+                items.append(["option", keyword, " ".join(args)])
+    return items
+
+def cached_ssh_config_items(path, stats):
+    """Returns the parsed items of one file, re-parsing only when its mtime or size changed."""
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = SSH_CONFIG_CACHE.get(path)
+    if cached is None and PROFILE_STORE is not None:
+        cached = PROFILE_STORE.get_config_cache(path)
+    if cached is not None and cached[0] == signature:
+        SSH_CONFIG_CACHE[path] = cached
+        stats["files_cached"] += 1
+        return cached[1]
+
+    items = parse_ssh_config_file(path)
+    SSH_CONFIG_CACHE[path] = (signature, items)
+    if PROFILE_STORE is not None:
+        PROFILE_STORE.put_config_cache(path, signature, items)
+    stats["files_parsed"] += 1
+    return items
+
+def flatten_ssh_config(path, stats, depth=0):
+    """Yields the items of a config file with its Include directives expanded in place."""
+    if depth > SSH_CONFIG_MAX_INCLUDE_DEPTH:
+        return
+    current_block = ["host", ["*"]] # Top-level lines apply to every host
+    for item in cached_ssh_config_items(path, stats):
+        if item[0] in ("host", "match"):
+            current_block = item
+        if item[0] != "include":
+            yield item
+            continue
+        for pattern in item[1]:
+            pattern = os.path.expanduser(pattern)
+            if not os.path.isabs(pattern):
+                pattern = os.path.join(SSH_CONFIG_DIR, pattern) # Relative includes live in ~/.ssh, as in ssh
+            for included in sorted(glob.glob(pattern)):
+                if os.path.isfile(included):
+                    yield from flatten_ssh_config(included, stats, depth + 1)
+        yield current_block # Lines after the Include belong to the enclosing block again
+
+def ssh_host_matches(patterns, alias):
+    """Applies OpenSSH Host pattern rules, including !negation, to one alias."""
+    matched = False
+    for pattern in patterns:
+        if pattern.startswith("!"):
+            if fnmatch.fnmatchcase(alias, pattern[1:]):
+                return False
+        elif fnmatch.fnmatchcase(alias, pattern):
+            matched = True
+    return matched
+
+def parse_local_forward(value):
+    """Maps a LocalForward value onto a profile forward dict, or None if it cannot be represented."""
+    parts = value.split()
+    if len(parts) != 2:
+        return None
+    listen, target = parts
+    local_port = listen.rsplit(":", 1)[-1] # The bind address, if any, is not part of the profile schema
+    if target.startswith("["):
+        host, _, port = target[1:].partition("]:")
+    else:
+        host, sep, port = target.rpartition(":")
+        if not sep:
+            host, _, port = target.partition("/")
+    if not local_port.isdigit() or not port.isdigit() or not host:
+        return None # Unix socket forwards and malformed rules
+    return {"local_port": int(local_port), "remote_host": host, "remote_port": int(port)}
+
+def read_ssh_config(path):
+    """Returns ({alias: profile data}, stats) for every concrete Host alias in a config file."""
+    stats = {"files_parsed": 0, "files_cached": 0}
+    blocks = [[None, []]] # [Host patterns (None = global), options]; "match" blocks are skipped
+    aliases = []
+    for item in flatten_ssh_config(path, stats):
+        if item[0] == "host":
+            blocks.append([item[1], []])
+            for pattern in item[1]:
+                if not any(char in pattern for char in "*?!") and pattern not in aliases:
+                    aliases.append(pattern)
+        elif item[0] == "match":
+            blocks.append(["match", []])
+        else:
+            blocks[-1][1].append((item[1], item[2]))
+
+    profiles = {}
+    for alias in aliases:
+        # First obtained value wins for each keyword; LocalForward accumulates like in ssh
+        options = {}
+        forwards = []
+        for patterns, block_options in blocks:
+            if patterns == "match" or (patterns is not None and not ssh_host_matches(patterns, alias)):
+                continue
+            for keyword, value in block_options:
+                if keyword == "localforward":
+                    forward = parse_local_forward(value)
+                    if forward and forward not in forwards:
+                        forwards.append(forward)
+                else:
+                    options.setdefault(keyword, value)
+        profile = {"hostname": options.get("hostname", alias).replace("%h", alias), "forwards": forwards,
+                   "tags": [SSH_CONFIG_TAG], "source": "ssh_config"}
+        if "user" in options:
+            profile["username"] = options["user"]
+        port = options.get("port")
+        profile["port"] = int(port) if port and port.isdigit() else port # Non-numeric ports fail validation
+        if profile["port"] is None:
+            profile["port"] = 22
+        profiles[alias] = profile
+    return profiles, stats
+
+def import_ssh_config(path, overwrite=False, prefix=""):
+    """Imports Host entries from an OpenSSH config in one batched store write; returns a summary response."""
+    try:
+        entries, stats = read_ssh_config(path)
+    except OSError as e:
+        return {"type": "error", "message": f"Could not read SSH config {path}: {e}"}
+
+    imported, updated, skipped, unchanged = [], [], [], 0
+    writes, compiled_writes = [], []
+    for alias, profile_data in entries.items():
+        profile_name = prefix + alias
+        compiled, error = compile_profile(profile_name, profile_data)
+        if error:
+            skipped.append({"name": profile_name, "reason": error})
+            continue
+        existing = SSH_PROFILES.get(profile_name)
+        if existing == profile_data:
+            unchanged += 1
+            continue
+        if existing is not None and existing.get("source") != "ssh_config" and not overwrite:
+            skipped.append({"name": profile_name, "reason": "A profile with this name already exists."})
+            continue
+        (updated if existing is not None else imported).append(profile_name)
+        writes.append((profile_name, profile_data))
+        compiled_writes.append(compiled)
+
+    if writes:
+        if PROFILE_STORE is None:
+            return {"type": "error", "message": f"The profile store {PROFILES_DB} is not available."}
+        try:
+            revision = PROFILE_STORE.put_many(writes)
+        except Exception as e:
+            return {"type": "error", "message": f"Failed to save imported profiles: {e}"}
+        for (profile_name, profile_data), compiled in zip(writes, compiled_writes):
+            previous = COMPILED_PROFILES.get(profile_name)
+            SSH_PROFILES[profile_name] = profile_data
+            PROFILE_REVISIONS[profile_name] = revision
+            COMPILED_PROFILES[profile_name] = replace(compiled, revision=revision)
+            PROFILE_INDEX.add(profile_name, profile_data)
+            if profile_name in LAZY_TUNNELS:
+                sync_lazy_tunnel(profile_name, previous) # Overwritten by a (never lazy) imported profile
+
+    return {
+        "type": "ssh_config_imported",
+        "message": f"Imported {len(imported)} and updated {len(updated)} profiles from {path}.",
+        "path": path,
+        "imported": imported,
+        "updated": updated,
+        "unchanged": unchanged,
+        "skipped": skipped,
+        "files_parsed": stats["files_parsed"],
+        "files_cached": stats["files_cached"],
+        "revision": PROFILE_STORE.revision if PROFILE_STORE else 0,
+    }
+
+def refresh_ssh_config_on_startup():
+    """Re-imports the SSH config remembered with refresh_on_startup, if any."""
+    if PROFILE_STORE is None:
+        return
+    path = PROFILE_STORE.get_meta("ssh_config_refresh_path")
+    if path and os.path.exists(path):
+        response = import_ssh_config(path, prefix=PROFILE_STORE.get_meta("ssh_config_refresh_prefix") or "")
+        if response["type"] == "error" or response["imported"] or response["updated"]:
+            send_response(response)
 
 # --- Communication Functions ---
 def send_response(message):
-    """Sends a JSON message to stdout."""
+    """Sends a JSON message to stdout as one line (NDJSON), tagged with the current request_id."""
     try:
         # Ensure message is a dictionary before dumping
         if isinstance(message, dict):
-            print(json.dumps(message), flush=True)
+            request_id = CURRENT_REQUEST_ID.get()
+            if request_id is not None and "request_id" not in message:
+                message = dict(message, request_id=request_id)
+            capture = RESPONSE_CAPTURE.get()
+            if capture is not None:
+                capture.append(message) # Part of a batch; sent together in its batch_result
+                return
+            line = json.dumps(message)
+            with output_lock:
+                print(line, flush=True)
         else:
             # Log an error if trying to send non-dict message
             sys.stderr.write(f"Attempted to send non-dictionary message: {message}\n")
@@ -72,85 +1421,880 @@ def send_response(message):
             pass # Give up if even basic error sending fails
 
 # --- Connection Status Management ---
-def update_connection_status(status, message=""):
+def update_connection_status(status, message="", session_id=None, **details):
     """Sends a connection status update to the frontend."""
-    send_response({"type": "connection_status", "status": status, "message": message})
+    response = {"type": "connection_status", "status": status, "message": message}
+    response.update(details)
+    if session_id is not None:
+        response["session_id"] = session_id
+        with sessions_lock:
+            session = SSH_SESSIONS.get(session_id)
+        if session:
+            session.status = status
+            session.message = message
+            if status == "Connected":
+                session.connected_at = time.monotonic()
+                if "handshake_ms" in details:
+                    observe_latency(CONNECT_TIMINGS, "attach" if session.attached else "spawn", details["handshake_ms"])
+                if session.reconnect is not None:
+                    session.reconnect.recovered()
+                    response["reconnect"] = session.reconnect.to_dict()
+                if session.tunnel is not None:
+                    response["cold_start_ms"] = session.tunnel.record_cold_start()
+                    observe_latency(CONNECT_TIMINGS, "cold_start", response["cold_start_ms"])
+            if status not in ("Connecting...", "Disconnecting..."):
+                session.settled.set()
+    send_response(response)
+
+def get_session(session_id):
+    """Returns the registered session for an id, or None."""
+    with sessions_lock:
+        return SSH_SESSIONS.get(session_id)
+
+def release_session(session):
+    """Removes a session from the registry if it is still the registered one."""
+    with sessions_lock:
+        if SSH_SESSIONS.get(session.session_id) is session:
+            del SSH_SESSIONS[session.session_id]
+        release_local_ports(session)
+    close_relays(session) # A lazy tunnel's relays belong to the tunnel, not to its sessions
+    session.settled.set()
 
 # --- Core Logic Functions ---
-def build_ssh_command(profile_name):
-    """Builds the ssh command string for a given profile."""
+# --- Compiled Profiles ---
+def forward_spec(local_port, remote_host, remote_port):
+    """Returns the ssh -L spec for a forward; IPv6 literal hosts are bracketed as ssh requires."""
+    if ":" in remote_host and not remote_host.startswith("["):
+        remote_host = f"[{remote_host}]"
+    return f"{local_port}:{remote_host}:{remote_port}"
+
+def compile_profile(profile_name, profile_data, revision=0):
+    """Validates profile data and builds its CompiledProfile; returns (compiled, error message)."""
+    error = validate_profile_data(profile_name, profile_data)
+    if error:
+        return None, error
+    username = profile_data.get("username") or ""
+    hostname = profile_data["hostname"]
+    port = profile_data.get("port") or 22
+
+    argv = ["ssh"]
+    if port != 22:
+        argv.extend(["-p", str(port)])
+    connect_timeout = profile_data.get("connect_timeout")
+    if connect_timeout:
+        # Let ssh give up on the TCP connect/banner exchange within the same budget
+        argv.extend(["-o", f"ConnectTimeout={max(1, int(connect_timeout))}"])
+    keepalive_interval = profile_data.get("keepalive_interval", KEEPALIVE_INTERVAL)
+    if keepalive_interval:
+        # Makes ssh exit when the server stops answering, so a dead tunnel is noticed within seconds
+        keepalive_count_max = profile_data.get("keepalive_count_max", KEEPALIVE_COUNT_MAX)
+        argv.extend(["-o", f"ServerAliveInterval={keepalive_interval}", "-o", f"ServerAliveCountMax={keepalive_count_max}"])
+
+    forwards = tuple((fwd["local_port"], fwd["remote_host"], fwd["remote_port"]) for fwd in profile_data.get("forwards") or [])
+    metered = tuple(i for i, fwd in enumerate(profile_data.get("forwards") or []) if fwd.get("metered"))
+    port_slots = []
+    for i, (local_port, remote_host, remote_port) in enumerate(forwards):
+        if local_port == "auto" or i in metered or profile_data.get("lazy"):
+            port_slots.append((i, len(argv) + 1))
+        argv.extend(["-L", forward_spec(local_port, remote_host, remote_port)])
+
+    argv.append(f"{username}@{hostname}" if username else hostname)
+    argv.append("-N") # Do not execute a remote command
+    argv.append("-v") # Verbose output drives readiness detection and the session log
+
+    return CompiledProfile(
+        name=profile_name,
+        revision=revision,
+        username=username,
+        hostname=hostname,
+        port=port,
+        forwards=forwards,
+        argv=tuple(argv),
+        port_slots=tuple(port_slots),
+        metered=metered,
+        lazy=bool(profile_data.get("lazy")),
+        idle_timeout=profile_data.get("idle_timeout") or LAZY_IDLE_TIMEOUT,
+        connect_timeout=connect_timeout or DEFAULT_CONNECT_TIMEOUT,
+        probe_forwards=bool(profile_data.get("probe_forwards")),
+        multiplex=bool(profile_data.get("multiplex")),
+        auto_port_range=tuple(profile_data.get("auto_port_range") or AUTO_PORT_RANGE),
+    ), None
+
+def compiled_profile(profile_name):
+    """Returns (CompiledProfile, error) for a saved profile, compiling it only when its revision changed."""
     profile = SSH_PROFILES.get(profile_name)
     if not profile:
         return None, f"Error: Profile '{profile_name}' not found."
+    revision = PROFILE_REVISIONS.get(profile_name, 0)
+    compiled = COMPILED_PROFILES.get(profile_name)
+    if compiled is not None and compiled.revision == revision:
+        return compiled, None
+    compiled, error = compile_profile(profile_name, profile, revision)
+    if compiled is not None:
+        COMPILED_PROFILES[profile_name] = compiled
+    return compiled, error
+
+def get_runtime_dir():
+    """Returns the private directory holding ControlMaster sockets, creating it if needed."""
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if base:
+        path = os.path.join(base, "ssh-manager")
+    else:
+        path = os.path.join(tempfile.gettempdir(), f"ssh-manager-{os.getuid()}")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+def get_control_master(compiled):
+    """Returns the ControlMaster for a compiled profile's host, creating an unstarted one if needed."""
+    key = compiled.master_key
+    master = CONTROL_MASTERS.get(key)
+    if master is None or not master.is_usable():
+        username, hostname, port = key
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16] # Short names stay under the socket path limit
+        destination = (["-p", str(port)] if port != 22 else []) + [f"{username}@{hostname}" if username else hostname]
+        master = ControlMaster(key, os.path.join(get_runtime_dir(), f"cm-{digest}.sock"), destination)
+        CONTROL_MASTERS[key] = master
+    return master
+
+def release_control_master(master):
+    """Forgets a master whose process has exited and removes its socket."""
+    with sessions_lock:
+        if CONTROL_MASTERS.get(master.key) is master:
+            del CONTROL_MASTERS[master.key]
+    master.ready = False
+    try:
+        os.unlink(master.control_path)
+    except FileNotFoundError:
+        pass
+
+def control_command(master, operation, specs):
+    """Builds the `ssh -O` argv for a ControlMaster request."""
+    command = ["ssh", "-S", master.control_path, "-O", operation]
+    for spec in specs:
+        command.extend(["-L", spec])
+    return command + master.destination
+
+def run_control_command(master, operation, specs=()):
+    """Runs `ssh -O <operation>` against a master; returns an error message or None."""
+    if operation in ("forward", "cancel") and not specs:
+        return None
+    try:
+        result = subprocess.run(control_command(master, operation, specs), capture_output=True,
+                                timeout=CONTROL_COMMAND_TIMEOUT)
+    except FileNotFoundError:
+        return SSH_NOT_FOUND_MESSAGE
+    except subprocess.TimeoutExpired:
+        return f"ssh -O {operation} timed out after {CONTROL_COMMAND_TIMEOUT}s."
+    if result.returncode != 0:
+        return f"ssh -O {operation} failed: {result.stderr.decode(errors='replace').strip()}"
+    return None
+
+async def run_control_command_async(master, operation, specs=()):
+    """Asyncio variant of run_control_command."""
+    if operation in ("forward", "cancel") and not specs:
+        return None
+    try:
+        process = await asyncio.create_subprocess_exec(*control_command(master, operation, specs),
+                                                       stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        _, stderr = await asyncio.wait_for(process.communicate(), CONTROL_COMMAND_TIMEOUT)
+    except FileNotFoundError:
+        return SSH_NOT_FOUND_MESSAGE
+    except asyncio.TimeoutError:
+        process.kill()
+        return f"ssh -O {operation} timed out after {CONTROL_COMMAND_TIMEOUT}s."
+    if process.returncode != 0:
+        return f"ssh -O {operation} failed: {stderr.decode(errors='replace').strip()}"
+    return None
+
+def apply_control_command(master, operation, specs, on_done):
+    """Runs `ssh -O` in the active backend mode and passes its error (or None) to on_done.
+
+    on_done answers the current request, so it keeps its request_id in both modes. Inside a batch on the
+    asyncio backend the batch waits for the reply, so it is still part of the batch_result.
+    """
+    if BACKEND_LOOP is not None:
+        async def run():
+            on_done(await run_control_command_async(master, operation, specs))
+        task = run_in_background(run(), contextvars.copy_context())
+        pending = BATCH_PENDING.get()
+        if pending is not None:
+            pending.append(task)
+    else:
+        on_done(run_control_command(master, operation, specs))
+
+def attach_failure_message(session):
+    """Returns why a session cannot attach to its master yet, or None once it is usable."""
+    if not session.master.ready:
+        return f"Shared connection for '{session.profile_name}' did not become ready."
+    return None
+
+def finish_attach(session, error, started):
+    """Reports the outcome of attaching a session to a running master."""
+    if get_session(session.session_id) is not session:
+        return # The master went away while attaching and already reported it
+    if error is None and not session.master.is_alive():
+        error = "Shared connection closed while attaching."
+    if error:
+        with sessions_lock:
+            session.master.profiles.discard(session.session_id)
+        if will_reconnect(session):
+            release_session(session)
+            schedule_reconnect(session, error)
+            return
+        update_connection_status("Error", error, session.session_id)
+        release_session(session)
+        return
+    handshake_ms = round((time.monotonic() - started) * 1000, 1)
+    update_connection_status("Connected", f"Attached '{session.profile_name}' to the shared connection in {handshake_ms:.0f} ms.",
+                             session.session_id, handshake_ms=handshake_ms, multiplexed=True)
+
+def attach_session(session):
+    """Adds a session's forwards to an existing master once that master is ready."""
+    started = time.monotonic()
+    session.master.owner.settled.wait(session.connect_timeout)
+    if get_session(session.session_id) is not session:
+        return # Disconnected while waiting for the master; no forward was added
+    error = attach_failure_message(session) or run_control_command(session.master, "forward", session.forward_specs)
+    if error is None and get_session(session.session_id) is not session:
+        run_control_command(session.master, "cancel", session.forward_specs) # Disconnected while the forward was added
+    finish_attach(session, error, started)
+
+async def attach_session_async(session):
+    """Asyncio variant of attach_session."""
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(session.master.owner.settled.wait(), session.connect_timeout)
+    except asyncio.TimeoutError:
+        pass
+    if get_session(session.session_id) is not session:
+        return
+    error = attach_failure_message(session) or await run_control_command_async(session.master, "forward", session.forward_specs)
+    if error is None and get_session(session.session_id) is not session:
+        await run_control_command_async(session.master, "cancel", session.forward_specs)
+    finish_attach(session, error, started)
+
+def detach_from_master(session):
+    """Disconnects a multiplexed session, stopping the master once nobody uses it."""
+    master = session.master
+    update_connection_status("Disconnecting...", "Attempting to disconnect...", session.session_id)
+    with sessions_lock:
+        master.profiles.discard(session.session_id)
+        last_user = not master.profiles
+
+    if last_user:
+        if session.attached:
+            update_connection_status("Disconnected", "SSH connection closed.", session.session_id)
+            release_session(session)
+        master.owner.stop_requested = True
+        if master.owner.process is None:
+            return # Still spawning; stop_if_requested ends the master once its process exists
+        # Stopping the master process ends the connection; its monitor reports the exit
+        try:
+            os.killpg(os.getpgid(master.owner.process.pid), signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        return
 
-    hostname = profile.get("hostname")
-    username = profile.get("username")
-    port = profile.get("port", 22)
-
-    if not hostname:
-        return None, f"Error: Hostname not specified for profile '{profile_name}'."
-
-    command = ["ssh"]
-
-    if port is not None and str(port).isdigit() and int(port) != 22:
-        command.extend(["-p", str(port)])
-    elif port is not None and not str(port).isdigit():
-         sys.stderr.write(f"Warning: Invalid port specified for profile '{profile_name}': {port}. Using default 22.\n")
-
+    if session.attached and session.is_spawning():
+        # Still waiting for the master: the attach path sees the session gone and skips or undoes its forward
+        update_connection_status("Disconnected", "Detached from the shared connection.", session.session_id)
+        release_session(session)
+        return
 
-    forwards = profile.get("forwards", [])
-    if not isinstance(forwards, list):
-         sys.stderr.write(f"Warning: 'forwards' for profile '{profile_name}' is not a list. Skipping forwards.\n")
-         forwards = []
+    def on_cancelled(error):
+        message = "Detached from the shared connection."
+        if error:
+            message += f" Forwards may still be active: {error}"
+        update_connection_status("Disconnected", message, session.session_id)
+        release_session(session)
 
-    valid_forwards = []
-    for i, fwd in enumerate(forwards):
-        if isinstance(fwd, dict):
-            local_port = fwd.get("local_port")
-            remote_host = fwd.get("remote_host")
-            remote_port = fwd.get("remote_port")
+    apply_control_command(master, "cancel", session.forward_specs, on_cancelled)
 
-            if local_port is not None and remote_host and remote_port is not None:
-                if str(local_port).isdigit() and str(remote_port).isdigit():
-                     command.extend(["-L", f"{local_port}:{remote_host}:{remote_port}"])
-                     valid_forwards.append(fwd)
-                else:
-                     sys.stderr.write(f"Warning: Invalid port number in forward rule {i+1} for profile '{profile_name}': {fwd}. Skipping.\n")
+def release_master_users(session):
+    """Reports the end of a master's process to every session still attached to it."""
+    master = session.master
+    if master is None or master.owner is not session:
+        return
+    with sessions_lock:
+        attached = [SSH_SESSIONS.get(sid) for sid in master.profiles if sid != session.session_id]
+        master.profiles.clear()
+    for other in attached:
+        if other is not None and other.attached and other.master is master:
+            release_session(other)
+            if will_reconnect(other):
+                schedule_reconnect(other, "Shared SSH connection closed.")
             else:
-                sys.stderr.write(f"Warning: Incomplete port forward rule {i+1} in profile '{profile_name}': {fwd}. Skipping.\n")
+                update_connection_status("Disconnected", "Shared SSH connection closed.", other.session_id)
+    release_control_master(master)
+
+# --- Local Port Index ---
+def parse_port_range(value):
+    """Parses "low-high" into a (low, high) tuple of valid ports, or returns None."""
+    low, sep, high = value.partition("-")
+    if not sep or not low.strip().isdigit() or not high.strip().isdigit():
+        return None
+    low, high = int(low), int(high)
+    return (low, high) if 0 < low <= high <= 65535 else None
+
+AUTO_PORT_RANGE = parse_port_range(os.environ.get(AUTO_PORT_RANGE_ENV_VAR, "")) or DEFAULT_AUTO_PORT_RANGE
+
+def port_is_bindable(port):
+    """Returns True if the local port can be bound, i.e. nothing else is listening on it."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # Like ssh, so TIME_WAIT leftovers do not count
+        try:
+            sock.bind(("127.0.0.1", port))
+        except OSError:
+            return False
+    return True
+
+def pick_auto_port(port_range, taken, preferred=None):
+    """Returns a free local port from port_range that no session or saved profile uses, or None."""
+    if preferred is not None and preferred not in taken and preferred not in LIVE_PORTS and port_is_bindable(preferred):
+        return preferred # Keep the port a reconnecting session had, so clients need not be reconfigured
+    low, high = port_range
+    span = high - low + 1
+    start = random.randrange(span) # Random start keeps concurrent connects from probing the same ports
+    for offset in range(span):
+        port = low + (start + offset) % span
+        if port in taken or port in LIVE_PORTS or port in PROFILE_INDEX.by_local_port:
+            continue
+        if port_is_bindable(port):
+            return port
+    return None
+
+def claim_local_ports(session, compiled):
+    """Checks and claims the local ports of a session's forwards before ssh is spawned.
+
+    Returns ({forward index: local port}, error message). "auto" ports are picked from the
+    profile's auto_port_range. Must be called with sessions_lock held.
+    """
+    ports = {}
+    for i, (port, _, _) in enumerate(compiled.forwards):
+        if port == "auto":
+            continue
+        holder = LIVE_PORTS.get(port)
+        if holder is not None and holder is not session:
+            return None, f"Local port {port} (forward {i + 1}) is already forwarded by session '{holder.session_id}'."
+        if port in ports.values():
+            return None, f"Local port {port} is used by more than one forward of '{session.profile_name}'."
+        if not port_is_bindable(port):
+            return None, f"Local port {port} (forward {i + 1}) is already in use by another program."
+        ports[i] = port
+
+    port_range = compiled.auto_port_range
+    preferred = session.reconnect.assigned_ports if session.reconnect else {}
+    for i in (i for i, (port, _, _) in enumerate(compiled.forwards) if port == "auto"):
+        port = pick_auto_port(port_range, set(ports.values()), preferred.get(i))
+        if port is None:
+            return None, f"No free local port in range {port_range[0]}-{port_range[1]} for forward {i + 1}."
+        ports[i] = port
+        session.assigned_ports[i] = port
+
+    for port in ports.values():
+        LIVE_PORTS[port] = session
+    session.local_ports.update(ports.values())
+    return ports, None
+
+def claim_live_forward_port(session, fwd):
+    """Claims the local port of a forward added to a live session; returns (forward, error message)."""
+    compiled, _ = compiled_profile(session.profile_name)
+    with sessions_lock:
+        port = fwd["local_port"]
+        if port == "auto":
+            port_range = compiled.auto_port_range if compiled else AUTO_PORT_RANGE
+            port = pick_auto_port(port_range, set())
+            if port is None:
+                return None, f"No free local port in range {port_range[0]}-{port_range[1]}."
+        elif LIVE_PORTS.get(port) is not None:
+            return None, f"Local port {port} is already forwarded by session '{LIVE_PORTS[port].session_id}'."
+        elif not port_is_bindable(port):
+            return None, f"Local port {port} is already in use by another program."
+        LIVE_PORTS[port] = session
+        session.local_ports.add(port)
+    return dict(fwd, local_port=port), None
+
+def release_local_ports(session, ports=None):
+    """Releases local ports claimed by a session (all of them by default)."""
+    with sessions_lock:
+        for port in list(session.local_ports if ports is None else ports):
+            if LIVE_PORTS.get(port) is session:
+                del LIVE_PORTS[port]
+            session.local_ports.discard(port)
+
+def saved_port_conflicts(profile_name, profile_data):
+    """Returns {port: [other profiles]} for fixed local ports other saved profiles also forward."""
+    conflicts = {}
+    for fwd in profile_data.get("forwards") or []:
+        others = PROFILE_INDEX.by_local_port.get(fwd.get("local_port"), ())
+        others = sorted(name for name in others if name != profile_name)
+        if others:
+            conflicts[fwd["local_port"]] = others
+    return conflicts
+
+def port_conflict_note(conflicts):
+    """Returns a sentence warning about local ports shared with other saved profiles."""
+    if not conflicts:
+        return ""
+    shared = "; ".join(f"{port} with {', '.join(names)}" for port, names in sorted(conflicts.items()))
+    return f" Note: local ports are shared with other profiles ({shared}); they cannot be connected at the same time."
+
+# --- Metered Forwards ---
+def open_relay_listener(port):
+    """Binds and listens on a local port for a relay; raises OSError if it is taken."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", port))
+        sock.listen(RELAY_BACKLOG)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def open_relays(session, compiled, local_ports, indexes):
+    """Binds the local ports of the given forwards and picks the internal ports ssh forwards instead.
+
+    Returns ({forward index: port ssh listens on}, error message). Must be called with sessions_lock held.
+    """
+    ssh_ports = dict(local_ports)
+    for i in indexes:
+        port_range = compiled.auto_port_range
+        port = pick_auto_port(port_range, set(ssh_ports.values()))
+        if port is None:
+            return None, f"No free local port in range {port_range[0]}-{port_range[1]} for the relay of forward {i + 1}."
+        LIVE_PORTS[port] = session
+        session.local_ports.add(port)
+        ssh_ports[i] = port
+        _, remote_host, remote_port = compiled.forwards[i]
+        relay = ForwardRelay(session, ForwardStats(local_ports[i], port, remote_host, remote_port))
+        try:
+            relay.listener = open_relay_listener(local_ports[i])
+        except OSError as e:
+            return None, f"Could not listen on local port {local_ports[i]} (forward {i + 1}): {e.strerror or e}"
+        session.relays.append(relay)
+    return ssh_ports, None
+
+def start_relays(session):
+    """Starts accepting on a session's relays and reporting their stats."""
+    if not session.relays:
+        return
+    kind = "lazy" if isinstance(session, LazyTunnel) else "metered"
+    for relay in session.relays:
+        session.log.append(f"Relaying local port {relay.stats.local_port} through ssh forward port {relay.stats.upstream_port} "
+                           f"to {relay.stats.remote} ({kind})", LOG_LEVELS.index("info"))
+        if BACKEND_LOOP is not None:
+            run_in_background(serve_relay_async(relay))
         else:
-             sys.stderr.write(f"Warning: Invalid format for forward rule {i+1} in profile '{profile_name}': {fwd}. Skipping.\n")
-
-    if len(valid_forwards) != len(forwards):
-         profile['forwards'] = valid_forwards
-
-
-    if username:
-        command.append(f"{username}@{hostname}")
+            threading.Thread(target=relay_accept_loop, args=(relay,), daemon=True).start()
+    if BACKEND_LOOP is not None:
+        run_in_background(report_forward_stats_async(session))
     else:
-        command.append(hostname)
+        threading.Thread(target=report_forward_stats, args=(session,), daemon=True).start()
+
+def close_relay(relay):
+    """Stops a relay's listener and drops its open connections."""
+    relay.closed = True
+    if relay.server is not None:
+        relay.server.close()
+    elif relay.listener is not None:
+        try:
+            relay.listener.shutdown(socket.SHUT_RDWR) # Wakes the thread blocked in accept()
+        except OSError:
+            pass
+        relay.listener.close()
+    for connection in list(relay.connections):
+        if isinstance(connection, socket.socket):
+            try:
+                connection.shutdown(socket.SHUT_RDWR) # Its relay thread closes it
+            except OSError:
+                pass
+        else:
+            connection.abort()
+
+def close_relays(session):
+    """Closes every relay of a session."""
+    for relay in session.relays:
+        close_relay(relay)
+    session.relays_closed.set()
+
+def relay_session(relay):
+    """Returns the session a relay passes connections to, starting a lazy tunnel's ssh if needed."""
+    if isinstance(relay.session, LazyTunnel):
+        return activate_tunnel(relay.session)
+    return relay.session
+
+def tunnel_unavailable(relay, session):
+    """Returns True when a relay cannot pass a connection on to ssh."""
+    return relay.closed or session is None or session.status != "Connected"
+
+def relay_accept_loop(relay):
+    """Accepts connections on a relay's port until the relay is closed (threaded backend)."""
+    while True:
+        try:
+            client, _ = relay.listener.accept()
+        except OSError:
+            return # Closed by close_relay
+        threading.Thread(target=relay_connection, args=(relay, client), daemon=True).start()
+
+def relay_connection(relay, client):
+    """Connects one accepted client through ssh and copies data both ways (threaded backend)."""
+    accepted = time.monotonic()
+    relay.stats.opened()
+    relay.connections.add(client)
+    upstream = None
+    failed = True
+    try:
+        session = relay_session(relay)
+        if session is not None:
+            session.settled.wait(session.connect_timeout) # Clients that arrive early wait for the tunnel
+        if tunnel_unavailable(relay, session):
+            return
+        upstream = socket.create_connection(("127.0.0.1", relay.stats.upstream_port), timeout=RELAY_CONNECT_TIMEOUT)
+        upstream.settimeout(None) # splice() needs blocking sockets
+        for sock in (client, upstream):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1) # Like ssh and asyncio transports
+        relay.connections.add(upstream)
+        relay.stats.connect_ms.append(round((time.monotonic() - accepted) * 1000, 2))
+        failed = False
+        marks = [None, None]
+        responses = threading.Thread(target=relay_pump, args=(relay, upstream, client, 1, marks), daemon=True)
+        responses.start()
+        relay_pump(relay, client, upstream, 0, marks)
+        responses.join()
+    except OSError:
+        pass
+    finally:
+        for sock in (client, upstream):
+            if sock is not None:
+                relay.connections.discard(sock)
+                sock.close()
+        relay.stats.closed(failed)
+
+def relay_pump(relay, source, dest, direction, marks):
+    """Copies one direction of a relayed connection until the source reaches EOF (threaded backend)."""
+    stats = relay.stats
+    try:
+        if RELAY_USE_SPLICE:
+            # Moves data socket -> pipe -> socket inside the kernel, without copying it into Python
+            pipe_read, pipe_write = os.pipe()
+            try:
+                while True:
+                    count = os.splice(source.fileno(), pipe_write, RELAY_CHUNK)
+                    if not count:
+                        break
+                    stats.first_bytes(marks, direction)
+                    moved = 0
+                    while moved < count:
+                        moved += os.splice(pipe_read, dest.fileno(), count - moved)
+                    stats.add(direction, count)
+            finally:
+                os.close(pipe_read)
+                os.close(pipe_write)
+        else:
+            buffer = bytearray(RELAY_CHUNK)
+            view = memoryview(buffer)
+            while True:
+                count = source.recv_into(buffer)
+                if not count:
+                    break
+                stats.first_bytes(marks, direction)
+                dest.sendall(view[:count])
+                stats.add(direction, count)
+    except OSError:
+        pass
+    finally:
+        try:
+            dest.shutdown(socket.SHUT_WR) # Pass the EOF on; the other direction keeps flowing
+        except OSError:
+            pass
 
-    command.append("-N") # Do not execute a remote command
-    command.append("-v") # Add verbose output for debugging connection issues
+async def serve_relay_async(relay):
+    """Serves a relay's listener on the event loop (asyncio backend)."""
+    if relay.closed:
+        return
+    relay.server = await asyncio.get_running_loop().create_server(lambda: RelayProtocol(relay, 0, [None, None]), sock=relay.listener)
+    if relay.closed:
+        relay.server.close() # Closed while the server was starting
+
+async def connect_upstream_async(relay, client):
+    """Connects an accepted client through ssh and pairs the two sides (asyncio backend)."""
+    accepted = time.monotonic()
+    session = relay_session(relay)
+    if session is not None:
+        try:
+            await asyncio.wait_for(session.settled.wait(), session.connect_timeout)
+        except asyncio.TimeoutError:
+            pass
+    if not tunnel_unavailable(relay, session) and not client.transport.is_closing():
+        try:
+            _, upstream = await asyncio.wait_for(asyncio.get_running_loop().create_connection(
+                lambda: RelayProtocol(relay, 1, client.marks), "127.0.0.1", relay.stats.upstream_port), RELAY_CONNECT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            pass
+        else:
+            relay.stats.connect_ms.append(round((time.monotonic() - accepted) * 1000, 2))
+            if client.transport.is_closing():
+                upstream.transport.close()
+            else:
+                client.link(upstream)
+            return
+    client.failed = True
+    client.transport.close()
+
+def forward_stats_of(session):
+    """Returns the stats of each metered forward of a session."""
+    return [relay.stats.to_dict() for relay in session.relays]
+
+def send_forward_stats(session, last):
+    """Sends a forward_stats event if the session's counters moved; returns the counters it compared."""
+    stats = forward_stats_of(session)
+    current = [(s["bytes_in"], s["bytes_out"], s["connections"], s["active"]) for s in stats]
+    if current != last:
+        send_response({"type": "forward_stats", "sessions": {session.session_id: stats}})
+    return current
+
+def report_forward_stats(session):
+    """Sends forward_stats events every FORWARD_STATS_INTERVAL while a session's relays are open (threaded backend)."""
+    last = None
+    while not session.relays_closed.wait(FORWARD_STATS_INTERVAL):
+        last = send_forward_stats(session, last)
+
+async def report_forward_stats_async(session):
+    """Asyncio variant of report_forward_stats."""
+    last = None
+    while True:
+        try:
+            await asyncio.wait_for(session.relays_closed.wait(), FORWARD_STATS_INTERVAL)
+            return
+        except asyncio.TimeoutError:
+            last = send_forward_stats(session, last)
+
+# --- Lazy Tunnels ---
+def arm_tunnel(profile_name, compiled):
+    """Listens on a lazy profile's local ports without starting ssh; returns the LazyTunnel, or None on failure."""
+    tunnel = LazyTunnel(profile_name, compiled.idle_timeout)
+    with sessions_lock:
+        if profile_name in LAZY_TUNNELS:
+            return LAZY_TUNNELS[profile_name] # Armed meanwhile by another request
+        local_ports, error = claim_local_ports(tunnel, compiled)
+        if not error:
+            tunnel.ssh_ports, error = open_relays(tunnel, compiled, local_ports, range(len(compiled.forwards)))
+        if error:
+            release_local_ports(tunnel)
+            close_relays(tunnel)
+            update_connection_status("Error", error, profile_name)
+            return None
+        LAZY_TUNNELS[profile_name] = tunnel
+    tunnel.settled.set()
+    ports = ", ".join(str(port) for port in sorted(local_ports.values()))
+    update_connection_status("Standby", f"Listening on port {ports}; ssh starts on the first connection.", profile_name,
+                             **assigned_forwards_details(tunnel, compiled))
+    start_relays(tunnel)
+    return tunnel
+
+def activate_tunnel(tunnel):
+    """Returns the session serving a lazy tunnel, starting ssh through connect_to_profile if none is running."""
+    with tunnel.activation_lock:
+        if tunnel.closed:
+            return None
+        if tunnel.session is not None and get_session(tunnel.session_id) is tunnel.session:
+            return tunnel.session
+        tunnel.activated_at = time.monotonic()
+        tunnel.activations += 1
+        tunnel.session = connect_to_profile(tunnel.profile_name, tunnel=tunnel)
+        session = tunnel.session
+    if session is not None:
+        if BACKEND_LOOP is not None:
+            run_in_background(watch_tunnel_idle_async(tunnel, session))
+        else:
+            threading.Thread(target=watch_tunnel_idle, args=(tunnel, session), daemon=True).start()
+    return session
+
+def disarm_tunnel(tunnel):
+    """Stops a lazy tunnel from listening; a running activation is left to the caller."""
+    with sessions_lock:
+        if LAZY_TUNNELS.get(tunnel.profile_name) is tunnel:
+            del LAZY_TUNNELS[tunnel.profile_name]
+        tunnel.closed = True
+        release_local_ports(tunnel)
+    close_relays(tunnel)
+
+def standby_message(session, error):
+    """Returns the message reported when a lazy tunnel's ssh has exited and the tunnel listens again."""
+    tunnel = session.tunnel
+    if session.idle_stopped:
+        return f"Stopped ssh after {tunnel.idle_timeout}s without traffic; it starts again on the next connection."
+    reason = error or f"SSH process exited with code {session.process.returncode}."
+    return f"{reason} Listening again; ssh starts on the next connection."
+
+def check_tunnel_idle(tunnel, session):
+    """Stops a lazy tunnel's ssh once no connection has been open for idle_timeout; returns False once the session is gone."""
+    if get_session(session.session_id) is not session or session.stop_requested:
+        return False
+    if session.status != "Connected" or any(relay.stats.active for relay in tunnel.relays):
+        return True
+    last_activity = max([relay.stats.last_activity for relay in tunnel.relays if relay.stats.last_activity is not None] +
+                        [session.connected_at])
+    idle = time.monotonic() - last_activity
+    if idle < tunnel.idle_timeout:
+        return True
+    session.stop_requested = True
+    session.idle_stopped = True
+    session.log.append(f"No traffic for {idle:.0f}s; stopping ssh until the next connection", LOG_LEVELS.index("info"))
+    try:
+        os.killpg(os.getpgid(session.process.pid), signal.SIGTERM) # The session monitor reports Standby
+    except ProcessLookupError:
+        pass
+    return False
+
+def watch_tunnel_idle(tunnel, session):
+    """Checks a lazy tunnel's activation for idleness until it ends (threaded backend)."""
+    interval = min(LAZY_IDLE_CHECK_INTERVAL, tunnel.idle_timeout)
+    while True:
+        time.sleep(interval)
+        if not check_tunnel_idle(tunnel, session):
+            return
 
-    return command, None
+async def watch_tunnel_idle_async(tunnel, session):
+    """Asyncio variant of watch_tunnel_idle."""
+    interval = min(LAZY_IDLE_CHECK_INTERVAL, tunnel.idle_timeout)
+    while True:
+        await asyncio.sleep(interval)
+        if not check_tunnel_idle(tunnel, session):
+            return
+
+def arm_lazy_profiles():
+    """Arms every lazy profile on its local ports at startup."""
+    for profile_name in sorted(SSH_PROFILES):
+        if SSH_PROFILES[profile_name].get("lazy"):
+            connect_to_profile(profile_name)
+
+def sync_lazy_tunnel(profile_name, previous=None):
+    """Arms, re-arms or disarms a profile's lazy tunnel after the profile was saved or deleted.
+
+    previous is the CompiledProfile before the save; a tunnel whose profile compiled the same is left running.
+    """
+    compiled = COMPILED_PROFILES.get(profile_name) if profile_name in SSH_PROFILES else None
+    tunnel = LAZY_TUNNELS.get(profile_name)
+    if tunnel is not None:
+        if compiled is not None and previous is not None and replace(previous, revision=compiled.revision) == compiled:
+            return
+        if compiled is None or not compiled.lazy:
+            disconnect_session(profile_name) # Stops listening on the old ports and any running activation
+            return
+        # Re-armed without a Disconnected status: the new tunnel reports Standby
+        disarm_tunnel(tunnel)
+        session = get_session(profile_name)
+        connect_to_profile(profile_name)
+        if session is not None and session.tunnel is tunnel:
+            session.stop_requested = True # Reported as Standby on the new tunnel once it exits
+            if session.process is not None:
+                try:
+                    os.killpg(os.getpgid(session.process.pid), signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+        return
+    if compiled is None or not compiled.lazy:
+        return
+    session = get_session(profile_name)
+    if session is None or session.tunnel is not None: # A plain session still holds the ports until disconnected
+        connect_to_profile(profile_name)
 
-def connect_to_profile(profile_name):
-    """Connects to an SSH profile."""
-    global active_ssh_process
+def assigned_forwards_details(session, compiled):
+    """Logs the ports picked for "auto" forwards and returns them as status details."""
+    if not session.assigned_ports:
+        return {}
+    assigned = [{"local_port": port, "remote_host": compiled.forwards[i][1], "remote_port": compiled.forwards[i][2]}
+                for i, port in session.assigned_ports.items()]
+    for fwd in assigned:
+        session.log.append(f"Assigned local port {fwd['local_port']} to forward {fwd['remote_host']}:{fwd['remote_port']}",
+                           LOG_LEVELS.index("info"))
+    return {"assigned_forwards": assigned}
+
+def connect_to_profile(profile_name, reconnect=None, tunnel=None):
+    """Starts an SSH session for a profile and returns it, or None on failure.
+
+    reconnect is the supervisor state when the auto-reconnect supervisor starts the session, and
+    tunnel the LazyTunnel whose first connection starts it. A lazy profile is armed instead (the
+    LazyTunnel is returned), and connecting an armed one starts its ssh right away.
+    """
+    compiled, error = compiled_profile(profile_name)
+    if not error and compiled.lazy and tunnel is None:
+        with sessions_lock:
+            armed = LAZY_TUNNELS.get(profile_name)
+        return activate_tunnel(armed) if armed else arm_tunnel(profile_name, compiled)
+
+    with sessions_lock:
+        existing = SSH_SESSIONS.get(profile_name)
+        if existing and (existing.is_alive() or existing.process is None):
+            # Reported as a plain error so the live session keeps its own status
+            send_response({"type": "error", "message": f"Profile '{profile_name}' is already connected."})
+            return None
+        if reconnect is None:
+            cancel_reconnect(profile_name) # A manual connect replaces a pending automatic one
+
+        session = SSHSession(profile_name)
+        session.reconnect = reconnect
+        session.tunnel = tunnel
+        if tunnel is not None:
+            ssh_ports = tunnel.ssh_ports # The tunnel keeps the local ports and relays across activations
+        elif not error:
+            # Port conflicts are caught here, before ssh runs, instead of by a failed readiness wait
+            local_ports, error = claim_local_ports(session, compiled)
+            if not error:
+                ssh_ports, error = open_relays(session, compiled, local_ports, compiled.metered)
+
+        if error:
+            release_local_ports(session)
+            close_relays(session)
+            if will_reconnect(session):
+                schedule_reconnect(session, error) # e.g. the port is briefly taken; try again later
+            else:
+                update_connection_status("Error", error, profile_name)
+            return None
+
+        command = compiled.command(ssh_ports)
+        session.connect_timeout = compiled.connect_timeout
+        session.probe_forwards = compiled.probe_forwards
+        session.forward_specs = forward_specs_from_command(command)
+        session.expected_ports = {int(spec.split(":", 1)[0]) for spec in session.forward_specs}
+
+        if compiled.multiplex:
+            master = get_control_master(compiled)
+            session.master = master
+            master.profiles.add(profile_name)
+            if master.owner is None:
+                # First user of this host: its ssh process becomes the ControlMaster
+                master.owner = session
+                command[1:1] = ["-o", "ControlMaster=yes", "-o", f"ControlPath={master.control_path}",
+                                "-o", "ControlPersist=no"]
+                try:
+                    os.unlink(master.control_path) # A stale socket would make ssh skip multiplexing
+                except FileNotFoundError:
+                    pass
+            else:
+                session.attached = True
+        SSH_SESSIONS[profile_name] = session
 
-    if active_ssh_process and active_ssh_process.poll() is None:
-        update_connection_status("Error", "Already connected to an SSH server.")
-        return
+    details = assigned_forwards_details(session, compiled)
+    update_connection_status("Connecting...", f"Attempting to connect to '{profile_name}'...", profile_name, **details)
+    start_relays(session)
 
-    command, error = build_ssh_command(profile_name)
+    if session.attached:
+        # Reuse the running master: only the forwards are requested, no new handshake
+        if BACKEND_LOOP is not None:
+            run_in_background(attach_session_async(session))
+        else:
+            threading.Thread(target=attach_session, args=(session,), daemon=True).start()
+        return session
 
-    if error:
-        update_connection_status("Error", error)
-        return
+    session.log.append(f"Executing command: {' '.join(command)}", LOG_LEVELS.index("info"))
 
-    update_connection_status("Connecting...", f"Attempting to connect to '{profile_name}'...")
-    sys.stderr.write(f"Executing command: {' '.join(command)}\n")
+    if BACKEND_LOOP is not None:
+        # The asyncio backend drives the whole session lifetime on its event loop
+        run_in_background(run_session_async(session, command))
+        return session
 
     try:
         # Start the SSH process
@@ -158,106 +2302,825 @@ def connect_to_profile(profile_name):
         # which helps in reliably killing the process and its children.
         # Use stdout=subprocess.PIPE and stderr=subprocess.PIPE to capture output
         # for potential debugging, though the main interaction is the terminal window.
-        active_ssh_process = subprocess.Popen(
+        session.spawned_at = time.monotonic()
+        session.process = subprocess.Popen(
             command,
             shell=False, # Prefer shell=False for better security and control
             preexec_fn=os.setsid,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE
         )
+        stop_if_requested(session)
 
         # Start threads to read stdout and stderr to prevent blocking
-        threading.Thread(target=read_process_output, args=(active_ssh_process.stdout, "stdout")).start()
-        threading.Thread(target=read_process_output, args=(active_ssh_process.stderr, "stderr")).start()
+        threading.Thread(target=read_process_output, args=(session.process.stdout, "stdout", session)).start()
+        threading.Thread(target=read_process_output, args=(session.process.stderr, "stderr", session)).start()
 
 
         # Start a thread to monitor the process exit
-        threading.Thread(target=monitor_ssh_process, args=(active_ssh_process, profile_name)).start()
+        threading.Thread(target=monitor_ssh_process, args=(session,)).start()
 
         # Initial status update (process started, but not necessarily connected yet)
-        # The monitor_ssh_process thread will send "Connected" status later if successful
+        # The monitor_ssh_process thread will send "Connected" once the -v milestones are seen
         # For now, the "Connecting..." status is sent before Popen.
+        return session
 
     except FileNotFoundError:
-        update_connection_status("Error", "'ssh' command not found. Is OpenSSH installed and in your PATH?")
-        active_ssh_process = None # Reset process variable
+        update_connection_status("Error", SSH_NOT_FOUND_MESSAGE, profile_name)
+        release_session(session)
+        release_master_users(session)
     except Exception as e:
-        update_connection_status("Error", f"An unexpected error occurred while starting SSH process: {e}")
-        active_ssh_process = None # Reset process variable
-
-def disconnect_active_connection():
-    """Terminates the active SSH process."""
-    global active_ssh_process
-    if active_ssh_process and active_ssh_process.poll() is None:
-        update_connection_status("Disconnecting...", "Attempting to disconnect...")
+        update_connection_status("Error", f"An unexpected error occurred while starting SSH process: {e}", profile_name)
+        release_session(session)
+        release_master_users(session)
+    return None
+
+def disconnect_session(session_id):
+    """Terminates the SSH process of one session."""
+    session = get_session(session_id)
+    reconnect_pending = cancel_reconnect(session_id)
+    tunnel = LAZY_TUNNELS.get(session_id)
+    if tunnel:
+        disarm_tunnel(tunnel) # Before stopping ssh, so its exit is reported as a disconnect
+    if session:
+        session.stop_requested = True
+    if session and session.master is not None and (session.is_alive() or session.is_spawning()):
+        detach_from_master(session)
+    elif session and session.is_spawning():
+        # ssh has not been started yet; stop_if_requested ends it once its process exists
+        update_connection_status("Disconnecting...", "Attempting to disconnect...", session_id)
+    elif session and session.is_alive():
+        update_connection_status("Disconnecting...", "Attempting to disconnect...", session_id)
         try:
             # Use os.killpg to kill the entire process group
-            os.killpg(os.getpgid(active_ssh_process.pid), signal.SIGTERM) # Or signal.SIGKILL for forceful
-            # The monitor_ssh_process thread will detect the termination and update status
+            os.killpg(os.getpgid(session.process.pid), signal.SIGTERM) # Or signal.SIGKILL for forceful
+            # The session monitor will detect the termination and update status
         except ProcessLookupError:
              sys.stderr.write("Attempted to kill non-existent process.\n")
-             update_connection_status("Disconnected", "Connection already terminated.")
-             active_ssh_process = None
+             update_connection_status("Disconnected", "Connection already terminated.", session_id)
+             release_session(session)
         except Exception as e:
-            update_connection_status("Error", f"An error occurred while trying to disconnect: {e}")
+            update_connection_status("Error", f"An error occurred while trying to disconnect: {e}", session_id)
             sys.stderr.write(f"Error killing process: {e}\n")
+    elif reconnect_pending:
+        update_connection_status("Disconnected", "Auto-reconnect cancelled.", session_id)
+    elif tunnel:
+        update_connection_status("Disconnected", "Stopped listening for connections.", session_id)
     else:
-        update_connection_status("Disconnected", "No active connection to disconnect.")
-        active_ssh_process = None # Ensure variable is None if process is gone
-
-def monitor_ssh_process(process, profile_name):
-    """Monitors the SSH process for exit and updates status."""
-    global active_ssh_process # <-- Moved this line to the top
-
-    # Wait for the process to finish
-    # We could add logic here to detect "Connected" status from stdout/stderr,
-    # but for simplicity, we'll assume the process staying alive means connected.
-    # A more advanced version would parse SSH output for connection success messages.
-
-    # Give SSH a moment to establish connection and potentially print errors
-    time.sleep(2) # Adjust this delay as needed
-
-    if process.poll() is None:
-        # Process is still running, assume connected
-        update_connection_status("Connected", f"Successfully connected to '{profile_name}'.")
-    else:
-        # Process exited quickly, likely an error
-        stdout, stderr = process.communicate() # Get remaining output
-        error_message = stderr.decode().strip()
-        if error_message:
-            update_connection_status("Error", f"SSH connection failed: {error_message}")
-        else:
-             update_connection_status("Error", f"SSH process exited unexpectedly (code {process.returncode}).")
-        # Do NOT set active_ssh_process = None here, it will be set after process.wait()
-
+        update_connection_status("Disconnected", f"No active connection for '{session_id}' to disconnect.", session_id)
+        if session:
+            release_session(session) # Drop the entry if its process is already gone
+
+def disconnect_all_sessions():
+    """Terminates every registered SSH session."""
+    with sessions_lock:
+        session_ids = set(SSH_SESSIONS) | set(RECONNECTS) | set(LAZY_TUNNELS)
+    for session_id in session_ids:
+        disconnect_session(session_id)
+
+def connect_group(profile_names, max_parallel, request_id):
+    """Connects several profiles with at most max_parallel handshakes in flight."""
+    def connect_one(profile_name):
+        session = connect_to_profile(profile_name)
+        if session is None:
+            return profile_name, "Error"
+        # Hold the worker slot until the session has either connected or failed
+        session.settled.wait(GROUP_CONNECT_SETTLE_TIMEOUT)
+        return profile_name, session.status
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        results = dict(executor.map(connect_one, profile_names))
+    # Only the result answers the request; the members' status events stay plain notifications
+    CURRENT_REQUEST_ID.set(request_id)
+    send_response({"type": "group_connect_result", "results": results})
+
+async def connect_group_async(profile_names, max_parallel, request_id):
+    """Asyncio variant of connect_group, bounded by a semaphore instead of worker threads."""
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def connect_one(profile_name):
+        async with semaphore:
+            session = connect_to_profile(profile_name)
+            if session is None:
+                return profile_name, "Error"
+            try:
+                await asyncio.wait_for(session.settled.wait(), GROUP_CONNECT_SETTLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+            return profile_name, session.status
+
+    results = dict(await asyncio.gather(*(connect_one(name) for name in profile_names)))
+    CURRENT_REQUEST_ID.set(request_id)
+    send_response({"type": "group_connect_result", "results": results})
+
+# --- Reachability Probes ---
+def new_probe_result(hostname, port):
+    """Returns an unreachable probe result for hostname:port, to be filled in by a probe."""
+    return {"hostname": hostname, "port": port, "reachable": False, "latency_ms": None, "banner": None, "banner_ms": None, "error": None}
+
+def probe_error_message(error, timeout):
+    """Returns the message reported for a failed probe connect."""
+    if isinstance(error, (socket.timeout, asyncio.TimeoutError)):
+        return f"Timed out after {timeout}s."
+    if isinstance(error, ConnectionRefusedError):
+        return "Connection refused."
+    return getattr(error, "strerror", None) or str(error) or type(error).__name__
+
+def record_ssh_banner(result, data, started):
+    """Stores the SSH identification line found in data (servers may send other lines first)."""
+    for line in data.decode("utf-8", errors="replace").splitlines():
+        if line.startswith("SSH-"):
+            result["banner"] = line.strip()
+            result["banner_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            return
+    result["error"] = "No SSH banner received." if data else "Connection closed before the SSH banner."
+
+def resolve_target(hostname, port, timeout):
+    """getaddrinfo bounded by timeout; raises socket.timeout when the resolver does not answer in time.
+
+    The lookup runs on a daemon thread: a hanging resolver then only holds that thread, not the
+    probe worker, and cannot delay the backend's exit the way an executor's worker would.
+    """
+    try:
+        return socket.getaddrinfo(hostname, port, type=socket.SOCK_STREAM, flags=socket.AI_NUMERICHOST)
+    except socket.gaierror:
+        pass # Not an IP literal; needs the resolver
+    outcome = {}
+    done = threading.Event()
 
-    process.wait() # Wait for the process to fully terminate
+    def resolve():
+        try:
+            outcome["addresses"] = socket.getaddrinfo(hostname, port, type=socket.SOCK_STREAM)
+        except OSError as e:
+            outcome["error"] = e
+        done.set()
+
+    threading.Thread(target=resolve, daemon=True).start()
+    if not done.wait(timeout):
+        raise socket.timeout()
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["addresses"]
+
+def probe_target(hostname, port, timeout, read_banner):
+    """TCP-connects to hostname:port within timeout seconds, optionally reading the SSH banner; returns a probe result."""
+    result = new_probe_result(hostname, port)
+    deadline = time.monotonic() + timeout
+    try:
+        addresses = resolve_target(hostname, port, timeout)
+    except OSError as e:
+        result["error"] = f"Could not resolve {hostname}: {probe_error_message(e, timeout)}"
+        return result
+    error = socket.timeout()
+    for family, socktype, proto, _, address in addresses:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        with socket.socket(family, socktype, proto) as sock:
+            sock.settimeout(remaining)
+            started = time.perf_counter()
+            try:
+                sock.connect(address)
+            except OSError as e:
+                error = e
+                continue
+            result["reachable"] = True
+            result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            if read_banner:
+                data = b""
+                try:
+                    while b"\n" not in data and len(data) < PROBE_BANNER_LIMIT:
+                        sock.settimeout(max(0.001, deadline - time.monotonic()))
+                        chunk = sock.recv(PROBE_BANNER_LIMIT - len(data))
+                        if not chunk:
+                            break
+                        data += chunk
+                except OSError as e:
+                    result["error"] = f"Reading the SSH banner failed: {probe_error_message(e, timeout)}"
+                    return result
+                record_ssh_banner(result, data, started)
+            return result
+    result["error"] = probe_error_message(error, timeout)
+    return result
+
+async def probe_target_async(hostname, port, timeout, read_banner):
+    """Asyncio variant of probe_target."""
+    result = new_probe_result(hostname, port)
+    deadline = time.monotonic() + timeout
+    try:
+        addresses = await asyncio.wait_for(asyncio.get_running_loop().getaddrinfo(hostname, port, type=socket.SOCK_STREAM), timeout)
+    except (OSError, asyncio.TimeoutError) as e:
+        result["error"] = f"Could not resolve {hostname}: {probe_error_message(e, timeout)}"
+        return result
+    error = asyncio.TimeoutError()
+    for _, _, _, _, address in addresses:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(address[0], address[1]), remaining)
+        except (OSError, asyncio.TimeoutError) as e:
+            error = e
+            continue
+        result["reachable"] = True
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        try:
+            if read_banner:
+                data = b""
+                try:
+                    while b"\n" not in data and len(data) < PROBE_BANNER_LIMIT:
+                        chunk = await asyncio.wait_for(reader.read(PROBE_BANNER_LIMIT - len(data)), max(0.001, deadline - time.monotonic()))
+                        if not chunk:
+                            break
+                        data += chunk
+                except (OSError, asyncio.TimeoutError) as e:
+                    result["error"] = f"Reading the SSH banner failed: {probe_error_message(e, timeout)}"
+                    return result
+                record_ssh_banner(result, data, started)
+            return result
+        finally:
+            writer.close()
+    result["error"] = probe_error_message(error, timeout)
+    return result
+
+def plan_probes(profile_names, read_banner, max_age):
+    """Groups profiles by hostname:port and reports those with a fresh cached result.
+
+    Returns ({(hostname, port): [profile names]} still to probe, summary counts).
+    """
+    now = time.monotonic()
+    targets = {}
+    summary = {"profiles": 0, "probed": 0, "cached": 0, "reachable": 0, "unreachable": 0}
+    with probe_lock:
+        for target in [target for target, (probed_at, _, _) in PROBE_CACHE.items() if now - probed_at > PROBE_CACHE_TTL]:
+            del PROBE_CACHE[target]
+        for profile_name in profile_names:
+            profile = SSH_PROFILES.get(profile_name)
+            if profile is None:
+                continue # Deleted since the request was validated
+            target = (profile["hostname"], profile.get("port") or 22)
+            cached = PROBE_CACHE.get(target)
+            if cached and now - cached[0] <= max_age and (cached[2] or not read_banner):
+                send_probe_result(profile_name, cached[1], now - cached[0], summary)
+                summary["cached"] += 1
+            else:
+                targets.setdefault(target, []).append(profile_name)
+    return targets, summary
+
+def send_probe_result(profile_name, result, age, summary):
+    """Streams one profile's probe result and counts it in the summary."""
+    summary["profiles"] += 1
+    summary["reachable" if result["reachable"] else "unreachable"] += 1
+    send_response(dict(result, type="probe_result", profile_name=profile_name, cached=age > 0, age_s=round(age, 1)))
+
+def report_probe(target, result, profile_names, read_banner, summary):
+    """Caches a finished probe and streams its result to every profile that shares the target."""
+    with probe_lock:
+        PROBE_CACHE[target] = (time.monotonic(), result, read_banner)
+    summary["probed"] += 1
+    for profile_name in profile_names:
+        send_probe_result(profile_name, result, 0, summary)
+
+def send_probe_complete(summary, started):
+    """Sends the summary that ends a probe_profiles scan."""
+    send_response(dict(summary, type="probe_complete", elapsed_ms=round((time.perf_counter() - started) * 1000, 1)))
+
+def probe_profiles(profile_names, max_parallel, timeout, read_banner, max_age, request_id):
+    """Probes the hosts of several profiles with at most max_parallel connects in flight."""
+    # Streamed results keep the id of the scan so the caller can tell concurrent scans apart
+    CURRENT_REQUEST_ID.set(request_id)
+    started = time.perf_counter()
+    targets, summary = plan_probes(profile_names, read_banner, max_age)
+    if targets:
+        with ThreadPoolExecutor(max_workers=min(max_parallel, len(targets))) as executor:
+            futures = {executor.submit(probe_target, hostname, port, timeout, read_banner): (hostname, port) for hostname, port in targets}
+            for future in as_completed(futures):
+                target = futures[future]
+                report_probe(target, future.result(), targets[target], read_banner, summary)
+    send_probe_complete(summary, started)
+
+async def probe_profiles_async(profile_names, max_parallel, timeout, read_banner, max_age, request_id):
+    """Asyncio variant of probe_profiles, bounded by a semaphore instead of worker threads."""
+    CURRENT_REQUEST_ID.set(request_id)
+    started = time.perf_counter()
+    targets, summary = plan_probes(profile_names, read_banner, max_age)
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def probe_one(target):
+        async with semaphore:
+            result = await probe_target_async(target[0], target[1], timeout, read_banner)
+        report_probe(target, result, targets[target], read_banner, summary)
+
+    await asyncio.gather(*(probe_one(target) for target in targets))
+    send_probe_complete(summary, started)
+
+def forward_specs_from_command(command):
+    """Returns the -L forward specs of an ssh argv."""
+    return [command[i + 1] for i, arg in enumerate(command[:-1]) if arg == "-L"]
+
+def probe_local_ports(ports):
+    """Returns the subset of local ports that do not accept a TCP connection."""
+    closed = set()
+    for port in ports:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=FORWARD_PROBE_TIMEOUT):
+                pass
+        except OSError:
+            closed.add(port)
+    return closed
+
+async def probe_local_ports_async(ports):
+    """Asyncio variant of probe_local_ports."""
+    closed = set()
+    for port in ports:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), FORWARD_PROBE_TIMEOUT)
+            writer.close()
+        except (OSError, asyncio.TimeoutError):
+            closed.add(port)
+    return closed
+
+def forward_failure_message(session):
+    """Returns an error message if ssh reported a forward it could not listen on, else None."""
+    if session.failed_ports:
+        ports = ", ".join(str(port) for port in sorted(session.failed_ports))
+        return f"Local forwarding failed: cannot listen on port {ports}."
+    return None
+
+def exit_failure_message(session):
+    """Returns the error reported when ssh exits before becoming ready."""
+    if session.error_lines:
+        return f"SSH connection failed: {' '.join(session.error_lines)}"
+    return f"SSH process exited unexpectedly (code {session.process.returncode})."
+
+def readiness_timeout_message(session):
+    """Returns the error reported when a session misses its connect timeout."""
+    return f"Timed out after {session.connect_timeout}s waiting for the connection to become ready."
+
+def probe_failure_message(closed_ports):
+    """Returns the error reported when forwarded ports never accept connections."""
+    ports = ", ".join(str(port) for port in sorted(closed_ports))
+    return f"Timed out waiting for forwarded port {ports} to accept connections."
+
+def wait_for_ready(session):
+    """Waits for the ssh -v readiness milestones; returns an error message or None."""
+    deadline = session.spawned_at + session.connect_timeout
+    while not session.is_ready():
+        error = forward_failure_message(session)
+        if error:
+            return error
+        if session.output_done.is_set():
+            session.process.wait()
+            return exit_failure_message(session)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return readiness_timeout_message(session)
+        session.progress.wait(remaining)
+        session.progress.clear()
+
+    if session.probe_forwards:
+        # Confirm the forwards accept connections, not just that ssh says they listen
+        while True:
+            closed = probe_local_ports(session.expected_ports)
+            if not closed:
+                session.milestones["forwards_probed"] = session.elapsed_ms()
+                break
+            if not session.is_alive():
+                return exit_failure_message(session)
+            if time.monotonic() >= deadline:
+                return probe_failure_message(closed)
+            time.sleep(FORWARD_PROBE_INTERVAL)
+    return None
+
+async def wait_for_ready_async(session):
+    """Asyncio variant of wait_for_ready."""
+    deadline = session.spawned_at + session.connect_timeout
+    while not session.is_ready():
+        error = forward_failure_message(session)
+        if error:
+            return error
+        if session.output_done.is_set():
+            await session.process.wait()
+            return exit_failure_message(session)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return readiness_timeout_message(session)
+        try:
+            await asyncio.wait_for(session.progress.wait(), remaining)
+        except asyncio.TimeoutError:
+            pass
+        session.progress.clear()
+
+    if session.probe_forwards:
+        while True:
+            closed = await probe_local_ports_async(session.expected_ports)
+            if not closed:
+                session.milestones["forwards_probed"] = session.elapsed_ms()
+                break
+            if not session.is_alive():
+                return exit_failure_message(session)
+            if time.monotonic() >= deadline:
+                return probe_failure_message(closed)
+            await asyncio.sleep(FORWARD_PROBE_INTERVAL)
+    return None
+
+def report_session_ready(session, error):
+    """Reports the outcome of the readiness wait and stops ssh if it failed."""
+    if error is None:
+        if session.master is not None:
+            session.master.ready = True
+        handshake_ms = session.elapsed_ms()
+        update_connection_status("Connected", f"Successfully connected to '{session.profile_name}' in {handshake_ms:.0f} ms.",
+                                 session.session_id, handshake_ms=handshake_ms, milestones=dict(session.milestones))
+        return
+    if session.stop_requested:
+        return # Disconnected while connecting; reported on exit
+    if not will_reconnect(session):
+        update_connection_status("Error", error, session.session_id) # Otherwise reported as Reconnecting... on exit
+    if session.is_alive():
+        # Do not leave a half-working ssh behind after a failed or timed-out connect
+        try:
+            os.killpg(os.getpgid(session.process.pid), signal.SIGTERM)
+        except ProcessLookupError:
+            pass
 
+def report_session_exit(session, error):
+    """Reports the final status of an exited ssh process and releases its session."""
     # Process has exited (either normally or due to signal)
-    returncode = process.returncode
-    if active_ssh_process is process: # Only update if this is still the active process
-        if returncode == 0:
-            update_connection_status("Disconnected", "SSH connection closed.")
+    returncode = session.process.returncode
+    tunnel = session.tunnel
+    armed = LAZY_TUNNELS.get(session.session_id)
+    if tunnel is not None and armed is not None and get_session(session.session_id) is session:
+        release_session(session)
+        if armed is tunnel:
+            update_connection_status("Standby", standby_message(session, error), session.session_id)
+        else: # Stopped because the profile changed; its new tunnel is listening
+            update_connection_status("Standby", "Profile changed; ssh starts again on the next connection.", session.session_id)
+    elif get_session(session.session_id) is session and will_reconnect(session):
+        release_session(session)
+        schedule_reconnect(session, error or f"SSH process exited with code {returncode}.")
+    elif get_session(session.session_id) is session: # Only update if this is still the registered session
+        if error is not None and not session.stop_requested:
+            pass # The failure has already been reported
+        elif returncode == 0:
+            update_connection_status("Disconnected", "SSH connection closed.", session.session_id)
         elif returncode is not None: # Non-zero exit code
              # Check if it was likely terminated by signal (e.g., SIGTERM from disconnect)
              # Negative return codes often indicate termination by signal (-signal.SIGTERM)
              if returncode < 0:
-                 update_connection_status("Disconnected", "SSH connection terminated.")
+                 update_connection_status("Disconnected", "SSH connection terminated.", session.session_id)
              else:
-                update_connection_status("Error", f"SSH process exited with code {returncode}.")
+                update_connection_status("Error", f"SSH process exited with code {returncode}.", session.session_id)
         else: # returncode is None, but wait() returned - process finished
-             update_connection_status("Disconnected", "SSH connection closed.")
+             update_connection_status("Disconnected", "SSH connection closed.", session.session_id)
+
+        release_session(session)
+    release_master_users(session)
+
+# --- Auto-Reconnect Supervisor ---
+def will_reconnect(session):
+    """Returns True when a session that ended should be restarted by the supervisor."""
+    if session.stop_requested or session.tunnel is not None:
+        return False # A lazy tunnel starts ssh again on its next connection instead
+    profile = SSH_PROFILES.get(session.profile_name)
+    if not profile or not profile.get("auto_reconnect"):
+        return False
+    # Only sessions that came up once are supervised; a first connect that fails is reported as usual
+    return session.connected_at is not None or session.reconnect is not None
+
+def schedule_reconnect(session, reason):
+    """Reports a dropped session as Reconnecting... and starts ssh again after a jittered backoff."""
+    now = time.monotonic()
+    with sessions_lock:
+        state = session.reconnect or ReconnectState(session.profile_name)
+        if state.timer is not None:
+            return # An attempt is already pending
+        RECONNECTS[session.profile_name] = state
+        if session.assigned_ports:
+            state.assigned_ports = dict(session.assigned_ports)
+        if session.connected_at is not None and now - session.connected_at >= RECONNECT_STABLE_AFTER:
+            state.attempt = 0 # The connection was healthy for a while; start the backoff over
+        if state.down_since is None:
+            state.down_since = now
+        state.attempt += 1
+        state.backoff = min(RECONNECT_MAX_BACKOFF, RECONNECT_INITIAL_BACKOFF * 2 ** min(state.attempt - 1, 16))
+        # Equal jitter: spreads out profiles that dropped together without ever retrying immediately
+        delay = state.backoff / 2 + random.uniform(0, state.backoff / 2)
+        if BACKEND_LOOP is not None:
+            state.timer = run_in_background(reconnect_after_async(state, delay))
+        else:
+            state.timer = threading.Timer(delay, run_reconnect, args=(state,))
+            state.timer.daemon = True
+            state.timer.start()
+    update_connection_status("Reconnecting...", f"{reason} Reconnecting in {delay:.1f} s (attempt {state.attempt}).",
+                             session.profile_name, reconnect=state.to_dict())
+
+def run_reconnect(state):
+    """Starts the next reconnect attempt unless supervision was cancelled meanwhile."""
+    with sessions_lock:
+        if RECONNECTS.get(state.profile_name) is not state or state.timer is None:
+            return
+        state.timer = None
+        profile = SSH_PROFILES.get(state.profile_name)
+        disabled = not profile or not profile.get("auto_reconnect")
+        if disabled:
+            del RECONNECTS[state.profile_name]
+    if disabled:
+        update_connection_status("Disconnected", "Auto-reconnect is no longer enabled for this profile.", state.profile_name)
+        return
+    connect_to_profile(state.profile_name, reconnect=state)
+
+async def reconnect_after_async(state, delay):
+    """Asyncio variant of the reconnect timer."""
+    await asyncio.sleep(delay)
+    run_reconnect(state)
+
+def cancel_reconnect(profile_name):
+    """Stops supervising a profile; returns True if a reconnect attempt was pending."""
+    with sessions_lock:
+        state = RECONNECTS.pop(profile_name, None)
+        timer = state.timer if state else None
+        if state:
+            state.timer = None
+    if timer is None:
+        return False
+    timer.cancel()
+    return True
+
+def stop_if_requested(session):
+    """Stops ssh right after spawning when the session was disconnected while it started."""
+    if session.stop_requested:
+        try:
+            os.killpg(os.getpgid(session.process.pid), signal.SIGTERM)
+        except ProcessLookupError:
+            pass
 
-        active_ssh_process = None # Reset process variable
+def monitor_ssh_process(session):
+    """Monitors the SSH process for readiness and exit and updates status."""
+    error = wait_for_ready(session)
+    report_session_ready(session, error)
+    session.process.wait() # Wait for the process to fully terminate
+    report_session_exit(session, error)
 
 
-def read_process_output(pipe, name):
-    """Reads output from a process pipe and prints it to stderr."""
-    # This helps in debugging the SSH command itself by seeing its output
+def read_process_output(pipe, name, session):
+    """Reads output from a process pipe into the session log, tracking readiness milestones."""
     for line in iter(pipe.readline, b''):
-        sys.stderr.write(f"SSH {name}: {line.decode()}")
+        text = line.decode(errors="replace")
+        session.log.append(text)
+        session.note_output(text)
     pipe.close()
+    if name == "stderr":
+        session.output_done.set()
+        session.progress.set()
+
+async def read_process_output_async(stream, name, session):
+    """Asyncio variant of read_process_output."""
+    async for line in stream:
+        text = line.decode(errors="replace")
+        session.log.append(text)
+        session.note_output(text)
+    if name == "stderr":
+        session.output_done.set()
+        session.progress.set()
+
+async def run_session_async(session, command):
+    """Spawns ssh and multiplexes its pipes and exit wait on the event loop."""
+    try:
+        session.spawned_at = time.monotonic()
+        session.process = await asyncio.create_subprocess_exec(
+            *command,
+            start_new_session=True, # Same process-group isolation as preexec_fn=os.setsid
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stop_if_requested(session)
+    except FileNotFoundError:
+        update_connection_status("Error", SSH_NOT_FOUND_MESSAGE, session.session_id)
+        release_session(session)
+        release_master_users(session)
+        return
+    except Exception as e:
+        update_connection_status("Error", f"An unexpected error occurred while starting SSH process: {e}", session.session_id)
+        release_session(session)
+        release_master_users(session)
+        return
 
+    readers = [
+        asyncio.create_task(read_process_output_async(session.process.stdout, "stdout", session)),
+        asyncio.create_task(read_process_output_async(session.process.stderr, "stderr", session)),
+    ]
+    error = await wait_for_ready_async(session)
+    report_session_ready(session, error)
+    await session.process.wait()
+    await asyncio.gather(*readers, return_exceptions=True)
+    report_session_exit(session, error)
+
+def run_in_background(coro, context=None):
+    """Schedules a coroutine on the backend loop and keeps a reference until it finishes.
+
+    The task runs in `context` when given (to answer the current request from it), else in an empty one.
+    """
+    # Tasks copy the current context; start from an empty one so request state does not leak in
+    task = (context or contextvars.Context()).run(BACKEND_LOOP.create_task, coro)
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(BACKGROUND_TASKS.discard)
+    return task
+
+
+def is_valid_forward(fwd):
+    """Returns True for a {local_port, remote_host, remote_port} forward rule with valid values.
+
+    local_port may also be "auto" to have a free port picked at connect time. The optional
+    "metered" flag has the backend relay the forward and count its traffic.
+    """
+    return isinstance(fwd, dict) and isinstance(fwd.get("metered", False), bool) and \
+        (fwd.get("local_port") == "auto" or
+         isinstance(fwd.get("local_port"), int) and not isinstance(fwd.get("local_port"), bool) and 0 < fwd.get("local_port") <= 65535) and \
+        isinstance(fwd.get("remote_host"), str) and bool(fwd.get("remote_host")) and \
+        isinstance(fwd.get("remote_port"), int) and not isinstance(fwd.get("remote_port"), bool) and 0 < fwd.get("remote_port") <= 65535
+
+def validate_profile_data(profile_name, profile_data):
+    """Checks profile data against the profile schema; returns an error message or None."""
+    if not isinstance(profile_data.get("hostname"), str) or not profile_data.get("hostname"):
+        return f"Invalid profile data for '{profile_name}': Hostname is required and must be a string."
+    if profile_data.get("username") is not None and not isinstance(profile_data.get("username"), str):
+        return f"Invalid profile data for '{profile_name}': Username must be a string or null."
+    if profile_data["hostname"].startswith("-") or (profile_data.get("username") or "").startswith("-"):
+        # ssh would parse these as options
+        return f"Invalid profile data for '{profile_name}': Hostname and username must not start with '-'."
+    port = profile_data.get("port")
+    if port is not None and (isinstance(port, bool) or not isinstance(port, int) or port <= 0 or port > 65535):
+        return f"Invalid profile data for '{profile_name}': Port must be a valid integer between 1 and 65535."
+    forwards = profile_data.get("forwards")
+    if forwards is not None and not isinstance(forwards, list):
+        return f"Invalid profile data for '{profile_name}': Forwards must be a list."
+    connect_timeout = profile_data.get("connect_timeout")
+    if connect_timeout is not None and (isinstance(connect_timeout, bool) or not isinstance(connect_timeout, (int, float)) or connect_timeout <= 0):
+        return f"Invalid profile data for '{profile_name}': Connect timeout must be a positive number of seconds."
+    tags = profile_data.get("tags")
+    if tags is not None and (not isinstance(tags, list) or not all(isinstance(tag, str) and tag for tag in tags)):
+        return f"Invalid profile data for '{profile_name}': Tags must be a list of non-empty strings."
+    if profile_data.get("multiplex") is not None and not isinstance(profile_data.get("multiplex"), bool):
+        return f"Invalid profile data for '{profile_name}': Multiplex must be true or false."
+    if profile_data.get("lazy") is not None and not isinstance(profile_data.get("lazy"), bool):
+        return f"Invalid profile data for '{profile_name}': Lazy must be true or false."
+    if profile_data.get("lazy") and (profile_data.get("multiplex") or not forwards):
+        return f"Invalid profile data for '{profile_name}': Lazy profiles need at least one port forward and cannot use multiplex."
+    idle_timeout = profile_data.get("idle_timeout")
+    if idle_timeout is not None and (isinstance(idle_timeout, bool) or not isinstance(idle_timeout, (int, float)) or idle_timeout <= 0):
+        return f"Invalid profile data for '{profile_name}': Idle timeout must be a positive number of seconds."
+    if profile_data.get("probe_forwards") is not None and not isinstance(profile_data.get("probe_forwards"), bool):
+        return f"Invalid profile data for '{profile_name}': Probe forwards must be true or false."
+    if profile_data.get("auto_reconnect") is not None and not isinstance(profile_data.get("auto_reconnect"), bool):
+        return f"Invalid profile data for '{profile_name}': Auto-reconnect must be true or false."
+    keepalive_interval = profile_data.get("keepalive_interval")
+    if keepalive_interval is not None and (isinstance(keepalive_interval, bool) or not isinstance(keepalive_interval, int) or keepalive_interval < 0):
+        return f"Invalid profile data for '{profile_name}': Keepalive interval must be a non-negative number of seconds."
+    keepalive_count_max = profile_data.get("keepalive_count_max")
+    if keepalive_count_max is not None and (isinstance(keepalive_count_max, bool) or not isinstance(keepalive_count_max, int) or keepalive_count_max < 1):
+        return f"Invalid profile data for '{profile_name}': Keepalive count max must be a positive integer."
+    auto_port_range = profile_data.get("auto_port_range")
+    if auto_port_range is not None and (not isinstance(auto_port_range, list) or len(auto_port_range) != 2 or
+                                        not all(isinstance(port, int) and not isinstance(port, bool) for port in auto_port_range) or
+                                        not 0 < auto_port_range[0] <= auto_port_range[1] <= 65535):
+        return f"Invalid profile data for '{profile_name}': Auto port range must be [low, high] with 1 <= low <= high <= 65535."
+    if isinstance(forwards, list):
+        local_ports = set()
+        for i, fwd in enumerate(forwards):
+            if not is_valid_forward(fwd):
+                return f"Invalid profile data for '{profile_name}': Invalid forward rule at index {i}. Check local_port (int or \"auto\"), remote_host (string), remote_port (int)."
+            if fwd["local_port"] in local_ports:
+                return f"Invalid profile data for '{profile_name}': Local port {fwd['local_port']} is used by more than one forward."
+            if fwd["local_port"] != "auto":
+                local_ports.add(fwd["local_port"])
+    return None
+
+def change_live_forward(session, fwd, operation):
+    """Adds ("forward") or removes ("cancel") one forward on a live multiplexed session."""
+    spec = forward_spec(fwd["local_port"], fwd["remote_host"], fwd["remote_port"])
+    adding = operation == "forward"
+    if adding and spec in session.forward_specs:
+        send_response({"type": "error", "message": f"Forward {spec} is already active on '{session.session_id}'."})
+        return
+    if not adding and spec not in session.forward_specs:
+        send_response({"type": "error", "message": f"Forward {spec} is not active on '{session.session_id}'."})
+        return
+
+    def on_done(error):
+        if error:
+            if adding:
+                release_local_ports(session, [fwd["local_port"]])
+            send_response({"type": "error", "message": f"Failed to update forwards of '{session.session_id}': {error}"})
+            return
+        if adding:
+            session.forward_specs.append(spec)
+        elif spec in session.forward_specs:
+            session.forward_specs.remove(spec)
+            release_local_ports(session, [fwd["local_port"]])
+        send_response({"type": "forward_added" if adding else "forward_removed", "session_id": session.session_id,
+                       "forward": fwd, "forwards": list(session.forward_specs)})
+
+    apply_control_command(session.master, operation, [spec], on_done)
+
+def log_request_params(request, request_name):
+    """Validates the session and level of a log request; returns (log, min_level, error message)."""
+    session_id = request.get("session_id", request.get("profile_name"))
+    level = request.get("level", "debug")
+    if not session_id or not isinstance(session_id, str):
+        return None, None, f"Invalid request for {request_name} (missing or invalid 'session_id')."
+    if level not in LOG_LEVELS:
+        return None, None, f"Invalid request for {request_name} ('level' must be one of {', '.join(LOG_LEVELS)})."
+    with sessions_lock:
+        session = SSH_SESSIONS.get(session_id)
+        if session is not None and session.attached and session.master.owner is not None:
+            return session.master.owner.log, LOG_LEVELS.index(level), None # Output comes from the master's ssh
+        if session_id not in SESSION_LOGS and session_id not in SSH_PROFILES:
+            return None, None, f"Unknown session '{session_id}'."
+    return session_log_for(session_id), LOG_LEVELS.index(level), None # Created early so a tail can precede connect
+
+def profiles_delta(since):
+    """Builds the profiles_delta response for changes after revision `since`."""
+    revision, added, changed, removed = PROFILE_STORE.changes_since(since)
+    if since > revision or since < PROFILE_STORE.tombstone_floor:
+        # The client saw a revision this store never had (e.g. the database was replaced), or one older than
+        # the pruned tombstones, so its removals cannot be listed: resend everything
+        revision, added, changed, removed = PROFILE_STORE.changes_since(0)
+        changed, removed, reset = [], [], True
+    else:
+        reset = False
+    return {
+        "type": "profiles_delta",
+        "since": since,
+        "revision": revision,
+        "reset": reset,
+        "added": {name: SSH_PROFILES[name] for name in added if name in SSH_PROFILES},
+        "changed": {name: SSH_PROFILES[name] for name in changed if name in SSH_PROFILES},
+        "removed": removed,
+    }
+
+# --- Metrics ---
+def process_memory():
+    """Returns (current RSS in bytes or None where /proc is unavailable, peak RSS in bytes)."""
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        rss = None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss, peak if sys.platform == "darwin" else peak * 1024 # ru_maxrss is in KiB on Linux
+
+def thread_counts():
+    """Returns live threads grouped by their target function (Thread-N (target) names)."""
+    counts = {}
+    for thread in threading.enumerate():
+        match = re.search(r"\((\w+)\)$", thread.name)
+        target = match.group(1) if match else thread.name
+        counts[target] = counts.get(target, 0) + 1
+    return counts
+
+def open_file_count():
+    """Returns the number of open file descriptors, or None where /proc is unavailable."""
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+def collect_metrics(reset=False):
+    """Builds the get_metrics response; reset clears the histograms once they are reported."""
+    rss, peak_rss = process_memory()
+    with sessions_lock:
+        counts = {
+            "profiles": len(SSH_PROFILES),
+            "sessions": len(SSH_SESSIONS),
+            "ssh_processes": sum(1 for session in SSH_SESSIONS.values() if session.is_alive()),
+            "lazy_tunnels": len(LAZY_TUNNELS),
+            "reconnecting": sum(1 for state in RECONNECTS.values() if state.timer is not None),
+            "control_masters": sum(1 for master in CONTROL_MASTERS.values() if master.is_alive()),
+            "relays": sum(len(session.relays) for session in SSH_SESSIONS.values()) +
+                      sum(len(tunnel.relays) for tunnel in LAZY_TUNNELS.values()),
+            "session_logs": len(SESSION_LOGS),
+            "session_log_bytes": sum(len(log.buffer) for log in SESSION_LOGS.values()),
+            "background_tasks": len(BACKGROUND_TASKS),
+            "open_files": open_file_count(),
+        }
+    threads = thread_counts()
+    with metrics_lock:
+        tables = {name: {key: histogram.to_dict() for key, histogram in sorted(table.items())}
+                  for name, table in (("requests", REQUEST_TIMINGS), ("connects", CONNECT_TIMINGS), ("store", STORE_TIMINGS))}
+        if reset:
+            for table in (REQUEST_TIMINGS, CONNECT_TIMINGS, STORE_TIMINGS):
+                table.clear()
+    return {
+        "type": "metrics",
+        "uptime_s": round(time.monotonic() - BACKEND_STARTED_AT, 3),
+        "backend": "asyncio" if BACKEND_LOOP is not None else "threaded",
+        "memory": {"rss_bytes": rss, "peak_rss_bytes": peak_rss},
+        "threads": {"total": sum(threads.values()), "by_target": threads},
+        "counts": counts,
+        **tables,
+    }
 
 def handle_request(request):
     """Handles incoming requests from the frontend."""
@@ -272,7 +3135,54 @@ def handle_request(request):
 
 
     if request_type == "list_profiles":
-        send_response({"type": "profiles_list", "data": SSH_PROFILES})
+        cursor = request.get("cursor")
+        limit = request.get("limit")
+        if cursor is None and limit is None:
+            revision = PROFILE_STORE.revision if PROFILE_STORE else 0
+            send_response({"type": "profiles_list", "data": SSH_PROFILES, "revision": revision})
+            return
+        if cursor is not None and not isinstance(cursor, str):
+             send_response({"type": "error", "message": "Invalid request for listing profiles (invalid 'cursor')."})
+             return
+        if limit is None:
+            limit = PROFILE_PAGE_DEFAULT_LIMIT
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0:
+             send_response({"type": "error", "message": "Invalid request for listing profiles ('limit' must be a positive integer)."})
+             return
+        if PROFILE_STORE is None:
+             send_response({"type": "error", "message": f"The profile store {PROFILES_DB} is not available."})
+             return
+        revision, names, next_cursor = PROFILE_STORE.page(cursor, min(limit, PROFILE_PAGE_MAX_LIMIT))
+        send_response({"type": "profiles_list", "data": {name: SSH_PROFILES[name] for name in names if name in SSH_PROFILES},
+                       "revision": revision, "cursor": cursor, "next_cursor": next_cursor})
+
+    elif request_type == "list_profiles_since":
+        since = request.get("since")
+        if not isinstance(since, int) or isinstance(since, bool) or since < 0:
+             send_response({"type": "error", "message": "Invalid request for profile changes (missing or invalid 'since')."})
+             return
+        if PROFILE_STORE is None:
+             send_response({"type": "error", "message": f"The profile store {PROFILES_DB} is not available."})
+             return
+        send_response(profiles_delta(since))
+
+    elif request_type == "search_profiles":
+        query = request.get("query")
+        limit = request.get("limit", SEARCH_DEFAULT_LIMIT)
+        if not isinstance(query, str):
+             send_response({"type": "error", "message": "Invalid request for searching profiles (missing or invalid 'query')."})
+             return
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0:
+             send_response({"type": "error", "message": "Invalid request for searching profiles ('limit' must be a positive integer)."})
+             return
+        ranked, total = PROFILE_INDEX.search(query, min(limit, SEARCH_MAX_LIMIT))
+        results = []
+        for score, name in ranked:
+            profile = SSH_PROFILES.get(name, {})
+            results.append({"name": name, "score": score, "hostname": profile.get("hostname"),
+                            "username": profile.get("username"), "tags": profile.get("tags", [])})
+        send_response({"type": "search_results", "query": query, "results": results, "total": total,
+                       "truncated": total > len(results)})
 
     elif request_type == "get_profile_details":
         profile_name = request.get("profile_name")
@@ -312,37 +3222,20 @@ def handle_request(request):
              send_response({"type": "error", "message": f"Invalid request for {request_type} (missing or invalid 'data')."})
              return
 
-        if not isinstance(profile_data.get("hostname"), str) or not profile_data.get("hostname"):
-             send_response({"type": "error", "message": f"Invalid profile data for '{profile_name}': Hostname is required and must be a string."})
-             return
-        if profile_data.get("username") is not None and not isinstance(profile_data.get("username"), str):
-             send_response({"type": "error", "message": f"Invalid profile data for '{profile_name}': Username must be a string or null."})
-             return
-        port = profile_data.get("port")
-        if port is not None and (not isinstance(port, int) or port <= 0 or port > 65535):
-             send_response({"type": "error", "message": f"Invalid profile data for '{profile_name}': Port must be a valid integer between 1 and 65535."})
-             return
-        forwards = profile_data.get("forwards")
-        if forwards is not None and not isinstance(forwards, list):
-             send_response({"type": "error", "message": f"Invalid profile data for '{profile_name}': Forwards must be a list."})
+        compiled, error = compile_profile(profile_name, profile_data)
+        if error:
+             send_response({"type": "error", "message": error})
              return
-        if isinstance(forwards, list):
-            for i, fwd in enumerate(forwards):
-                if not isinstance(fwd, dict) or \
-                   not isinstance(fwd.get("local_port"), int) or fwd.get("local_port") <= 0 or fwd.get("local_port") > 65535 or \
-                   not isinstance(fwd.get("remote_host"), str) or not fwd.get("remote_host") or \
-                   not isinstance(fwd.get("remote_port"), int) or fwd.get("remote_port") <= 0 or fwd.get("remote_port") > 65535:
-                    send_response({"type": "error", "message": f"Invalid profile data for '{profile_name}': Invalid forward rule at index {i}. Check local_port (int), remote_host (string), remote_port (int)."})
-                    return
 
         if request_type == "add_profile":
             if profile_name in SSH_PROFILES:
                  send_response({"type": "error", "message": f"Profile '{profile_name}' already exists."})
                  return
-            SSH_PROFILES[profile_name] = profile_data
-            saved, error = save_profiles()
+            conflicts = saved_port_conflicts(profile_name, profile_data)
+            saved, error = store_profile(profile_name, profile_data, compiled)
             if saved:
-                send_response({"type": "profile_saved", "message": f"Profile '{profile_name}' added successfully."})
+                send_response({"type": "profile_saved", "message": f"Profile '{profile_name}' added successfully." + port_conflict_note(conflicts),
+                               "profile_name": profile_name, "revision": PROFILE_STORE.revision, "port_conflicts": conflicts})
             else:
                 send_response({"type": "error", "message": f"Failed to save profile '{profile_name}': {error}"})
 
@@ -350,14 +3243,36 @@ def handle_request(request):
             if profile_name not in SSH_PROFILES:
                  send_response({"type": "error", "message": f"Profile '{profile_name}' not found for saving."})
                  return
-            SSH_PROFILES[profile_name] = profile_data
-            saved, error = save_profiles()
+            if "source" in SSH_PROFILES[profile_name] and "source" not in profile_data:
+                # Edits keep an imported profile imported, so import_ssh_config still refreshes it
+                profile_data = dict(profile_data, source=SSH_PROFILES[profile_name]["source"])
+            conflicts = saved_port_conflicts(profile_name, profile_data)
+            saved, error = store_profile(profile_name, profile_data, compiled)
             if saved:
-                send_response({"type": "profile_saved", "message": f"Profile '{profile_name}' saved successfully."})
+                send_response({"type": "profile_saved", "message": f"Profile '{profile_name}' saved successfully." + port_conflict_note(conflicts),
+                               "profile_name": profile_name, "revision": PROFILE_STORE.revision, "port_conflicts": conflicts})
             else:
                 send_response({"type": "error", "message": f"Failed to save profile '{profile_name}': {error}"})
 
 
+    elif request_type == "import_ssh_config":
+        path = request.get("path", SSH_CONFIG_DEFAULT_PATH)
+        overwrite = request.get("overwrite", False)
+        prefix = request.get("prefix", "")
+        refresh_on_startup = request.get("refresh_on_startup", False)
+        if not path or not isinstance(path, str):
+             send_response({"type": "error", "message": "Invalid request for importing SSH config (invalid 'path')."})
+             return
+        if not isinstance(prefix, str) or not isinstance(overwrite, bool) or not isinstance(refresh_on_startup, bool):
+             send_response({"type": "error", "message": "Invalid request for importing SSH config ('prefix' must be a string, 'overwrite' and 'refresh_on_startup' booleans)."})
+             return
+        path = os.path.abspath(os.path.expanduser(path))
+        response = import_ssh_config(path, overwrite, prefix)
+        if refresh_on_startup and response["type"] != "error" and PROFILE_STORE is not None:
+            PROFILE_STORE.set_meta("ssh_config_refresh_path", path)
+            PROFILE_STORE.set_meta("ssh_config_refresh_prefix", prefix)
+        send_response(response)
+
     elif request_type == "delete_profile":
         profile_name = request.get("profile_name")
         if not profile_name or not isinstance(profile_name, str):
@@ -365,10 +3280,10 @@ def handle_request(request):
              return
 
         if profile_name in SSH_PROFILES:
-            del SSH_PROFILES[profile_name]
-            saved, error = save_profiles()
-            if saved:
-                send_response({"type": "profile_deleted", "message": f"Profile '{profile_name}' deleted successfully."})
+            deleted, error = remove_profile(profile_name)
+            if deleted:
+                send_response({"type": "profile_deleted", "message": f"Profile '{profile_name}' deleted successfully.",
+                               "profile_name": profile_name, "revision": PROFILE_STORE.revision})
             else:
                 send_response({"type": "error", "message": f"Failed to delete profile '{profile_name}': {error}"})
         else:
@@ -382,52 +3297,334 @@ def handle_request(request):
         connect_to_profile(profile_name)
 
     elif request_type == "disconnect":
-        disconnect_active_connection()
+        # Without a session id, disconnect everything (the single-connection behaviour)
+        session_id = request.get("session_id", request.get("profile_name"))
+        if session_id is None:
+            disconnect_all_sessions()
+        elif not isinstance(session_id, str) or not session_id:
+             send_response({"type": "error", "message": "Invalid request for disconnecting (invalid 'session_id')."})
+        else:
+            disconnect_session(session_id)
+
+    elif request_type in ["add_forward", "remove_forward"]:
+        session_id = request.get("session_id", request.get("profile_name"))
+        fwd = request.get("forward")
+        if not session_id or not isinstance(session_id, str):
+             send_response({"type": "error", "message": f"Invalid request for {request_type} (missing or invalid 'session_id')."})
+             return
+        if not is_valid_forward(fwd):
+             send_response({"type": "error", "message": f"Invalid request for {request_type}: Check local_port (int), remote_host (string), remote_port (int)."})
+             return
+        session = get_session(session_id)
+        if not session or not session.is_alive() or session.status != "Connected":
+             send_response({"type": "error", "message": f"No live session for '{session_id}'."})
+             return
+        if session.master is None:
+             send_response({"type": "error", "message": f"Session '{session_id}' is not multiplexed. Enable 'multiplex' on the profile to change forwards live."})
+             return
+        if request_type == "remove_forward" and fwd["local_port"] == "auto":
+             send_response({"type": "error", "message": "Invalid request for remove_forward: local_port must be the forwarded port, not 'auto'."})
+             return
+        if request_type == "add_forward" and forward_spec(fwd["local_port"], fwd["remote_host"], fwd["remote_port"]) not in session.forward_specs:
+            fwd, error = claim_live_forward_port(session, fwd)
+            if error:
+                 send_response({"type": "error", "message": error})
+                 return
+        change_live_forward(session, fwd, "forward" if request_type == "add_forward" else "cancel")
+
+    elif request_type == "session_status":
+        session_id = request.get("session_id")
+        if session_id is not None and not isinstance(session_id, str):
+             send_response({"type": "error", "message": "Invalid request for session status (invalid 'session_id')."})
+             return
+        with sessions_lock:
+            if session_id is None:
+                sessions = {sid: session.to_dict() for sid, session in SSH_SESSIONS.items()}
+            else:
+                session = SSH_SESSIONS.get(session_id)
+                sessions = {session_id: session.to_dict()} if session else {}
+            # Profiles waiting for their next reconnect attempt have no live session
+            reconnecting = {name: state.to_dict() for name, state in RECONNECTS.items()
+                            if state.timer is not None and session_id in (None, name)}
+            lazy = {name: tunnel.to_dict() for name, tunnel in LAZY_TUNNELS.items() if session_id in (None, name)}
+        send_response({"type": "session_status", "sessions": sessions, "reconnecting": reconnecting, "lazy": lazy})
+
+    elif request_type == "get_session_log":
+        log, min_level, error = log_request_params(request, "get_session_log")
+        since = request.get("since")
+        limit = request.get("limit", SESSION_LOG_DEFAULT_LIMIT)
+        if error:
+             send_response({"type": "error", "message": error})
+             return
+        if since is not None and (not isinstance(since, int) or isinstance(since, bool) or since < 0):
+             send_response({"type": "error", "message": "Invalid request for get_session_log ('since' must be a non-negative integer)."})
+             return
+        if not isinstance(limit, int) or isinstance(limit, bool) or not 0 < limit <= SESSION_LOG_MAX_LIMIT:
+             send_response({"type": "error", "message": f"Invalid request for get_session_log ('limit' must be between 1 and {SESSION_LOG_MAX_LIMIT})."})
+             return
+        lines, next_seq, lines_lost = log.read(since, limit, min_level)
+        send_response({"type": "session_log", "session_id": log.session_id, "lines": lines,
+                       "next_seq": next_seq, "lines_lost": lines_lost})
+
+    elif request_type == "tail_session_log":
+        log, min_level, error = log_request_params(request, "tail_session_log")
+        enabled = request.get("enabled", True)
+        rate = request.get("lines_per_sec", SESSION_LOG_TAIL_DEFAULT_RATE)
+        if error:
+             send_response({"type": "error", "message": error})
+             return
+        if not isinstance(enabled, bool):
+             send_response({"type": "error", "message": "Invalid request for tail_session_log ('enabled' must be a boolean)."})
+             return
+        if not isinstance(rate, (int, float)) or isinstance(rate, bool) or not 1 <= rate <= SESSION_LOG_TAIL_MAX_RATE:
+             send_response({"type": "error", "message": f"Invalid request for tail_session_log ('lines_per_sec' must be between 1 and {SESSION_LOG_TAIL_MAX_RATE})."})
+             return
+        log.set_tail(min_level if enabled else None, rate)
+        send_response({"type": "session_log_tailing", "session_id": log.session_id, "enabled": enabled,
+                       "level": LOG_LEVELS[min_level], "lines_per_sec": rate, "next_seq": log.next_seq})
+
+    elif request_type == "batch":
+        requests = request.get("requests")
+        if not isinstance(requests, list) or not requests or len(requests) > BATCH_MAX_REQUESTS:
+             send_response({"type": "error", "message": f"Invalid request for batch ('requests' must be a list of 1 to {BATCH_MAX_REQUESTS} requests)."})
+             return
+        if any(isinstance(sub_request, dict) and sub_request.get("type") == "batch" for sub_request in requests):
+             send_response({"type": "error", "message": "Invalid request for batch (batches cannot be nested)."})
+             return
+        run_batch(requests, lambda results: send_response({"type": "batch_result", "results": results}))
+
+    elif request_type == "connect_group":
+        profile_names = request.get("profile_names")
+        max_parallel = request.get("max_parallel", GROUP_CONNECT_DEFAULT_PARALLEL)
+        if not isinstance(profile_names, list) or not profile_names or \
+           not all(isinstance(name, str) and name for name in profile_names):
+             send_response({"type": "error", "message": "Invalid request for connect_group (missing or invalid 'profile_names')."})
+             return
+        if not isinstance(max_parallel, int) or isinstance(max_parallel, bool) or max_parallel <= 0:
+             send_response({"type": "error", "message": "Invalid request for connect_group ('max_parallel' must be a positive integer)."})
+             return
+        # Run the group in the background so the request listener stays responsive
+        profile_names = list(dict.fromkeys(profile_names))
+        args = (profile_names, max_parallel, CURRENT_REQUEST_ID.get())
+        if BACKEND_LOOP is not None:
+            run_in_background(connect_group_async(*args))
+        else:
+            threading.Thread(target=connect_group, args=args, daemon=True).start()
+
+    elif request_type == "get_forward_stats":
+        session_id = request.get("session_id", request.get("profile_name"))
+        with sessions_lock:
+            # An armed lazy tunnel owns its relays across the sessions it starts
+            owners = {sid: session for sid, session in SSH_SESSIONS.items() if session.relays or session_id == sid}
+            owners.update(LAZY_TUNNELS)
+        if session_id is not None:
+            if session_id not in owners:
+                 send_response({"type": "error", "message": f"No active session '{session_id}'."})
+                 return
+            owners = {session_id: owners[session_id]}
+        send_response({"type": "forward_stats", "sessions": {sid: forward_stats_of(owner) for sid, owner in owners.items()}})
+
+    elif request_type == "probe_profiles":
+        profile_names = request.get("profile_names")
+        max_parallel = request.get("max_parallel", PROBE_DEFAULT_PARALLEL)
+        timeout = request.get("timeout", PROBE_DEFAULT_TIMEOUT)
+        read_banner = request.get("read_banner", False)
+        max_age = request.get("max_age", PROBE_CACHE_TTL)
+        if profile_names is None:
+            profile_names = sorted(SSH_PROFILES)
+        elif not isinstance(profile_names, list) or not all(isinstance(name, str) and name for name in profile_names):
+             send_response({"type": "error", "message": "Invalid request for probe_profiles ('profile_names' must be a list of profile names)."})
+             return
+        missing = [name for name in profile_names if name not in SSH_PROFILES]
+        if missing:
+             send_response({"type": "error", "message": f"Profile '{missing[0]}' not found for probing."})
+             return
+        if not isinstance(max_parallel, int) or isinstance(max_parallel, bool) or max_parallel <= 0:
+             send_response({"type": "error", "message": "Invalid request for probe_profiles ('max_parallel' must be a positive integer)."})
+             return
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+             send_response({"type": "error", "message": "Invalid request for probe_profiles ('timeout' must be a positive number of seconds)."})
+             return
+        if not isinstance(read_banner, bool):
+             send_response({"type": "error", "message": "Invalid request for probe_profiles ('read_banner' must be true or false)."})
+             return
+        if isinstance(max_age, bool) or not isinstance(max_age, (int, float)) or max_age < 0:
+             send_response({"type": "error", "message": "Invalid request for probe_profiles ('max_age' must be a non-negative number of seconds)."})
+             return
+        # Probe in the background and stream a probe_result per profile, then a probe_complete summary
+        args = (list(dict.fromkeys(profile_names)), min(max_parallel, PROBE_MAX_PARALLEL), timeout, read_banner, max_age,
+                CURRENT_REQUEST_ID.get())
+        if BACKEND_LOOP is not None:
+            run_in_background(probe_profiles_async(*args))
+        else:
+            threading.Thread(target=probe_profiles, args=args, daemon=True).start()
+
+    elif request_type == "get_metrics":
+        reset = request.get("reset", False)
+        if not isinstance(reset, bool):
+             send_response({"type": "error", "message": "Invalid request for get_metrics ('reset' must be true or false)."})
+             return
+        send_response(collect_metrics(reset))
 
     else:
         send_response({"type": "error", "message": f"Unknown request type: {request_type}"})
 
+def run_request(request):
+    """Handles one decoded request with its request_id echoed in every response."""
+    request_id = request.get("request_id") if isinstance(request, dict) else None
+    token = CURRENT_REQUEST_ID.set(request_id if isinstance(request_id, (str, int)) else None)
+    started = time.perf_counter()
+    try:
+        if not isinstance(request, dict):
+            send_response({"type": "error", "message": "Invalid request format (not a dictionary)."})
+            return
+        handle_request(request)
+    except Exception as e:
+        send_response({"type": "error", "message": f"An unexpected error occurred while processing request: {e}"})
+    finally:
+        CURRENT_REQUEST_ID.reset(token)
+        record_request_timing(request, (time.perf_counter() - started) * 1000)
+
+def record_request_timing(request, ms):
+    """Adds a handled request to the latency histogram of its type."""
+    request_type = request.get("type") if isinstance(request, dict) else None
+    if not isinstance(request_type, str):
+        request_type = "invalid"
+    elif request_type not in REQUEST_TIMINGS and len(REQUEST_TIMINGS) >= METRICS_MAX_REQUEST_TYPES:
+        request_type = "other" # Keeps unknown types sent in a loop from growing the table
+    observe_latency(REQUEST_TIMINGS, request_type, ms)
+
+def run_batch(requests, on_done):
+    """Runs the requests of a batch in order and passes the responses each one produced to on_done.
+
+    On the asyncio backend a request that waits on ssh -O suspends the rest of the batch on the event
+    loop until its reply arrives, instead of blocking the loop.
+    """
+    results = []
+
+    def run_from(index):
+        for i in range(index, len(requests)):
+            captured, pending = [], []
+            token = RESPONSE_CAPTURE.set(captured)
+            pending_token = BATCH_PENDING.set(pending)
+            try:
+                run_request(requests[i])
+            finally:
+                BATCH_PENDING.reset(pending_token)
+                RESPONSE_CAPTURE.reset(token)
+            results.append(captured)
+            if pending:
+                async def resume():
+                    await asyncio.gather(*pending)
+                    run_from(i + 1)
+                run_in_background(resume(), contextvars.copy_context())
+                return
+        on_done(results)
+
+    run_from(0)
+
+def process_request_line(line):
+    """Parses one line of JSON from stdin and dispatches it."""
+    line = line.strip()
+    if not line:
+        return
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError:
+        send_response({"type": "error", "message": "Invalid JSON received from frontend."})
+        return
+    run_request(request)
+
 def listen_for_requests():
     """Listens for JSON requests on stdin."""
     while True:
-        try:
-            line = sys.stdin.readline()
+        line = sys.stdin.readline()
+        if not line:
+            break
+        process_request_line(line)
+
+async def listen_for_requests_async():
+    """Reads JSON requests from stdin with a stream reader on the event loop."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=REQUEST_LINE_LIMIT)
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except (ValueError, OSError):
+        # stdin is a regular file or tty the loop cannot watch; fall back to one reader thread
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
             if not line:
                 break
-            line = line.strip()
-            if not line:
-                continue
+            process_request_line(line)
+        return
 
-            request = json.loads(line)
-            handle_request(request)
-        except json.JSONDecodeError:
-            send_response({"type": "error", "message": "Invalid JSON received from frontend."})
-        except Exception as e:
-            send_response({"type": "error", "message": f"An unexpected error occurred while processing request: {e}"})
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        process_request_line(line.decode(errors="replace"))
+
+def install_child_watcher():
+    """Uses pidfd-based child watching where the default would add a thread per ssh process."""
+    if sys.version_info >= (3, 12) or not hasattr(os, "pidfd_open"):
+        return # 3.12+ already picks the pidfd watcher when the kernel supports it
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            os.close(os.pidfd_open(os.getpid()))
+        except OSError:
+            return # Kernel without pidfd support; keep the default watcher
+        watcher = asyncio.PidfdChildWatcher()
+        watcher.attach_loop(asyncio.get_running_loop())
+        asyncio.set_child_watcher(watcher)
+
+async def async_main():
+    """Runs the backend on a single asyncio event loop."""
+    global BACKEND_LOOP
+    BACKEND_LOOP = asyncio.get_running_loop()
+    install_child_watcher()
+    load_profiles()
+    update_connection_status("Disconnected", "Application started.") # Initial status
+    refresh_ssh_config_on_startup()
+    arm_lazy_profiles()
+    try:
+        await listen_for_requests_async()
+    finally:
+        # Stop every session and let their tasks report the final status
+        disconnect_all_sessions()
+        if BACKGROUND_TASKS:
+            await asyncio.wait(list(BACKGROUND_TASKS), timeout=5)
 
 
 if __name__ == "__main__":
+    if "--asyncio" in sys.argv[1:] or os.environ.get(ASYNCIO_ENV_VAR) == "1":
+        try:
+            asyncio.run(async_main())
+        except KeyboardInterrupt:
+            sys.stderr.write("Backend interrupted by user (KeyboardInterrupt).\n")
+        sys.exit(0)
+
     load_profiles()
     update_connection_status("Disconnected", "Application started.") # Initial status
+    refresh_ssh_config_on_startup()
+    arm_lazy_profiles()
 
     request_listener_thread = threading.Thread(target=listen_for_requests)
     request_listener_thread.daemon = True
     request_listener_thread.start()
 
     try:
-        while request_listener_thread.is_alive():
-            time.sleep(0.1)
+        request_listener_thread.join() # Blocks until stdin closes; no polling needed
     except KeyboardInterrupt:
         sys.stderr.write("Backend interrupted by user (KeyboardInterrupt).\n")
-        # Attempt to disconnect SSH process on backend exit
-        disconnect_active_connection()
+        # Attempt to disconnect SSH processes on backend exit
+        disconnect_all_sessions()
         sys.exit(0)
     except Exception as e:
         sys.stderr.write(f"An error occurred in the main backend thread: {e}\n")
-        # Attempt to disconnect SSH process on backend exit
-        disconnect_active_connection()
+        # Attempt to disconnect SSH processes on backend exit
+        disconnect_all_sessions()
         sys.exit(1)
     finally:
-         # Ensure SSH process is terminated if the main thread exits for other reasons
-         disconnect_active_connection()
-
+         # Ensure SSH processes are terminated if the main thread exits for other reasons
+         disconnect_all_sessions()
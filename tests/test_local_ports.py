@@ -0,0 +1,157 @@
+"""Local port claims: conflicts between sessions and "auto" port allocation.
+
+    python3 -m pytest tests/test_local_ports.py   (or python3 -m unittest discover tests)
+"""
+
+import dataclasses
+import os
+import socket
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ssh_manager_backend as backend
+
+
+def forward(local_port, remote_port=80):
+    return {"local_port": local_port, "remote_host": "localhost", "remote_port": remote_port}
+
+
+def compile_forwards(*local_ports, auto_port_range=None):
+    data = {"hostname": "h", "forwards": [forward(port) for port in local_ports]}
+    if auto_port_range:
+        data["auto_port_range"] = list(auto_port_range)
+    compiled, error = backend.compile_profile("p", data)
+    assert error is None, error
+    return compiled
+
+
+class LocalPortTestCase(unittest.TestCase):
+    def setUp(self):
+        self.busy = set() # Ports "another program" listens on
+        patches = [mock.patch.object(backend, "LIVE_PORTS", {}),
+                   mock.patch.object(backend, "PROFILE_INDEX", backend.ProfileIndex()),
+                   mock.patch.object(backend, "port_is_bindable", lambda port: port not in self.busy)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def claim(self, session, compiled):
+        with backend.sessions_lock:
+            return backend.claim_local_ports(session, compiled)
+
+
+class FixedPortTests(LocalPortTestCase):
+    def test_ports_are_claimed_for_the_session(self):
+        session = backend.SSHSession("a")
+        ports, error = self.claim(session, compile_forwards(41001, 41002))
+        self.assertIsNone(error)
+        self.assertEqual(ports, {0: 41001, 1: 41002})
+        self.assertIs(backend.LIVE_PORTS[41001], session)
+        self.assertEqual(session.local_ports, {41001, 41002})
+
+    def test_port_held_by_another_session(self):
+        self.claim(backend.SSHSession("a"), compile_forwards(41001))
+        other = backend.SSHSession("b")
+        ports, error = self.claim(other, compile_forwards(41002, 41001))
+        self.assertIsNone(ports)
+        self.assertEqual(error, "Local port 41001 (forward 2) is already forwarded by session 'a'.")
+        self.assertNotIn(41002, backend.LIVE_PORTS) # Nothing is claimed on failure
+        self.assertEqual(other.local_ports, set())
+
+    def test_session_can_reclaim_its_own_port(self):
+        session = backend.SSHSession("a")
+        self.claim(session, compile_forwards(41001))
+        self.assertEqual(self.claim(session, compile_forwards(41001)), ({0: 41001}, None))
+
+    def test_port_used_twice_by_one_profile(self):
+        compiled = compile_forwards(41001, 41002)
+        compiled = dataclasses.replace(compiled, forwards=(compiled.forwards[0], compiled.forwards[0]))
+        _, error = self.claim(backend.SSHSession("a"), compiled)
+        self.assertEqual(error, "Local port 41001 is used by more than one forward of 'a'.")
+
+    def test_port_used_by_another_program(self):
+        self.busy.add(41001)
+        _, error = self.claim(backend.SSHSession("a"), compile_forwards(41001))
+        self.assertEqual(error, "Local port 41001 (forward 1) is already in use by another program.")
+
+    def test_release_frees_only_the_sessions_ports(self):
+        first, second = backend.SSHSession("a"), backend.SSHSession("b")
+        self.claim(first, compile_forwards(41001))
+        self.claim(second, compile_forwards(41002))
+        backend.release_local_ports(first)
+        self.assertEqual(backend.LIVE_PORTS, {41002: second})
+        self.assertEqual(first.local_ports, set())
+
+    def test_saved_port_conflicts(self):
+        backend.PROFILE_INDEX.add("b", {"forwards": [forward(41001)]})
+        backend.PROFILE_INDEX.add("c", {"forwards": [forward(41001), forward(41003)]})
+        conflicts = backend.saved_port_conflicts("a", {"forwards": [forward(41001), forward(41002)]})
+        self.assertEqual(conflicts, {41001: ["b", "c"]})
+        self.assertEqual(backend.saved_port_conflicts("b", {"forwards": [forward(41003)]}), {41003: ["c"]})
+
+
+class AutoPortTests(LocalPortTestCase):
+    RANGE = (42000, 42004)
+
+    def test_auto_port_comes_from_the_profile_range(self):
+        session = backend.SSHSession("a")
+        ports, error = self.claim(session, compile_forwards("auto", 41001, "auto", auto_port_range=self.RANGE))
+        self.assertIsNone(error)
+        self.assertEqual(ports[1], 41001)
+        self.assertTrue(all(self.RANGE[0] <= ports[i] <= self.RANGE[1] for i in (0, 2)))
+        self.assertNotEqual(ports[0], ports[2])
+        self.assertEqual(session.assigned_ports, {0: ports[0], 2: ports[2]})
+        self.assertIs(backend.LIVE_PORTS[ports[0]], session)
+
+    def test_auto_port_skips_live_saved_and_busy_ports(self):
+        self.claim(backend.SSHSession("b"), compile_forwards(42000))
+        backend.PROFILE_INDEX.add("c", {"forwards": [forward(42001)]})
+        self.busy.update({42002, 42003})
+        ports, error = self.claim(backend.SSHSession("a"), compile_forwards("auto", auto_port_range=self.RANGE))
+        self.assertIsNone(error)
+        self.assertEqual(ports, {0: 42004})
+
+    def test_auto_port_skips_the_profiles_fixed_ports(self):
+        self.busy.update({42000, 42001, 42002})
+        ports, error = self.claim(backend.SSHSession("a"), compile_forwards(42003, "auto", auto_port_range=self.RANGE))
+        self.assertIsNone(error)
+        self.assertEqual(ports, {0: 42003, 1: 42004})
+
+    def test_range_exhausted(self):
+        self.busy.update(range(self.RANGE[0], self.RANGE[1] + 1))
+        session = backend.SSHSession("a")
+        ports, error = self.claim(session, compile_forwards(41001, "auto", auto_port_range=self.RANGE))
+        self.assertIsNone(ports)
+        self.assertEqual(error, "No free local port in range 42000-42004 for forward 2.")
+        self.assertEqual(backend.LIVE_PORTS, {})
+
+    def test_reconnect_keeps_the_assigned_port(self):
+        session = backend.SSHSession("a")
+        session.reconnect = backend.ReconnectState("a")
+        session.reconnect.assigned_ports = {0: 42003}
+        ports, _ = self.claim(session, compile_forwards("auto", auto_port_range=self.RANGE))
+        self.assertEqual(ports, {0: 42003})
+
+    def test_reconnect_picks_another_port_once_its_own_is_taken(self):
+        self.claim(backend.SSHSession("b"), compile_forwards(42003))
+        session = backend.SSHSession("a")
+        session.reconnect = backend.ReconnectState("a")
+        session.reconnect.assigned_ports = {0: 42003}
+        ports, error = self.claim(session, compile_forwards("auto", auto_port_range=self.RANGE))
+        self.assertIsNone(error)
+        self.assertNotEqual(ports[0], 42003)
+
+
+class PortIsBindableTests(unittest.TestCase):
+    def test_listening_port_is_not_bindable(self):
+        with socket.create_server(("127.0.0.1", 0)) as server:
+            port = server.getsockname()[1]
+            self.assertFalse(backend.port_is_bindable(port))
+        self.assertTrue(backend.port_is_bindable(port))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+"""probe_target and probe_target_async against local listeners.
+
+    python3 -m pytest tests/test_probe.py   (or python3 -m unittest discover tests)
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ssh_manager_backend as backend
+
+TIMEOUT = 0.5
+BANNER = b"SSH-2.0-OpenSSH_9.6 test\r\n"
+
+
+def start_listener(banner=None):
+    """Listens on a free loopback port, sending banner (or nothing) to every client; returns (server, port)."""
+    server = socket.create_server(("127.0.0.1", 0))
+    clients = []
+
+    def accept():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            clients.append(conn) # Kept open so a silent listener stays silent
+            if banner:
+                conn.sendall(banner)
+
+    threading.Thread(target=accept, daemon=True).start()
+    return server, server.getsockname()[1]
+
+
+def closed_port():
+    """Returns a loopback port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ProbeTargetTests(unittest.TestCase):
+    def probe(self, port, read_banner=True, hostname="127.0.0.1"):
+        return backend.probe_target(hostname, port, TIMEOUT, read_banner)
+
+    def setUp(self):
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.close()
+
+    def listener(self, banner=None):
+        server, port = start_listener(banner)
+        self.servers.append(server)
+        return port
+
+    def test_banner_listener(self):
+        result = self.probe(self.listener(BANNER))
+        self.assertTrue(result["reachable"])
+        self.assertEqual(result["banner"], BANNER.decode().strip())
+        self.assertIsNone(result["error"])
+        self.assertIsNotNone(result["latency_ms"])
+
+    def test_banner_after_other_lines(self):
+        # Servers may send other lines before the identification line
+        result = self.probe(self.listener(b"Welcome\r\n" + BANNER))
+        self.assertTrue(result["reachable"])
+        self.assertEqual(result["banner"], BANNER.decode().strip())
+
+    def test_listener_without_banner(self):
+        result = self.probe(self.listener(b"HTTP/1.1 400 Bad Request\r\n"))
+        self.assertTrue(result["reachable"])
+        self.assertIsNone(result["banner"])
+        self.assertEqual(result["error"], "No SSH banner received.")
+
+    def test_silent_listener(self):
+        started = time.monotonic()
+        result = self.probe(self.listener())
+        self.assertTrue(result["reachable"])
+        self.assertIsNone(result["banner"])
+        self.assertIn("Timed out", result["error"])
+        self.assertLess(time.monotonic() - started, TIMEOUT + 0.5)
+
+    def test_silent_listener_without_banner_read(self):
+        result = self.probe(self.listener(), read_banner=False)
+        self.assertTrue(result["reachable"])
+        self.assertIsNone(result["error"])
+
+    def test_closed_port(self):
+        result = self.probe(closed_port())
+        self.assertFalse(result["reachable"])
+        self.assertEqual(result["error"], "Connection refused.")
+
+    def test_hanging_resolver_is_bounded(self):
+        real_getaddrinfo = socket.getaddrinfo
+
+        def slow_getaddrinfo(host, *args, **kwargs):
+            if kwargs.get("flags") == socket.AI_NUMERICHOST:
+                return real_getaddrinfo(host, *args, **kwargs)
+            time.sleep(5)
+            return real_getaddrinfo("127.0.0.1", *args)
+
+        started = time.monotonic()
+        with mock.patch.object(socket, "getaddrinfo", slow_getaddrinfo):
+            result = self.probe(22, hostname="resolver-hangs.invalid")
+        self.assertLess(time.monotonic() - started, TIMEOUT + 0.5)
+        self.assertFalse(result["reachable"])
+        self.assertIn("Could not resolve", result["error"])
+
+
+class ProbeTargetAsyncTests(ProbeTargetTests):
+    def probe(self, port, read_banner=True, hostname="127.0.0.1"):
+        return asyncio.run(backend.probe_target_async(hostname, port, TIMEOUT, read_banner))
+
+    def test_hanging_resolver_is_bounded(self):
+        async def slow_getaddrinfo(*args, **kwargs):
+            await asyncio.sleep(5)
+
+        started = time.monotonic()
+        with mock.patch.object(asyncio.BaseEventLoop, "getaddrinfo", slow_getaddrinfo):
+            result = self.probe(22, hostname="resolver-hangs.invalid")
+        self.assertLess(time.monotonic() - started, TIMEOUT + 0.5)
+        self.assertIn("Could not resolve", result["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""ProfileIndex search ranking, field filters and incremental updates.
+
+    python3 -m pytest tests/test_profile_index.py   (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ssh_manager_backend as backend
+
+
+def forward(local_port, remote_port):
+    return {"local_port": local_port, "remote_host": "localhost", "remote_port": remote_port}
+
+
+PROFILES = {
+    "web": {"hostname": "web.example.com", "username": "deploy", "tags": ["prod"], "forwards": [forward(8080, 80)]},
+    "Web-Staging": {"hostname": "staging.example.com", "username": "deploy", "tags": ["staging"], "forwards": [forward(8081, 80)]},
+    "db": {"hostname": "db.internal", "username": "postgres", "tags": ["prod"], "forwards": [forward(5432, 5432)]},
+    "dashboard": {"hostname": "dash.example.com", "username": "admin", "forwards": [forward(3000, 3000)]},
+    "newbie": {"hostname": "x.example", "username": "u"},
+}
+
+
+class ProfileIndexSearchTests(unittest.TestCase):
+    def setUp(self):
+        self.index = backend.ProfileIndex()
+        self.index.rebuild(PROFILES)
+
+    def search(self, query, limit=10):
+        ranked, total = self.index.search(query, limit)
+        return [name for _, name in ranked], total
+
+    def scores(self, query):
+        return {name: score for score, name in self.index.search(query, 10)[0]}
+
+    def test_exact_name_ranks_above_prefix(self):
+        scores = self.scores("web")
+        self.assertEqual(scores["web"], backend.SEARCH_SCORE_EXACT)
+        self.assertLess(scores["Web-Staging"], backend.SEARCH_SCORE_PREFIX)
+        self.assertGreater(scores["Web-Staging"], backend.SEARCH_SCORE_HOST_PREFIX)
+        self.assertEqual(self.search("web")[0][:2], ["web", "Web-Staging"])
+
+    def test_shorter_prefix_matches_rank_higher(self):
+        self.index.add("web-a", {"hostname": "a"})
+        names, _ = self.search("web-")
+        self.assertEqual(names, ["web-a", "Web-Staging"])
+
+    def test_hostname_prefix(self):
+        scores = self.scores("staging")
+        self.assertEqual(scores, {"Web-Staging": backend.SEARCH_SCORE_HOST_PREFIX})
+
+    def test_substring_ranks_above_fuzzy(self):
+        scores = self.scores("eb")
+        self.assertEqual(scores["web"], backend.SEARCH_SCORE_SUBSTRING - 1)
+        self.assertLess(scores["newbie"], backend.SEARCH_SCORE_FUZZY) # n-e-w-b: a subsequence only
+        self.assertEqual(self.search("eb")[0][-1], "newbie")
+
+    def test_fuzzy_prefers_tighter_matches(self):
+        scores = self.scores("dsb")
+        self.assertEqual(set(scores), {"dashboard"})
+        self.assertIsNone(backend.fuzzy_score("dbs", "dashboard"))
+        self.assertGreater(backend.fuzzy_score("dab", "dabxxxx"), backend.fuzzy_score("dab", "dxaxbxx"))
+
+    def test_no_match(self):
+        self.assertEqual(self.search("zzz"), ([], 0))
+
+    def test_search_is_case_insensitive(self):
+        self.assertEqual(self.search("WEB-STAGING")[0], ["Web-Staging"])
+
+    def test_tag_filter_alone_lists_names_in_order(self):
+        ranked, total = self.index.search("tag:prod", 10)
+        self.assertEqual(ranked, [(backend.SEARCH_SCORE_FILTER_ONLY, "db"), (backend.SEARCH_SCORE_FILTER_ONLY, "web")])
+        self.assertEqual(total, 2)
+
+    def test_filters_are_prefixes_and_intersect(self):
+        self.assertEqual(sorted(self.search("user:dep")[0]), ["Web-Staging", "web"])
+        self.assertEqual(self.search("user:dep tag:prod")[0], ["web"])
+        self.assertEqual(self.search("host:db")[0], ["db"])
+
+    def test_filter_with_text(self):
+        self.assertEqual(self.search("tag:prod w")[0], ["web"])
+        self.assertEqual(self.search("tag:staging web")[0], ["Web-Staging"])
+
+    def test_port_filters(self):
+        self.assertEqual(sorted(self.search("port:80")[0]), ["Web-Staging", "web"])
+        self.assertEqual(self.search("lport:8080")[0], ["web"])
+        self.assertEqual(self.search("rport:8080")[0], [])
+        self.assertEqual(self.search("port:5432")[0], ["db"])
+        self.assertEqual(self.search("port:http")[0], [])
+
+    def test_unknown_field_is_searched_as_text(self):
+        self.index.add("foo:bar", {"hostname": "h"})
+        self.assertEqual(self.search("foo:bar")[0], ["foo:bar"])
+
+    def test_limit_caps_results_but_not_total(self):
+        names, total = self.search("", limit=2)
+        self.assertEqual(names, ["Web-Staging", "dashboard"])
+        self.assertEqual(total, len(PROFILES))
+        names, total = self.search("e", limit=1)
+        self.assertEqual(len(names), 1)
+        self.assertGreater(total, 1)
+
+    def test_updating_a_profile_replaces_its_keys(self):
+        self.index.add("db", {"hostname": "pg.internal", "username": "postgres", "tags": ["legacy"]})
+        self.assertEqual(self.search("host:db")[0], [])
+        self.assertEqual(self.search("host:pg")[0], ["db"])
+        self.assertEqual(self.search("tag:prod")[0], ["web"])
+        self.assertEqual(self.search("port:5432")[0], [])
+
+    def test_removed_profile_is_not_found(self):
+        self.index.remove("web")
+        self.index.remove("missing") # No-op
+        self.assertNotIn("web", self.search("web")[0])
+        self.assertEqual(self.search("lport:8080")[0], [])
+        self.assertNotIn(8080, self.index.by_local_port)
+        self.assertNotIn("web.example.com", self.index.by_hostname.names)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+"""ProfileStore revisions, changes_since, tombstone pruning and page cursors.
+
+    python3 -m pytest tests/test_profile_store.py   (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ssh_manager_backend as backend
+
+
+class ProfileStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "profiles.db")
+        self.store = self.open_store()
+
+    def open_store(self):
+        store = backend.ProfileStore(self.path)
+        self.addCleanup(store.conn.close)
+        return store
+
+
+class ChangesSinceTests(ProfileStoreTestCase):
+    def test_every_write_bumps_the_revision(self):
+        self.assertEqual(self.store.revision, 0)
+        self.assertEqual(self.store.put("a", {"hostname": "a"}), 1)
+        self.assertEqual(self.store.put_many([("b", {}), ("c", {})]), 2)
+        self.assertEqual(self.store.delete("a"), 3)
+        self.assertEqual(self.open_store().revision, 3)
+
+    def test_added_changed_and_removed(self):
+        self.store.put_many([("a", {}), ("b", {}), ("c", {})])
+        since = self.store.revision
+        self.store.put("a", {"hostname": "edited"})
+        self.store.put("d", {})
+        self.store.delete("b")
+        revision, added, changed, removed = self.store.changes_since(since)
+        self.assertEqual(revision, since + 3)
+        self.assertEqual(added, ["d"])
+        self.assertEqual(changed, ["a"])
+        self.assertEqual(removed, ["b"])
+
+    def test_profile_added_and_edited_after_since_is_added(self):
+        since = self.store.revision
+        self.store.put("a", {})
+        self.store.put("a", {"hostname": "edited"})
+        _, added, changed, _ = self.store.changes_since(since)
+        self.assertEqual((added, changed), (["a"], []))
+
+    def test_recreated_profile_is_no_longer_removed(self):
+        self.store.put("a", {})
+        since = self.store.revision
+        self.store.delete("a")
+        self.store.put("a", {})
+        _, added, changed, removed = self.store.changes_since(since)
+        self.assertEqual(removed, [])
+        self.assertEqual(added, ["a"])
+
+    def test_no_changes(self):
+        self.store.put("a", {})
+        self.assertEqual(self.store.changes_since(self.store.revision), (1, [], [], []))
+
+
+class TombstoneTests(ProfileStoreTestCase):
+    def setUp(self):
+        patch = mock.patch.object(backend, "PROFILE_TOMBSTONE_RETENTION", 3)
+        patch.start()
+        self.addCleanup(patch.stop)
+        super().setUp()
+
+    def tombstones(self):
+        return dict(self.store.conn.execute("SELECT name, rev FROM tombstones").fetchall())
+
+    def test_old_tombstones_are_pruned(self):
+        self.store.put_many([(f"p{i}", {}) for i in range(5)]) # Revision 1
+        for i in range(5):
+            self.store.delete(f"p{i}") # Revisions 2 to 6
+        self.assertEqual(self.store.tombstone_floor, 3)
+        self.assertEqual(self.tombstones(), {"p2": 4, "p3": 5, "p4": 6})
+        self.assertEqual(self.open_store().tombstone_floor, 3)
+
+    def test_tombstones_within_retention_are_kept(self):
+        self.store.put_many([("a", {}), ("b", {})])
+        self.store.delete("a")
+        self.store.delete("b")
+        self.assertEqual(self.store.tombstone_floor, 0)
+        self.assertEqual(self.tombstones(), {"a": 2, "b": 3})
+
+    def test_delta_older_than_the_floor_is_a_reset(self):
+        self.store.put_many([(f"p{i}", {}) for i in range(5)])
+        for i in range(4):
+            self.store.delete(f"p{i}")
+        profiles = {"p4": {"hostname": "h"}}
+        with mock.patch.object(backend, "PROFILE_STORE", self.store), mock.patch.object(backend, "SSH_PROFILES", profiles):
+            delta = backend.profiles_delta(1)
+            self.assertTrue(delta["reset"])
+            self.assertEqual(delta["added"], profiles)
+            self.assertEqual(delta["removed"], [])
+            delta = backend.profiles_delta(self.store.tombstone_floor)
+            self.assertFalse(delta["reset"])
+            self.assertEqual(delta["removed"], ["p1", "p2", "p3"])
+
+    def test_delta_from_a_future_revision_is_a_reset(self):
+        self.store.put("a", {})
+        with mock.patch.object(backend, "PROFILE_STORE", self.store), mock.patch.object(backend, "SSH_PROFILES", {"a": {}}):
+            self.assertTrue(backend.profiles_delta(99)["reset"])
+
+
+class PageTests(ProfileStoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.names = [f"profile-{i:02d}" for i in range(7)]
+        self.store.put_many([(name, {}) for name in reversed(self.names)])
+
+    def test_pages_follow_name_order(self):
+        seen = []
+        cursor = None
+        while True:
+            revision, names, cursor = self.store.page(cursor, 3)
+            self.assertEqual(revision, 1)
+            seen.extend(names)
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.names)
+
+    def test_cursor_is_the_last_name_returned(self):
+        _, names, cursor = self.store.page(None, 3)
+        self.assertEqual(cursor, names[-1])
+        _, names, _ = self.store.page(cursor, 3)
+        self.assertEqual(names[0], "profile-03")
+
+    def test_last_full_page_has_no_cursor(self):
+        _, names, cursor = self.store.page("profile-03", 3)
+        self.assertEqual(names, self.names[4:])
+        self.assertIsNone(cursor)
+
+    def test_cursor_of_a_deleted_profile_still_continues(self):
+        _, _, cursor = self.store.page(None, 3)
+        self.store.delete(cursor)
+        _, names, _ = self.store.page(cursor, 3)
+        self.assertEqual(names[0], "profile-03")
+
+
+if __name__ == "__main__":
+    unittest.main()
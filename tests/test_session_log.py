@@ -0,0 +1,170 @@
+"""SessionLog ring buffer accounting and the rate-limited live tail.
+
+    python3 -m pytest tests/test_session_log.py   (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ssh_manager_backend as backend
+
+LINE_SIZE = backend.SESSION_LOG_HEADER.size + len("line 00") # Bytes one "line NN" takes in the buffer
+
+
+def fill(log, count, first=0):
+    for i in range(first, first + count):
+        log.append(f"line {i:02d}")
+
+
+def seqs(lines):
+    return [line["seq"] for line in lines]
+
+
+class SessionLogBufferTests(unittest.TestCase):
+    def setUp(self):
+        self.log = backend.SessionLog("s", capacity=10 * LINE_SIZE)
+
+    def test_lines_are_numbered_in_order(self):
+        fill(self.log, 5)
+        lines, next_seq, lines_lost = self.log.read(since=0)
+        self.assertEqual(seqs(lines), [0, 1, 2, 3, 4])
+        self.assertEqual([line["text"] for line in lines][:2], ["line 00", "line 01"])
+        self.assertEqual(next_seq, 5)
+        self.assertFalse(lines_lost)
+
+    def test_wraparound_drops_a_quarter_of_the_buffer(self):
+        fill(self.log, 10)
+        self.assertEqual(self.log.first_seq, 0)
+        fill(self.log, 1, first=10)
+        # At least capacity // 4 bytes go at once, which is three whole lines here
+        self.assertEqual(self.log.first_seq, 3)
+        self.assertEqual(self.log.next_seq, 11)
+        self.assertEqual(len(self.log.buffer), 8 * LINE_SIZE)
+        lines, _, _ = self.log.read(since=0)
+        self.assertEqual(seqs(lines), list(range(3, 11)))
+        self.assertEqual(lines[0]["text"], "line 03")
+
+    def test_sequence_numbers_survive_many_wraps(self):
+        fill(self.log, 95)
+        lines, next_seq, _ = self.log.read()
+        self.assertEqual(next_seq, 95)
+        self.assertEqual(seqs(lines), list(range(self.log.first_seq, 95)))
+        self.assertEqual(lines[-1]["text"], "line 94")
+
+    def test_read_since_an_evicted_line_reports_the_loss(self):
+        fill(self.log, 11)
+        lines, next_seq, lines_lost = self.log.read(since=1)
+        self.assertTrue(lines_lost)
+        self.assertEqual(seqs(lines)[0], 3)
+        self.assertEqual(next_seq, 11)
+        _, _, lines_lost = self.log.read(since=3)
+        self.assertFalse(lines_lost)
+
+    def test_read_since_with_limit_continues_where_it_stopped(self):
+        fill(self.log, 8)
+        lines, next_seq, _ = self.log.read(since=2, limit=3)
+        self.assertEqual(seqs(lines), [2, 3, 4])
+        self.assertEqual(next_seq, 5)
+        lines, next_seq, _ = self.log.read(since=next_seq, limit=3)
+        self.assertEqual(seqs(lines), [5, 6, 7])
+        self.assertEqual(next_seq, 8)
+
+    def test_read_without_since_returns_the_newest_lines(self):
+        fill(self.log, 8)
+        lines, next_seq, lines_lost = self.log.read(limit=3)
+        self.assertEqual(seqs(lines), [5, 6, 7])
+        self.assertEqual(next_seq, 8)
+        self.assertFalse(lines_lost)
+
+    def test_min_level_filters_lines(self):
+        self.log.append("debug1: Reading configuration data")
+        self.log.append("Warning: Permanently added the host key")
+        self.log.append("ssh: connect to host h port 22: Connection refused")
+        lines, _, _ = self.log.read(since=0, min_level=backend.LOG_LEVELS.index("info"))
+        self.assertEqual([line["level"] for line in lines], ["info", "error"])
+        self.assertEqual(seqs(lines), [1, 2])
+
+    def test_long_lines_are_truncated(self):
+        self.log = backend.SessionLog("s")
+        self.log.append("x" * (backend.SESSION_LOG_MAX_LINE_BYTES + 100))
+        lines, _, _ = self.log.read()
+        self.assertEqual(len(lines[0]["text"]), backend.SESSION_LOG_MAX_LINE_BYTES)
+
+
+class SessionLogTailTests(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.flushes = []
+        patches = [mock.patch.object(backend, "send_response", self.sent.append),
+                   mock.patch.object(backend, "schedule_tail_flush", lambda log, delay: self.flushes.append(delay))]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.log = backend.SessionLog("s")
+
+    def test_no_tail_sends_nothing(self):
+        fill(self.log, 3)
+        self.assertEqual(self.sent, [])
+
+    def test_bucket_suppresses_lines_beyond_the_rate(self):
+        self.log.set_tail(0, 2)
+        fill(self.log, 5)
+        self.assertEqual([len(message["lines"]) for message in self.sent], [1, 1])
+        self.assertEqual(self.log.tail_suppressed, 3)
+        self.assertEqual(len(self.flushes), 1) # One flush per burst, due when the next token is there
+        self.assertAlmostEqual(self.flushes[0], 0.5, delta=0.05)
+
+    def test_next_line_through_reports_the_suppressed_count(self):
+        self.log.set_tail(0, 1)
+        fill(self.log, 4)
+        self.log.tail_tokens = 1.0 # As if a second had passed
+        self.log.tail_refilled_at = time.monotonic()
+        fill(self.log, 1, first=4)
+        self.assertEqual(self.sent[-1]["suppressed"], 3)
+        self.assertEqual(seqs(self.sent[-1]["lines"]), [4])
+        self.assertEqual(self.log.tail_suppressed, 0)
+
+    def test_flush_reports_suppressed_lines_when_the_burst_ends(self):
+        self.log.set_tail(0, 1)
+        fill(self.log, 4)
+        self.log.flush_tail()
+        self.assertEqual(self.sent[-1], {"type": "session_log_tail", "session_id": "s", "lines": [], "suppressed": 3})
+        self.log.flush_tail() # Nothing left to report
+        self.assertEqual(len(self.sent), 2)
+
+    def test_changing_the_tail_reports_suppressed_lines(self):
+        self.log.set_tail(0, 1)
+        fill(self.log, 3)
+        self.log.set_tail(None, 1)
+        self.assertEqual(self.sent[-1]["suppressed"], 2)
+        fill(self.log, 3)
+        self.assertEqual(len(self.sent), 2)
+
+    def test_lines_below_the_tail_level_are_not_counted(self):
+        self.log.set_tail(backend.LOG_LEVELS.index("error"), 1)
+        self.log.append("debug1: noise")
+        self.log.append("Connection refused")
+        self.log.append("Connection refused")
+        self.assertEqual(len(self.sent), 1)
+        self.assertEqual(self.log.tail_suppressed, 1)
+
+
+class SessionLogTailFlushTimerTests(unittest.TestCase):
+    def test_flush_timer_sends_the_count(self):
+        sent = []
+        with mock.patch.object(backend, "send_response", sent.append):
+            log = backend.SessionLog("s")
+            log.set_tail(0, 20)
+            fill(log, 25)
+            time.sleep(0.2)
+        self.assertEqual(sent[-1]["lines"], [])
+        self.assertEqual(sum(len(message["lines"]) + message["suppressed"] for message in sent), 25)
+
+
+if __name__ == "__main__":
+    unittest.main()
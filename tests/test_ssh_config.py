@@ -0,0 +1,65 @@
+"""LocalForward parsing from OpenSSH config files, forward validation and the -L specs compiled from them.
+
+    python3 -m pytest tests/test_ssh_config.py   (or python3 -m unittest discover tests)
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import ssh_manager_backend as backend
+
+
+def l_specs(argv):
+    return [argv[i + 1] for i, arg in enumerate(argv[:-1]) if arg == "-L"]
+
+
+class LocalForwardTests(unittest.TestCase):
+    def test_ipv4_and_hostname_targets(self):
+        self.assertEqual(backend.parse_local_forward("8080 db.internal:5432"),
+                         {"local_port": 8080, "remote_host": "db.internal", "remote_port": 5432})
+        self.assertEqual(backend.parse_local_forward("127.0.0.1:8080 10.0.0.5:80"),
+                         {"local_port": 8080, "remote_host": "10.0.0.5", "remote_port": 80})
+
+    def test_ipv6_target_is_unbracketed_in_the_profile(self):
+        self.assertEqual(backend.parse_local_forward("9090 [::1]:90"),
+                         {"local_port": 9090, "remote_host": "::1", "remote_port": 90})
+
+    def test_ipv6_target_is_bracketed_in_the_ssh_command(self):
+        forward = backend.parse_local_forward("9090 [fe80::1%eth0]:90")
+        compiled, error = backend.compile_profile("v6", {"hostname": "h", "username": "u", "forwards": [forward]})
+        self.assertIsNone(error)
+        self.assertEqual(l_specs(compiled.argv), ["9090:[fe80::1%eth0]:90"])
+
+    def test_auto_port_ipv6_forward_is_bracketed(self):
+        compiled, error = backend.compile_profile("v6", {"hostname": "h", "username": "u", "forwards": [
+            {"local_port": "auto", "remote_host": "::1", "remote_port": 90}]})
+        self.assertIsNone(error)
+        self.assertEqual(l_specs(compiled.command({0: 20001})), ["20001:[::1]:90"])
+
+    def test_config_file_with_ipv6_local_forward(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "config")
+            with open(path, "w") as f:
+                f.write("Host v6\n    HostName example.org\n    User deploy\n    LocalForward 9090 [::1]:90\n")
+            profiles, _ = backend.read_ssh_config(path)
+        compiled, error = backend.compile_profile("v6", profiles["v6"])
+        self.assertIsNone(error)
+        self.assertEqual(l_specs(compiled.argv), ["9090:[::1]:90"])
+
+
+class ForwardValidationTests(unittest.TestCase):
+    def test_ports_must_be_ints_not_bools(self):
+        valid = {"local_port": 8080, "remote_host": "db", "remote_port": 5432}
+        self.assertTrue(backend.is_valid_forward(valid))
+        self.assertTrue(backend.is_valid_forward({**valid, "local_port": "auto"}))
+        self.assertFalse(backend.is_valid_forward({**valid, "local_port": True}))
+        self.assertFalse(backend.is_valid_forward({**valid, "remote_port": True}))
+        self.assertFalse(backend.is_valid_forward({**valid, "remote_port": 0}))
+
+
+if __name__ == "__main__":
+    unittest.main()